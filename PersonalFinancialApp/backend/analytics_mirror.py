@@ -0,0 +1,373 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from ingest import cents_to_amount
+from purge import HIDDEN_ACCOUNTS_SQL
+
+try:
+    import duckdb
+except ImportError:  # the mirror is optional; analytics then always read SQLite
+    duckdb = None
+
+# Optional columnar copy of the ledger (bank and credit card transactions) in
+# a DuckDB file next to each SQLite database, for aggregations over long
+# histories. Enabled with FINANCE_ANALYTICS_MIRROR=duckdb. Triggers record
+# every changed ledger row in analytics_changes; a refresh copies only those
+# rows. Queries refresh the mirror first when few changes are pending, and
+# fall back to SQLite while it is being built, far behind, or failing.
+MIRROR_ENGINE = os.environ.get("FINANCE_ANALYTICS_MIRROR", "").lower()
+INLINE_REFRESH_MAX = int(os.environ.get("FINANCE_ANALYTICS_MIRROR_INLINE_REFRESH", "10000"))
+LOAD_CHUNK_ROWS = 100_000
+CHANGED_IDS_CHUNK = 500
+
+CHANGES_TABLE = "analytics_changes"
+
+_CHANGE_LOG_SCHEMA = [
+    f"""CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT NOT NULL,
+        row_id INTEGER NOT NULL
+    )""",
+]
+for _source, _table, _columns in (
+    ("bank", "transactions", "account_id, day_number, amount_cents, category"),
+    ("credit", "credit_transactions", "credit_statement_id, day_number, amount_cents, category"),
+):
+    _CHANGE_LOG_SCHEMA += [
+        f"""CREATE TRIGGER IF NOT EXISTS {_table}_mirror_insert AFTER INSERT ON {_table} BEGIN
+            INSERT INTO {CHANGES_TABLE} (source, row_id) VALUES ('{_source}', new.id);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {_table}_mirror_update AFTER UPDATE OF {_columns} ON {_table} BEGIN
+            INSERT INTO {CHANGES_TABLE} (source, row_id) VALUES ('{_source}', new.id);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {_table}_mirror_delete AFTER DELETE ON {_table} BEGIN
+            INSERT INTO {CHANGES_TABLE} (source, row_id) VALUES ('{_source}', old.id);
+        END""",
+    ]
+_CHANGE_LOG_TRIGGERS = [f"{table}_mirror_{event}" for table in ("transactions", "credit_transactions")
+                        for event in ("insert", "update", "delete")]
+
+# Columns copied to the mirror; month is precomputed so both engines group identically
+_LEDGER_ROWS_SQL = """
+    SELECT source, id, account_id, day_number,
+           strftime('%Y-%m', day_number * 86400, 'unixepoch') AS month, amount_cents, category
+    FROM ledger
+"""
+
+_MIRROR_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS ledger (
+        source VARCHAR, id BIGINT, account_id BIGINT, day_number INTEGER,
+        month VARCHAR, amount_cents BIGINT, category VARCHAR
+    )""",
+    "CREATE TABLE IF NOT EXISTS mirror_state (key VARCHAR PRIMARY KEY, value VARCHAR)",
+]
+
+
+def mirror_enabled() -> bool:
+    return MIRROR_ENGINE == "duckdb" and duckdb is not None
+
+
+def ensure_change_log(conn):
+    for sql in _CHANGE_LOG_SCHEMA:
+        conn.execute(sql)
+
+
+def drop_change_log(conn):
+    for trigger in _CHANGE_LOG_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute(f"DROP TABLE IF EXISTS {CHANGES_TABLE}")
+
+
+def _change_log_exists(conn) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (CHANGES_TABLE,)
+    ).fetchone() is not None
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class AnalyticsMirror:
+    """DuckDB copy of one SQLite database's ledger, kept current from analytics_changes"""
+
+    def __init__(self, pool, path: str):
+        self.pool = pool
+        self.path = path
+        self._con = duckdb.connect(path)
+        for sql in _MIRROR_SCHEMA:
+            self._con.execute(sql)
+        self._con_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        with pool.transaction() as conn:
+            ensure_change_log(conn)
+
+    def _cursor(self):
+        # DuckDB connections are not thread-safe; each caller gets its own cursor
+        with self._con_lock:
+            return self._con.cursor()
+
+    def state(self) -> Dict[str, Optional[str]]:
+        return dict(self._cursor().execute("SELECT key, value FROM mirror_state").fetchall())
+
+    def watermark(self) -> Optional[int]:
+        value = self.state().get("watermark")
+        return int(value) if value is not None else None
+
+    def pending_changes(self) -> Optional[int]:
+        """Changes not yet copied, or None if the mirror has never been built"""
+        watermark = self.watermark()
+        if watermark is None:
+            return None
+        with self.pool.connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {CHANGES_TABLE} WHERE seq > ?", (watermark,)).fetchone()[0]
+
+    def refresh(self) -> Dict[str, Any]:
+        """Copy changed rows (or everything, the first time) and advance the watermark"""
+        with self._refresh_lock:
+            start = time.perf_counter()
+            watermark = self.watermark()
+            with self.pool.connection() as conn:
+                high = conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {CHANGES_TABLE}").fetchone()[0]
+                # Copied changes are deleted, so an empty log means nothing new
+                high = max(high, watermark or 0)
+                if watermark is None:
+                    rows = self._load_all(conn, high)
+                elif high > watermark:
+                    rows = self._apply_changes(conn, watermark, high)
+                else:
+                    rows = 0
+                    self._set_state(watermark=high)
+            # Rows at or below the watermark are in the mirror and no longer needed
+            with self.pool.transaction() as conn:
+                conn.execute(f"DELETE FROM {CHANGES_TABLE} WHERE seq <= ?", (high,))
+            return {"rows_copied": rows, "watermark": high,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    def _set_state(self, cur=None, **values):
+        cur = cur or self._cursor()
+        values["refreshed_at"] = _now()
+        for key, value in values.items():
+            cur.execute("INSERT OR REPLACE INTO mirror_state VALUES (?, ?)", (key, str(value)))
+
+    def _load_all(self, conn, high: int) -> int:
+        cur = self._cursor()
+        cur.execute("BEGIN TRANSACTION")
+        try:
+            cur.execute("DELETE FROM ledger")
+            rows = 0
+            for chunk in pd.read_sql_query(_LEDGER_ROWS_SQL, conn, chunksize=LOAD_CHUNK_ROWS):
+                cur.register("ledger_chunk", chunk)
+                cur.execute("INSERT INTO ledger SELECT * FROM ledger_chunk")
+                cur.unregister("ledger_chunk")
+                rows += len(chunk)
+            self._set_state(cur, watermark=high)
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        print(f"📊 Built analytics mirror {self.path} with {rows} ledger rows")
+        return rows
+
+    def _apply_changes(self, conn, watermark: int, high: int) -> int:
+        changed = pd.read_sql_query(
+            f"SELECT DISTINCT source, row_id AS id FROM {CHANGES_TABLE} WHERE seq > ? AND seq <= ?",
+            conn, params=(watermark, high),
+        )
+        current: List[pd.DataFrame] = []
+        for source, ids in changed.groupby("source")["id"]:
+            ids = ids.tolist()
+            for i in range(0, len(ids), CHANGED_IDS_CHUNK):
+                chunk = ids[i:i + CHANGED_IDS_CHUNK]
+                current.append(pd.read_sql_query(
+                    f"{_LEDGER_ROWS_SQL} WHERE source = ? AND id IN ({','.join('?' * len(chunk))})",
+                    conn, params=(source, *chunk),
+                ))
+        rows = pd.concat(current, ignore_index=True) if current else None
+
+        cur = self._cursor()
+        cur.execute("BEGIN TRANSACTION")
+        try:
+            # Changed rows are replaced; deleted ones are simply not re-inserted
+            cur.register("changed_rows", changed)
+            cur.execute("""
+                DELETE FROM ledger USING changed_rows
+                WHERE ledger.source = changed_rows.source AND ledger.id = changed_rows.id
+            """)
+            if rows is not None and len(rows):
+                cur.register("current_rows", rows)
+                cur.execute("INSERT INTO ledger SELECT * FROM current_rows")
+            self._set_state(cur, watermark=high)
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        return len(changed)
+
+    def freshness(self) -> Dict[str, Any]:
+        state = self.state()
+        return {"engine": "duckdb", "as_of": state.get("refreshed_at"),
+                "watermark": int(state["watermark"]) if "watermark" in state else None}
+
+    def query(self, fn: Callable) -> Optional[Dict[str, Any]]:
+        """Run ``fn(cursor, hidden_account_ids)`` on a current mirror; None means use SQLite"""
+        try:
+            pending = self.pending_changes()
+            if pending is None or pending > INLINE_REFRESH_MAX:
+                # Too much to copy while a request waits; catch up in the background
+                self.refresh_in_background()
+                return None
+            if pending:
+                self.refresh()
+            with self.pool.connection() as conn:
+                hidden = [row[0] for row in conn.execute(HIDDEN_ACCOUNTS_SQL)]
+            result = fn(self._cursor(), hidden)
+        except Exception as e:
+            print(f"Analytics mirror {self.path} failed, using SQLite: {e}")
+            return None
+        result["freshness"] = self.freshness()
+        return result
+
+    def refresh_in_background(self):
+        if self._refresh_lock.locked():
+            return
+        threading.Thread(target=self._background_refresh, name="analytics-mirror", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Analytics mirror refresh of {self.path} failed: {e}")
+
+    def close(self):
+        with self._con_lock:
+            self._con.close()
+
+
+_mirrors: Dict[str, AnalyticsMirror] = {}
+_mirrors_lock = threading.Lock()
+
+
+@atexit.register
+def _close_mirrors():
+    with _mirrors_lock:
+        for mirror in _mirrors.values():
+            mirror.close()
+        _mirrors.clear()
+
+
+def mirror_path(pool) -> str:
+    return f"{os.path.splitext(pool.db_path)[0]}.duckdb"
+
+
+def analytics_mirror(pool) -> Optional[AnalyticsMirror]:
+    """The mirror of a database (a ConnectionPool), or None when the mirror is disabled"""
+    if not mirror_enabled():
+        return None
+    with _mirrors_lock:
+        mirror = _mirrors.get(pool.db_path)
+        if mirror is None:
+            try:
+                mirror = _mirrors[pool.db_path] = AnalyticsMirror(pool, mirror_path(pool))
+            except Exception as e:
+                print(f"Analytics mirror for {pool.db_path} is unavailable: {e}")
+                return None
+        # A household pool may have been reopened since the mirror was created
+        mirror.pool = pool
+        return mirror
+
+
+def refresh_mirror(pool) -> Dict[str, Any]:
+    """Maintenance task: bring the mirror up to date, or drop the change log once it is disabled"""
+    mirror = analytics_mirror(pool)
+    if mirror is not None:
+        return mirror.refresh()
+    with pool.connection() as conn:
+        if not _change_log_exists(conn):
+            return {"enabled": False}
+    with pool.transaction() as conn:
+        drop_change_log(conn)
+    return {"enabled": False, "change_log": "dropped"}
+
+
+def sqlite_freshness() -> Dict[str, Any]:
+    return {"engine": "sqlite", "as_of": _now(), "watermark": None}
+
+
+def _range_filter(account_id: Optional[int], first_day: Optional[int], last_day: Optional[int],
+                  source: Optional[str] = None, hidden: Optional[List[int]] = None):
+    filters, params = "", []
+    if hidden:
+        filters += f" AND NOT (source = 'bank' AND account_id IN ({','.join('?' * len(hidden))}))"
+        params += hidden
+    for condition, value in (
+        ("source = ?", source),
+        ("account_id = ?", account_id),
+        ("day_number >= ?", first_day),
+        ("day_number <= ?", last_day),
+    ):
+        if value is not None:
+            filters += f" AND {condition}"
+            params.append(value)
+    return filters, params
+
+
+def account_analytics(cur, account_id: int, first_day: Optional[int], last_day: Optional[int]) -> Dict[str, Any]:
+    """get_analytics on the mirror: monthly and per-category spending of one bank account"""
+    filters, params = _range_filter(account_id, first_day, last_day, source="bank")
+    monthly = cur.execute(f"""
+        SELECT month, SUM(amount_cents) FROM ledger
+        WHERE amount_cents < 0{filters}
+        GROUP BY month ORDER BY month
+    """, params).fetchall()
+    categories = cur.execute(f"""
+        SELECT category, -SUM(amount_cents) AS total FROM ledger
+        WHERE amount_cents < 0{filters}
+        GROUP BY category ORDER BY total DESC
+    """, params).fetchall()
+    return {
+        "monthly_spending": [{"month": month, "amount": cents_to_amount(abs(int(total)))} for month, total in monthly],
+        "categories": [{"category": category, "amount": cents_to_amount(int(total))} for category, total in categories],
+    }
+
+
+def mirror_ledger_analytics(cur, hidden: List[int], source: Optional[str] = None, account_id: Optional[int] = None,
+                            first_day: Optional[int] = None, last_day: Optional[int] = None) -> Dict[str, Any]:
+    """ledger.ledger_analytics on the mirror, with the same result shape"""
+    filters, params = _range_filter(account_id, first_day, last_day, source=source, hidden=hidden)
+
+    monthly: Dict[str, Dict[str, Any]] = {}
+    for month, row_source, total in cur.execute(f"""
+        SELECT month, source, -SUM(amount_cents) FROM ledger
+        WHERE amount_cents < 0{filters}
+        GROUP BY month, source ORDER BY month, source
+    """, params).fetchall():
+        entry = monthly.setdefault(month, {"month": month, "amount": 0.0, "by_source": {}})
+        entry["by_source"][row_source] = cents_to_amount(int(total))
+        entry["amount"] = round(entry["amount"] + cents_to_amount(int(total)), 2)
+
+    categories = [
+        {"category": category, "amount": cents_to_amount(int(total)), "transaction_count": count}
+        for category, total, count in cur.execute(f"""
+            SELECT category, -SUM(amount_cents) AS total, COUNT(*) FROM ledger
+            WHERE amount_cents < 0{filters}
+            GROUP BY category ORDER BY total DESC
+        """, params).fetchall()
+    ]
+
+    totals = {
+        row_source: {"spending": cents_to_amount(int(spending)), "income": cents_to_amount(int(income)),
+                     "transaction_count": count}
+        for row_source, spending, income, count in cur.execute(f"""
+            SELECT source, -SUM(LEAST(amount_cents, 0)), SUM(GREATEST(amount_cents, 0)), COUNT(*)
+            FROM ledger WHERE 1 = 1{filters}
+            GROUP BY source
+        """, params).fetchall()
+    }
+    return {"monthly_spending": list(monthly.values()), "categories": categories, "sources": totals}
@@ -0,0 +1,522 @@
+import importlib.util
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from descriptions import description_sql, intern_descriptions
+from ingest import cents_to_amount, normalize_date
+from purge import HIDDEN_ACCOUNTS_SQL
+from raw_store import fetch_raw, store_raw
+
+# Parquet engine pandas will use; archiving is optional, and without an engine nothing is archived
+PARQUET_ENGINE: Optional[str] = next(
+    (engine for engine in ("pyarrow", "fastparquet") if importlib.util.find_spec(engine) is not None), None
+)
+
+# Closed months of old transactions move out of the hot transactions table
+# into one compressed Parquet file per account and month, next to the
+# database (data/finance_archive/account_<id>/<YYYY-MM>.<version>.parquet).
+# transaction_archive lists the partitions and transaction_archive_days keeps
+# per-day, per-category totals, so balances and analytics still come from
+# SQL; listings, search and backups read the partitions. Account balances
+# include archived transactions. FINANCE_ARCHIVE_AFTER_MONTHS (0 disables)
+# sets how old a month must be before the daily "archive" maintenance task
+# moves it.
+ARCHIVE_AFTER_MONTHS = int(os.environ.get("FINANCE_ARCHIVE_AFTER_MONTHS", "36"))
+PARTITION_CACHE_SIZE = 64
+ID_CHUNK = 500
+
+ARCHIVE_TABLE = "transaction_archive"
+ARCHIVE_DAYS_TABLE = "transaction_archive_days"
+
+ARCHIVE_SCHEMA = [
+    f"""CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} (
+        account_id INTEGER NOT NULL REFERENCES accounts (id) ON DELETE CASCADE,
+        month TEXT NOT NULL,
+        first_day INTEGER NOT NULL,
+        last_day INTEGER NOT NULL,
+        row_count INTEGER NOT NULL,
+        amount_cents INTEGER NOT NULL,
+        min_cents INTEGER NOT NULL,
+        max_cents INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (account_id, month)
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS {ARCHIVE_DAYS_TABLE} (
+        account_id INTEGER NOT NULL REFERENCES accounts (id) ON DELETE CASCADE,
+        day_number INTEGER NOT NULL,
+        category TEXT,
+        transaction_count INTEGER NOT NULL,
+        amount_cents INTEGER NOT NULL,
+        spending_count INTEGER NOT NULL,
+        spending_cents INTEGER NOT NULL
+    )""",
+    f"""CREATE INDEX IF NOT EXISTS idx_{ARCHIVE_DAYS_TABLE}_account_day
+        ON {ARCHIVE_DAYS_TABLE} (account_id, day_number, category, amount_cents)""",
+]
+
+# Columns stored in each partition
+COLUMNS = ["id", "account_id", "date", "day_number", "description", "amount_cents", "note", "category", "raw_data"]
+
+_MONTH = re.compile(r"^\d{4}-\d{2}$")
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+_cache: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def ensure_archive_tables(conn: sqlite3.Connection):
+    for sql in ARCHIVE_SCHEMA:
+        conn.execute(sql)
+
+
+def archive_enabled() -> bool:
+    return PARQUET_ENGINE is not None
+
+
+def archive_dir(db_path: str) -> str:
+    return f"{os.path.splitext(db_path)[0]}_archive"
+
+
+def valid_month(month: str) -> bool:
+    return bool(_MONTH.match(month or "")) and 1 <= int(month[5:]) <= 12
+
+
+def month_bounds(month: str) -> Tuple[int, int]:
+    """First and last day numbers of a YYYY-MM month"""
+    year, number = int(month[:4]), int(month[5:])
+    first = date(year, number, 1)
+    following = date(year + number // 12, number % 12 + 1, 1)
+    return normalize_date(first)[1], normalize_date(following)[1] - 1
+
+
+def _cutoff_day(months: int) -> int:
+    """First day of the month ``months`` months before the current one"""
+    today = date.today()
+    index = today.year * 12 + today.month - 1 - months
+    return normalize_date(date(index // 12, index % 12 + 1, 1))[1]
+
+
+def read_partition(directory: str, path: str) -> pd.DataFrame:
+    """A partition's rows; files are never rewritten in place, so they are cached by name"""
+    full_path = os.path.join(directory, path)
+    with _cache_lock:
+        frame = _cache.get(full_path)
+        if frame is not None:
+            _cache.move_to_end(full_path)
+            return frame
+    frame = pd.read_parquet(full_path, engine=PARQUET_ENGINE)
+    for column in ("date", "description", "note", "category", "raw_data"):
+        frame[column] = frame[column].astype(object).where(frame[column].notna(), None)
+    with _cache_lock:
+        _cache[full_path] = frame
+        while len(_cache) > PARTITION_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return frame
+
+
+def _write_partition(directory: str, account_id: int, month: str, frame: pd.DataFrame) -> str:
+    """Write a new version of a partition and return its path relative to ``directory``"""
+    path = os.path.join(f"account_{account_id}", f"{month}.{uuid.uuid4().hex[:12]}.parquet")
+    full_path = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    frame[COLUMNS].to_parquet(full_path, engine=PARQUET_ENGINE, compression="zstd" if PARQUET_ENGINE == "pyarrow" else "gzip",
+                              index=False)
+    return path
+
+
+def _remove(directory: str, path: Optional[str]):
+    if path:
+        try:
+            os.remove(os.path.join(directory, path))
+        except FileNotFoundError:
+            pass
+
+
+def _delete_ids(conn: sqlite3.Connection, ids: List[int]):
+    for start in range(0, len(ids), ID_CHUNK):
+        chunk = ids[start:start + ID_CHUNK]
+        conn.execute(f"DELETE FROM transactions WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+
+
+def _replace_day_totals(conn: sqlite3.Connection, account_id: int, first_day: int, last_day: int,
+                        frame: Optional[pd.DataFrame]):
+    conn.execute(f"DELETE FROM {ARCHIVE_DAYS_TABLE} WHERE account_id = ? AND day_number BETWEEN ? AND ?",
+                 (account_id, first_day, last_day))
+    if frame is None or frame.empty:
+        return
+    spending = frame["amount_cents"].where(frame["amount_cents"] < 0)
+    totals = (
+        frame.assign(spending_cents=spending.fillna(0), spending_count=spending.notna().astype(int))
+        .groupby(["day_number", frame["category"].fillna("\0")], sort=False)
+        .agg(transaction_count=("id", "size"), amount_cents=("amount_cents", "sum"),
+             spending_count=("spending_count", "sum"), spending_cents=("spending_cents", "sum"))
+        .reset_index()
+    )
+    conn.executemany(
+        f"""INSERT INTO {ARCHIVE_DAYS_TABLE}
+            (account_id, day_number, category, transaction_count, amount_cents, spending_count, spending_cents)
+            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        [(account_id, int(row.day_number), None if row.category == "\0" else row.category,
+          int(row.transaction_count), int(row.amount_cents), int(row.spending_count), int(row.spending_cents))
+         for row in totals.itertuples(index=False)],
+    )
+
+
+def archive_month(db, account_id: int, month: str) -> int:
+    """Move an account's transactions in ``month`` to its partition; returns how many moved"""
+    first_day, last_day = month_bounds(month)
+    directory = archive_dir(db.db_path)
+    old_path = new_path = None
+    try:
+        with db.transaction() as conn:
+            hot = pd.read_sql_query(f"""
+                SELECT {', '.join(description_sql('t') + ' AS description' if column == 'description' else column
+                                  for column in COLUMNS if column != 'raw_data')}
+                FROM transactions t WHERE account_id = ? AND day_number BETWEEN ? AND ?
+            """, conn, params=(account_id, first_day, last_day))
+            if hot.empty:
+                return 0
+            raw = fetch_raw(conn, hot["id"].tolist())
+            hot["raw_data"] = hot["id"].map(raw)
+
+            # Transactions imported into an already archived month are merged into a new version
+            existing = conn.execute(f"SELECT path FROM {ARCHIVE_TABLE} WHERE account_id = ? AND month = ?",
+                                    (account_id, month)).fetchone()
+            frame = hot
+            if existing:
+                old_path = existing[0]
+                frame = pd.concat([read_partition(directory, old_path), hot], ignore_index=True)
+            frame = frame.sort_values(["day_number", "id"], ignore_index=True)
+            new_path = _write_partition(directory, account_id, month, frame)
+
+            _delete_ids(conn, hot["id"].tolist())
+            # Deleting fired the balance trigger; archived transactions still count
+            moved_cents = int(hot["amount_cents"].sum())
+            conn.execute("UPDATE accounts SET balance_cents = balance_cents + ? WHERE id = ?", (moved_cents, account_id))
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {ARCHIVE_TABLE}
+                    (account_id, month, first_day, last_day, row_count, amount_cents, min_cents, max_cents, path)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (account_id, month, first_day, last_day, len(frame), int(frame["amount_cents"].sum()),
+                  int(frame["amount_cents"].min()), int(frame["amount_cents"].max()), new_path))
+            _replace_day_totals(conn, account_id, first_day, last_day, frame)
+    except Exception:
+        _remove(directory, new_path)
+        raise
+    # The catalog now points at the new version
+    _remove(directory, old_path)
+    return len(hot)
+
+
+def archive_closed_months(db, months: int = ARCHIVE_AFTER_MONTHS) -> Dict[str, Any]:
+    """Archive every month that ended at least ``months`` months ago"""
+    if not archive_enabled() or months <= 0:
+        return {"enabled": False, "pruned_files": prune_orphan_files(db)}
+    cutoff = _cutoff_day(months)
+    with db.connection() as conn:
+        candidates = conn.execute(f"""
+            SELECT account_id, strftime('%Y-%m', day_number * 86400, 'unixepoch') AS month
+            FROM transactions
+            WHERE day_number < ? AND account_id NOT IN ({HIDDEN_ACCOUNTS_SQL})
+            GROUP BY account_id, month
+            ORDER BY account_id, month
+        """, (cutoff,)).fetchall()
+    moved = sum(archive_month(db, account_id, month) for account_id, month in candidates)
+    if moved:
+        print(f"🗄️  Archived {moved} transactions from {len(candidates)} account months")
+    return {"months": len(candidates), "transactions": moved, "pruned_files": prune_orphan_files(db)}
+
+
+def restore_month(db, account_id: int, month: str) -> Optional[int]:
+    """Move an archived month back into the transactions table; None if it is not archived"""
+    directory = archive_dir(db.db_path)
+    with db.transaction() as conn:
+        row = conn.execute(f"SELECT path, first_day, last_day FROM {ARCHIVE_TABLE} WHERE account_id = ? AND month = ?",
+                           (account_id, month)).fetchone()
+        if row is None:
+            return None
+        path, first_day, last_day = row
+        frame = read_partition(directory, path)
+        # Ids are never reused (AUTOINCREMENT), so archived rows keep theirs
+        conn.executemany("""
+            INSERT INTO transactions (id, account_id, date, day_number, description_id, amount_cents, note, category)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(int(r.id), int(r.account_id), r.date, int(r.day_number), description_id, int(r.amount_cents),
+               r.note, r.category)
+              for r, description_id in zip(frame.itertuples(index=False),
+                                           intern_descriptions(conn, frame["description"].tolist()))])
+        store_raw(conn, [(int(r.id), r.raw_data) for r in frame.itertuples(index=False) if isinstance(r.raw_data, str)])
+        # Inserting fired the balance trigger; the balance already included these
+        conn.execute("UPDATE accounts SET balance_cents = balance_cents - ? WHERE id = ?",
+                     (int(frame["amount_cents"].sum()), account_id))
+        conn.execute(f"DELETE FROM {ARCHIVE_TABLE} WHERE account_id = ? AND month = ?", (account_id, month))
+        _replace_day_totals(conn, account_id, first_day, last_day, None)
+    _remove(directory, path)
+    return len(frame)
+
+
+def restore_account(db, account_id: int) -> Dict[str, int]:
+    with db.connection() as conn:
+        months = [row[0] for row in conn.execute(
+            f"SELECT month FROM {ARCHIVE_TABLE} WHERE account_id = ? ORDER BY month", (account_id,))]
+    return {month: restore_month(db, account_id, month) or 0 for month in months}
+
+
+def prune_orphan_files(db) -> int:
+    """Delete partition files the catalog no longer points to (deleted accounts, interrupted archiving)"""
+    directory = archive_dir(db.db_path)
+    if not os.path.isdir(directory):
+        return 0
+    with db.connection() as conn:
+        known = {os.path.normpath(row[0]) for row in conn.execute(f"SELECT path FROM {ARCHIVE_TABLE}")}
+    removed = 0
+    for root, _, files in os.walk(directory):
+        for file in files:
+            path = os.path.relpath(os.path.join(root, file), directory)
+            if file.endswith(".parquet") and os.path.normpath(path) not in known:
+                os.remove(os.path.join(root, file))
+                removed += 1
+    return removed
+
+
+def archive_catalog(conn: sqlite3.Connection, account_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    where, params = ("WHERE account_id = ?", [account_id]) if account_id is not None else ("", [])
+    return [
+        {"account_id": row[0], "month": row[1], "transactions": row[2], "amount": cents_to_amount(row[3]),
+         "archived_at": row[4]}
+        for row in conn.execute(f"""
+            SELECT account_id, month, row_count, amount_cents, archived_at
+            FROM {ARCHIVE_TABLE} {where} ORDER BY account_id, month
+        """, params)
+    ]
+
+
+# Federated reads
+
+def _partitions(conn: sqlite3.Connection, account_id: Optional[int], first_day: Optional[int],
+                last_day: Optional[int], min_cents: Optional[int] = None, max_cents: Optional[int] = None) -> List[str]:
+    conditions, params = [f"account_id NOT IN ({HIDDEN_ACCOUNTS_SQL})"], []
+    for condition, value in (
+        ("account_id = ?", account_id),
+        ("last_day >= ?", first_day),
+        ("first_day <= ?", last_day),
+        ("max_cents >= ?", min_cents),
+        ("min_cents <= ?", max_cents),
+    ):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    return [row[0] for row in conn.execute(
+        f"SELECT path FROM {ARCHIVE_TABLE} WHERE {' AND '.join(conditions)} ORDER BY account_id, month", params
+    )]
+
+
+def archived_rows(conn: sqlite3.Connection, db_path: str, account_id: Optional[int] = None,
+                  first_day: Optional[int] = None, last_day: Optional[int] = None,
+                  min_cents: Optional[int] = None, max_cents: Optional[int] = None) -> pd.DataFrame:
+    """Archived transactions matching the filters (empty frame when nothing is archived)"""
+    paths = _partitions(conn, account_id, first_day, last_day, min_cents, max_cents)
+    if not paths:
+        return pd.DataFrame(columns=COLUMNS)
+    directory = archive_dir(db_path)
+    frame = pd.concat([read_partition(directory, path) for path in paths], ignore_index=True)
+    mask = pd.Series(True, index=frame.index)
+    for column, op, value in (
+        ("day_number", "ge", first_day),
+        ("day_number", "le", last_day),
+        ("amount_cents", "ge", min_cents),
+        ("amount_cents", "le", max_cents),
+    ):
+        if value is not None:
+            mask &= getattr(frame[column], op)(value)
+    return frame[mask]
+
+
+def archived_page(conn: sqlite3.Connection, db_path: str, account_id: int, first_day: Optional[int],
+                  last_day: Optional[int], category: Optional[str], min_cents: Optional[int],
+                  max_cents: Optional[int], sign: Optional[str], sort: str, descending: bool,
+                  after: Optional[Tuple[int, int]], limit: int,
+                  bound: Optional[Tuple[int, int]] = None) -> List[tuple]:
+    """listing.transactions_page over the archive, same row shape and keyset.
+
+    ``bound`` is the key of the last row of a full hot page; only archived
+    rows that sort before it can make it onto the page, so partitions that
+    cannot hold such rows are not read.
+    """
+    column = "day_number" if sort == "date" else "amount_cents"
+    lo_day, hi_day, lo_cents, hi_cents = first_day, last_day, min_cents, max_cents
+    if sign == "debit":
+        hi_cents = -1 if hi_cents is None else min(hi_cents, -1)
+    elif sign == "credit":
+        lo_cents = 1 if lo_cents is None else max(lo_cents, 1)
+    # Rows come after ``after`` and before ``bound`` in page order
+    for key, upper in ((after, descending), (bound, not descending)):
+        if key is None or key[0] is None:
+            continue
+        if sort == "date":
+            if upper:
+                hi_day = key[0] if hi_day is None else min(hi_day, key[0])
+            else:
+                lo_day = key[0] if lo_day is None else max(lo_day, key[0])
+        elif upper:
+            hi_cents = key[0] if hi_cents is None else min(hi_cents, key[0])
+        else:
+            lo_cents = key[0] if lo_cents is None else max(lo_cents, key[0])
+    if (lo_day is not None and hi_day is not None and lo_day > hi_day) or \
+            (lo_cents is not None and hi_cents is not None and lo_cents > hi_cents):
+        return []
+
+    frame = archived_rows(conn, db_path, account_id, lo_day, hi_day, lo_cents, hi_cents)
+    if category is not None:
+        frame = frame[frame["category"] == category]
+    if after is not None:
+        if descending:
+            keyset = (frame[column] < after[0]) | ((frame[column] == after[0]) & (frame["id"] < after[1]))
+        else:
+            keyset = (frame[column] > after[0]) | ((frame[column] == after[0]) & (frame["id"] > after[1]))
+        frame = frame[keyset]
+    frame = frame.sort_values([column, "id"], ascending=not descending).head(limit)
+    return [
+        (int(r.id), r.date, r.description, int(r.amount_cents), r.note, r.category, int(getattr(r, column)))
+        for r in frame.itertuples(index=False)
+    ]
+
+
+def archived_count(conn: sqlite3.Connection, db_path: str, account_id: int, first_day: Optional[int],
+                   last_day: Optional[int], category: Optional[str], min_cents: Optional[int],
+                   max_cents: Optional[int], sign: Optional[str]) -> int:
+    if min_cents is None and max_cents is None and sign is None:
+        # Day totals answer date and category filters without reading partitions
+        conditions, params = ["account_id = ?"], [account_id]
+        for condition, value in (("day_number >= ?", first_day), ("day_number <= ?", last_day),
+                                 ("category = ?", category)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        return conn.execute(f"SELECT COALESCE(SUM(transaction_count), 0) FROM {ARCHIVE_DAYS_TABLE} "
+                            f"WHERE {' AND '.join(conditions)}", params).fetchone()[0]
+    return len(archived_page(conn, db_path, account_id, first_day, last_day, category, min_cents,
+                             max_cents, sign, "date", True, None, 2 ** 62))
+
+
+def search_archive(conn: sqlite3.Connection, db_path: str, text: str, account_id: Optional[int] = None,
+                   first_day: Optional[int] = None, last_day: Optional[int] = None,
+                   min_cents: Optional[int] = None, max_cents: Optional[int] = None,
+                   highlight: Tuple[str, str] = ("", "")) -> List[Dict[str, Any]]:
+    """Archived matches for search_transactions (every word as a prefix), newest first"""
+    tokens = _TOKEN_PATTERN.findall(text or "")
+    if not tokens:
+        return []
+    frame = archived_rows(conn, db_path, account_id, first_day, last_day, min_cents, max_cents)
+    if frame.empty:
+        return []
+    words = [re.compile(rf"(?<!\w){re.escape(token)}", re.IGNORECASE) for token in tokens]
+    searchable = frame["description"].fillna("") + "\n" + frame["note"].fillna("")
+    mask = pd.Series(True, index=frame.index)
+    for word in words:
+        mask &= searchable.str.contains(word)
+    frame = frame[mask].sort_values(["day_number", "id"], ascending=False)
+
+    def mark(value):
+        if not isinstance(value, str):
+            return value
+        for word in words:
+            value = word.sub(lambda m: f"{highlight[0]}{m.group(0)}{highlight[1]}", value)
+        return value
+
+    return [
+        {
+            "id": int(r.id),
+            "account_id": int(r.account_id),
+            "date": r.date,
+            "description": r.description,
+            "amount": cents_to_amount(int(r.amount_cents)),
+            "note": r.note,
+            "category": r.category,
+            "description_highlight": mark(r.description),
+            "note_snippet": mark(r.note),
+            "rank": None,
+        }
+        for r in frame.itertuples(index=False)
+    ]
+
+
+def _day_filters(account_id: Optional[int], first_day: Optional[int], last_day: Optional[int]):
+    conditions, params = [f"account_id NOT IN ({HIDDEN_ACCOUNTS_SQL})"], []
+    for condition, value in (("account_id = ?", account_id), ("day_number >= ?", first_day),
+                             ("day_number <= ?", last_day)):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    return " AND ".join(conditions), params
+
+
+def merge_account_analytics(conn: sqlite3.Connection, result: Dict[str, Any], account_id: int,
+                            first_day: Optional[int], last_day: Optional[int]) -> Dict[str, Any]:
+    """Add archived spending to a get_analytics result"""
+    where, params = _day_filters(account_id, first_day, last_day)
+    monthly = {entry["month"]: entry for entry in result["monthly_spending"]}
+    for month, cents in conn.execute(f"""
+        SELECT strftime('%Y-%m', day_number * 86400, 'unixepoch') AS month, -SUM(spending_cents)
+        FROM {ARCHIVE_DAYS_TABLE} WHERE {where} AND spending_count > 0
+        GROUP BY month
+    """, params):
+        entry = monthly.setdefault(month, {"month": month, "amount": 0.0})
+        entry["amount"] = round(entry["amount"] + cents_to_amount(cents), 2)
+    categories = {entry["category"]: entry for entry in result["categories"]}
+    for category, cents in conn.execute(f"""
+        SELECT category, -SUM(spending_cents) FROM {ARCHIVE_DAYS_TABLE}
+        WHERE {where} AND spending_count > 0 GROUP BY category
+    """, params):
+        entry = categories.setdefault(category, {"category": category, "amount": 0.0})
+        entry["amount"] = round(entry["amount"] + cents_to_amount(cents), 2)
+    result["monthly_spending"] = sorted(monthly.values(), key=lambda entry: entry["month"] or "")
+    result["categories"] = sorted(categories.values(), key=lambda entry: -entry["amount"])
+    return result
+
+
+def merge_ledger_analytics(conn: sqlite3.Connection, result: Dict[str, Any], source: Optional[str],
+                           account_id: Optional[int], first_day: Optional[int],
+                           last_day: Optional[int]) -> Dict[str, Any]:
+    """Add archived bank transactions to a ledger_analytics result"""
+    if source not in (None, "bank"):
+        return result
+    where, params = _day_filters(account_id, first_day, last_day)
+    monthly = {entry["month"]: entry for entry in result["monthly_spending"]}
+    for month, cents in conn.execute(f"""
+        SELECT strftime('%Y-%m', day_number * 86400, 'unixepoch') AS month, -SUM(spending_cents)
+        FROM {ARCHIVE_DAYS_TABLE} WHERE {where} AND spending_count > 0
+        GROUP BY month
+    """, params):
+        entry = monthly.setdefault(month, {"month": month, "amount": 0.0, "by_source": {}})
+        entry["by_source"]["bank"] = round(entry["by_source"].get("bank", 0.0) + cents_to_amount(cents), 2)
+        entry["amount"] = round(entry["amount"] + cents_to_amount(cents), 2)
+    categories = {entry["category"]: entry for entry in result["categories"]}
+    for category, cents, count in conn.execute(f"""
+        SELECT category, -SUM(spending_cents), SUM(spending_count) FROM {ARCHIVE_DAYS_TABLE}
+        WHERE {where} AND spending_count > 0 GROUP BY category
+    """, params):
+        entry = categories.setdefault(category, {"category": category, "amount": 0.0, "transaction_count": 0})
+        entry["amount"] = round(entry["amount"] + cents_to_amount(cents), 2)
+        entry["transaction_count"] += count
+    spending, total, count = conn.execute(f"""
+        SELECT -SUM(spending_cents), SUM(amount_cents), SUM(transaction_count)
+        FROM {ARCHIVE_DAYS_TABLE} WHERE {where}
+    """, params).fetchone()
+    if count:
+        bank = result["sources"].setdefault("bank", {"spending": 0.0, "income": 0.0, "transaction_count": 0})
+        bank["spending"] = round(bank["spending"] + cents_to_amount(spending), 2)
+        bank["income"] = round(bank["income"] + cents_to_amount(total + spending), 2)
+        bank["transaction_count"] += count
+    result["monthly_spending"] = sorted(monthly.values(), key=lambda entry: entry["month"] or "")
+    result["categories"] = sorted(categories.values(), key=lambda entry: -entry["amount"])
+    return result
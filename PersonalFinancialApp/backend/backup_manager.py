@@ -4,27 +4,74 @@ import os
 from datetime import datetime
 from pathlib import Path
 
+import pandas as pd
+
+from database import ConnectionPool, current_tenant, db as shared_db, use_tenant
+from ingest import cents_to_amount, normalize_dates, parse_amounts, sql_values
+from raw_store import fetch_raw, store_raw
+from descriptions import description_sql, intern_descriptions
+from archive import archived_rows
+from balances import display_balance, display_balance_sql
+
+# Transaction fields read back from a backup file
+RESTORE_COLUMNS = ['account_id', 'date', 'description', 'amount', 'category', 'note', 'raw_data']
+
+
+class InvalidBackupError(ValueError):
+    """A backup file whose transactions cannot be restored as they are"""
+
+
 class BackupManager:
-    def __init__(self, db_path="./data/finance.db", backup_dir="./backups"):
-        self.db_path = db_path
-        self.backup_dir = Path(backup_dir)
-        self.backup_dir.mkdir(exist_ok=True)
+    def __init__(self, db=None, backup_dir="./backups"):
+        # Accept a connection pool (normally the shared one) or a database path
+        if db is None:
+            db = shared_db
+        elif isinstance(db, str):
+            db = ConnectionPool(db)
+        self.db = db
+        self.root_dir = Path(backup_dir)
+        self.root_dir.mkdir(exist_ok=True)
+
+    @property
+    def backup_dir(self):
+        """Backups of the current household live in their own directory"""
+        tenant = current_tenant()
+        if tenant is None:
+            return self.root_dir
+        directory = self.root_dir / "households" / tenant
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    def backup_path(self, filename):
+        """Path of a backup file of the current household"""
+        return str(self.backup_dir / filename)
+
+    def backup_all(self):
+        """Back up every bank of every household; returns the files written"""
+        shards = self.db.each_shard() if hasattr(self.db, "each_shard") else [(None, self.db)]
+        files = []
+        for tenant, pool in shards:
+            with use_tenant(tenant):
+                with pool.connection() as conn:
+                    bank_ids = [row[0] for row in conn.execute("SELECT id FROM banks WHERE deleted_at IS NULL ORDER BY id")]
+                for bank_id in bank_ids:
+                    files.append({"household": tenant, "bank_id": bank_id, "backup_file": self.backup_bank(bank_id)})
+        return files
     
     def backup_bank(self, bank_id, bank_name=None):
         """Backup all data for a specific bank"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        try:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            
             # Get bank info with calculated counts
             cursor.execute("""
                 SELECT b.id, b.name, b.created_at,
                        COUNT(a.id) as account_count,
-                       COALESCE(SUM(a.balance), 0) as total_balance
+                       COALESCE(SUM(""" + display_balance_sql("a") + """), 0) / 100.0 as total_balance
                 FROM banks b 
-                LEFT JOIN accounts a ON b.id = a.bank_id 
-                WHERE b.id = ?
+                LEFT JOIN accounts a ON b.id = a.bank_id AND a.deleted_at IS NULL
+                WHERE b.id = ? AND b.deleted_at IS NULL
                 GROUP BY b.id, b.name, b.created_at
             """, (bank_id,))
             bank_row = cursor.fetchone()
@@ -35,16 +82,36 @@ class BackupManager:
             backup_name = bank_name or bank_data['name']
             
             # Get accounts for this bank
-            cursor.execute("SELECT * FROM accounts WHERE bank_id = ?", (bank_id,))
+            cursor.execute("SELECT * FROM accounts WHERE bank_id = ? AND deleted_at IS NULL", (bank_id,))
             accounts = [dict(row) for row in cursor.fetchall()]
+            # Backup files keep amounts in dollars, independent of the storage format
+            for account in accounts:
+                account['balance'] = cents_to_amount(display_balance(account['account_type'], account.pop('balance_cents')))
+                account.pop('deleted_at', None)
             
             # Get transactions for all accounts of this bank
             account_ids = [acc['id'] for acc in accounts]
             transactions = []
             if account_ids:
-                placeholders = ','.join('?' * len(account_ids))
-                cursor.execute(f"SELECT * FROM transactions WHERE account_id IN ({placeholders})", account_ids)
+                # Accounts waiting for the background purge are not part of the bank any more
+                cursor.execute(f"""
+                    SELECT *, {description_sql('transactions')} AS description
+                    FROM transactions WHERE account_id IN (
+                        SELECT id FROM accounts WHERE bank_id = ? AND deleted_at IS NULL
+                    )
+                """, (bank_id,))
                 transactions = [dict(row) for row in cursor.fetchall()]
+                raw = fetch_raw(conn, [transaction['id'] for transaction in transactions])
+                for transaction in transactions:
+                    transaction['amount'] = cents_to_amount(transaction.pop('amount_cents'))
+                    del transaction['description_id']
+                    transaction['raw_data'] = raw.get(transaction['id'])
+                # Archived months are part of the backup; a restore brings them back as live rows
+                for account_id in account_ids:
+                    for row in archived_rows(conn, self.db.db_path, account_id).to_dict('records'):
+                        row['id'], row['account_id'], row['day_number'] = int(row['id']), int(row['account_id']), int(row['day_number'])
+                        row['amount'] = cents_to_amount(int(row.pop('amount_cents')))
+                        transactions.append(row)
             
             # Create backup data structure
             backup_data = {
@@ -69,9 +136,6 @@ class BackupManager:
                 json.dump(backup_data, f, indent=2, default=str)
             
             return str(backup_path)
-            
-        finally:
-            conn.close()
     
     def restore_bank(self, backup_file, new_bank_name=None):
         """Restore bank data from backup file"""
@@ -82,12 +146,25 @@ class BackupManager:
         with open(backup_path, 'r') as f:
             backup_data = json.load(f)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Dates and amounts are parsed a column at a time before the write
+        # transaction opens. Older backups carry raw bank dates, which are
+        # normalized; a value that does not parse refuses the whole restore
+        # rather than coming back as a $0.00 transaction.
+        rows = pd.DataFrame(backup_data['transactions'], columns=RESTORE_COLUMNS)
+        iso_dates, day_numbers, _ = normalize_dates(rows['date'].astype(object))
+        amounts = parse_amounts(rows['amount'])
+        unreadable = (day_numbers.isna() | amounts.isna()).to_numpy()
+        if unreadable.any():
+            first = rows[unreadable].iloc[0]
+            raise InvalidBackupError(
+                f"{int(unreadable.sum())} transactions in the backup have a date or amount that cannot be read "
+                f"(the first has date {first['date']!r} and amount {first['amount']!r}); nothing was restored"
+            )
+        rows['date'], rows['day_number'], rows['amount_cents'] = iso_dates, day_numbers, amounts
+        rows['category'] = rows['category'].fillna('Uncategorized')
         
-        try:
-            # Start transaction
-            conn.execute("BEGIN")
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
             
             # Insert bank (with new name if provided)
             bank_data = backup_data['bank'].copy()
@@ -111,43 +188,35 @@ class BackupManager:
             for account in backup_data['accounts']:
                 original_account_id = account['id']
                 cursor.execute("""
-                    INSERT INTO accounts (bank_id, name, account_type, balance, created_at)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (new_bank_id, account['name'], account['account_type'], 
-                      account['balance'], account.get('created_at')))
+                    INSERT INTO accounts (bank_id, name, account_type, created_at)
+                    VALUES (?, ?, ?, ?)
+                """, (new_bank_id, account['name'], account['account_type'], account.get('created_at')))
                 
                 new_account_id = cursor.lastrowid
                 account_id_mapping[original_account_id] = new_account_id
             
-            # Insert transactions
-            for transaction in backup_data['transactions']:
-                old_account_id = transaction['account_id']
-                new_account_id = account_id_mapping.get(old_account_id)
-                
-                if new_account_id:
-                    cursor.execute("""
-                        INSERT INTO transactions (account_id, date, description, amount, category, note, raw_data)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (new_account_id, transaction['date'], transaction['description'],
-                          transaction['amount'], transaction.get('category', 'Uncategorized'), 
-                          transaction.get('note'), transaction.get('raw_data')))
-            
-            # Commit transaction
-            conn.commit()
+            # Insert transactions in one executemany (the balance triggers rebuild each account's balance)
+            rows['account_id'] = rows['account_id'].map(account_id_mapping)
+            rows = rows[rows['account_id'].notna()]
+            if not rows.empty:
+                description_ids = intern_descriptions(cursor, sql_values(rows['description']))
+                cursor.executemany("""
+                    INSERT INTO transactions (account_id, date, day_number, description_id, amount_cents, category, note)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, zip(sql_values(rows['account_id'].astype('int64')), rows['date'].tolist(),
+                         sql_values(rows['day_number']), description_ids, sql_values(rows['amount_cents']),
+                         rows['category'].tolist(), sql_values(rows['note'])))
+                # Inside one write transaction the new rows got consecutive ids
+                last_id = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'").fetchone()[0]
+                store_raw(cursor, zip(range(last_id - len(rows) + 1, last_id + 1), sql_values(rows['raw_data'])))
             
             return {
                 'success': True,
                 'new_bank_id': new_bank_id,
                 'bank_name': bank_data['name'],
                 'accounts_restored': len(backup_data['accounts']),
-                'transactions_restored': len(backup_data['transactions'])
+                'transactions_restored': len(rows)
             }
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
     
     def list_backups(self):
         """List all available backup files"""
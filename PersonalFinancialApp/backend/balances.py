@@ -0,0 +1,174 @@
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from archive import ARCHIVE_DAYS_TABLE
+from descriptions import description_sql
+
+# accounts.balance_cents holds the plain sum of the account's transactions,
+# archived ones included (see archive.py), and is kept current by these
+# triggers, so reading a balance never scans history.
+BALANCE_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS transactions_balance_insert AFTER INSERT ON transactions BEGIN
+        UPDATE accounts SET balance_cents = balance_cents + new.amount_cents WHERE id = new.account_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transactions_balance_delete AFTER DELETE ON transactions BEGIN
+        UPDATE accounts SET balance_cents = balance_cents - old.amount_cents WHERE id = old.account_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transactions_balance_update
+    AFTER UPDATE OF amount_cents, account_id ON transactions BEGIN
+        UPDATE accounts SET balance_cents = balance_cents - old.amount_cents WHERE id = old.account_id;
+        UPDATE accounts SET balance_cents = balance_cents + new.amount_cents WHERE id = new.account_id;
+    END""",
+]
+
+# Credit cards show what is owed as a negative balance whichever sign
+# convention the statement used. Applied when balances are read.
+DISPLAY_BALANCE_SQL = (
+    "CASE WHEN {alias}account_type = 'credit' THEN -ABS({alias}balance_cents) ELSE {alias}balance_cents END"
+)
+
+# How often maintenance.py recounts every balance (0 disables)
+VERIFY_INTERVAL = int(os.environ.get("FINANCE_BALANCE_VERIFY_INTERVAL", "3600"))
+
+
+def display_balance_sql(alias: str = "") -> str:
+    """SQL expression for an account's displayed balance in cents (``alias`` e.g. ``"a"``)"""
+    return DISPLAY_BALANCE_SQL.format(alias=f"{alias}." if alias else "")
+
+
+def display_balance(account_type: str, balance_cents: int) -> int:
+    return -abs(balance_cents) if account_type == "credit" else balance_cents
+
+
+def ensure_balance_triggers(conn: sqlite3.Connection):
+    for sql in BALANCE_TRIGGERS:
+        conn.execute(sql)
+
+
+def recompute_balances(conn: sqlite3.Connection, account_ids: Optional[List[int]] = None,
+                       include_archive: bool = True):
+    """Reset stored balances to the sum of their transactions.
+
+    ``include_archive=False`` is for migrations that run before the archive tables exist.
+    """
+    where, params = "", []
+    if account_ids:
+        where = f" WHERE id IN ({','.join('?' * len(account_ids))})"
+        params = list(account_ids)
+    archived = ""
+    if include_archive:
+        archived = f""" + COALESCE(
+            (SELECT SUM(d.amount_cents) FROM {ARCHIVE_DAYS_TABLE} d WHERE d.account_id = accounts.id), 0
+        )"""
+    conn.execute(f"""
+        UPDATE accounts SET balance_cents = COALESCE(
+            (SELECT SUM(t.amount_cents) FROM transactions t WHERE t.account_id = accounts.id), 0
+        ){archived}{where}
+    """, params)
+
+
+def verify_balances(conn: sqlite3.Connection, repair: bool = False) -> Dict[str, Any]:
+    """Compare stored balances with a full recount; optionally repair any drift"""
+    drift = [
+        {"account_id": row[0], "stored_cents": row[1], "actual_cents": row[2]}
+        for row in conn.execute(f"""
+            SELECT a.id, a.balance_cents,
+                   COALESCE(SUM(t.amount_cents), 0) + COALESCE(
+                       (SELECT SUM(d.amount_cents) FROM {ARCHIVE_DAYS_TABLE} d WHERE d.account_id = a.id), 0
+                   ) AS actual
+            FROM accounts a
+            LEFT JOIN transactions t ON t.account_id = a.id
+            GROUP BY a.id
+            HAVING a.balance_cents != actual
+        """)
+    ]
+    if drift and repair:
+        recompute_balances(conn, [entry["account_id"] for entry in drift])
+    return {"accounts_checked": conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0],
+            "drift": drift, "repaired": bool(drift and repair)}
+
+
+def opening_balance(conn: sqlite3.Connection, account_id: int, before_day: Optional[int]) -> int:
+    """Sum of the account's dated transactions, archived ones included, before ``before_day``"""
+    if before_day is None:
+        return 0
+    return conn.execute(f"""
+        SELECT (SELECT COALESCE(SUM(amount_cents), 0) FROM transactions WHERE account_id = ? AND day_number < ?)
+             + (SELECT COALESCE(SUM(amount_cents), 0) FROM {ARCHIVE_DAYS_TABLE} WHERE account_id = ? AND day_number < ?)
+    """, (account_id, before_day, account_id, before_day)).fetchone()[0]
+
+
+def archived_day_totals(conn: sqlite3.Connection, account_id: int, first_day: int, last_day: int) -> List[Tuple[int, int]]:
+    """``(day_number, amount_cents)`` of archived transactions per day in the range"""
+    return conn.execute(f"""
+        SELECT day_number, SUM(amount_cents) FROM {ARCHIVE_DAYS_TABLE}
+        WHERE account_id = ? AND day_number BETWEEN ? AND ?
+        GROUP BY day_number ORDER BY day_number
+    """, (account_id, first_day, last_day)).fetchall()
+
+
+def add_archived_to_running(rows: List[tuple], archived: List[Tuple[int, int]]) -> List[tuple]:
+    """Fold archived day totals into running_balance_page rows.
+
+    Archived transactions are not listed, but each listed row's running
+    balance includes those archived on or before its day.
+    """
+    if not archived:
+        return rows
+    result, carried, index = [], 0, 0
+    for row in rows:
+        while index < len(archived) and row[2] is not None and archived[index][0] <= row[2]:
+            carried += archived[index][1]
+            index += 1
+        result.append((*row[:6], row[6] + carried))
+    return result
+
+
+def running_balance_page(conn: sqlite3.Connection, account_id: int, opening_cents: int,
+                         after: Tuple[int, int], last_day: int, limit: int) -> List[tuple]:
+    """One page of ``(id, date, day_number, description, amount_cents, category, running_cents)``.
+
+    Rows come in (day_number, id) order starting after the ``after`` key; the
+    window sum runs in the same order as the (account_id, day_number) index,
+    so each page is a single index range scan.
+    """
+    return conn.execute(f"""
+        SELECT id, date, day_number, {description_sql('transactions')}, amount_cents, category,
+               ? + SUM(amount_cents) OVER (ORDER BY day_number, id ROWS UNBOUNDED PRECEDING)
+        FROM transactions
+        WHERE account_id = ? AND (day_number, id) > (?, ?) AND day_number <= ?
+        ORDER BY day_number, id
+        LIMIT ?
+    """, (opening_cents, account_id, after[0], after[1], last_day, limit)).fetchall()
+
+
+def daily_balance_page(conn: sqlite3.Connection, account_id: int, opening_cents: int,
+                       after_day: int, last_day: int, limit: int) -> List[tuple]:
+    """One page of ``(day_number, transaction_count, net_cents, closing_cents)`` per day with activity"""
+    if conn.execute(f"SELECT 1 FROM {ARCHIVE_DAYS_TABLE} WHERE account_id = ? AND day_number > ? AND day_number <= ?",
+                    (account_id, after_day, last_day)).fetchone():
+        # Archived days in range: combine them with the live ones
+        return conn.execute(f"""
+            SELECT day_number, SUM(n), SUM(cents),
+                   ? + SUM(SUM(cents)) OVER (ORDER BY day_number ROWS UNBOUNDED PRECEDING)
+            FROM (
+                SELECT day_number, 1 AS n, amount_cents AS cents FROM transactions
+                WHERE account_id = ? AND day_number > ? AND day_number <= ?
+                UNION ALL
+                SELECT day_number, transaction_count, amount_cents FROM {ARCHIVE_DAYS_TABLE}
+                WHERE account_id = ? AND day_number > ? AND day_number <= ?
+            )
+            GROUP BY day_number
+            ORDER BY day_number
+            LIMIT ?
+        """, (opening_cents, account_id, after_day, last_day, account_id, after_day, last_day, limit)).fetchall()
+    return conn.execute("""
+        SELECT day_number, COUNT(*), SUM(amount_cents),
+               ? + SUM(SUM(amount_cents)) OVER (ORDER BY day_number ROWS UNBOUNDED PRECEDING)
+        FROM transactions
+        WHERE account_id = ? AND day_number > ? AND day_number <= ?
+        GROUP BY day_number
+        ORDER BY day_number
+        LIMIT ?
+    """, (opening_cents, account_id, after_day, last_day, limit)).fetchall()
@@ -0,0 +1,238 @@
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from importer import IMPORT_CHUNK_ROWS, insert_transactions, prepare_transactions, read_csv
+
+# Bulk import of many statement files at once: zip archives of CSVs (and PDF
+# statements), or the files themselves. Parsing (CSV tokenizing, PDF text
+# extraction, date and amount parsing) runs in a process pool, a few files
+# ahead of the writer. Results are taken back in file-name order, so months
+# land in order, and merged into commits of IMPORT_CHUNK_ROWS rows, so
+# dozens of small monthly files cost a few write transactions, not dozens.
+#
+# CSVs are read with a mapping profile: one column mapping, or several tried
+# in order, for banks whose export headers changed over the years. Each file
+# uses the first mapping whose columns it has.
+IMPORT_PROCESSES = int(os.environ.get("FINANCE_IMPORT_PROCESSES", "0")) or os.cpu_count() or 1
+MAX_ARCHIVE_FILES = int(os.environ.get("FINANCE_ARCHIVE_MAX_FILES", "1000"))
+MAX_ARCHIVE_BYTES = int(os.environ.get("FINANCE_ARCHIVE_MAX_MB", "2048")) * 1024 * 1024   # uncompressed
+FILE_REJECTS_RETURNED = 20
+STATEMENT_TYPES = (".csv", ".pdf")
+# Columns of the transactions CreditCardParser extracts from a PDF
+PDF_MAPPING = {"date": "date", "description": "description", "amount": "amount"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _natural_key(name: str):
+    # "statement-2.csv" sorts before "statement-10.csv"
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def list_statement_files(paths: List[str]) -> Tuple[List[Tuple[str, Optional[str], str, str]], List[Dict[str, str]]]:
+    """Statement files in uploaded files, as ``(path, zip member or None, name, key)`` in name order, plus skipped files.
+
+    ``key`` identifies the file for resume checkpoints: the upload's position
+    and name, the full member path and the member's CRC (the size for plain
+    uploads), so equally named statements in different folders or zips are
+    told apart. Raises ValueError for an unreadable zip or one over the size limits.
+    """
+    files, skipped, total_bytes = [], [], 0
+    for position, path in enumerate(paths):
+        name = os.path.basename(path)
+        if not name.lower().endswith(".zip"):
+            files.append((path, None, name, f"{position}:{name}:{os.path.getsize(path)}"))
+            continue
+        try:
+            with zipfile.ZipFile(path) as archive:
+                members = archive.infolist()
+        except zipfile.BadZipFile:
+            raise ValueError(f"{name} is not a valid zip archive")
+        for info in members:
+            member_name = os.path.basename(info.filename)
+            if info.is_dir() or info.filename.startswith("__MACOSX/") or member_name.startswith("."):
+                continue
+            if not member_name.lower().endswith(STATEMENT_TYPES):
+                skipped.append({"name": info.filename, "reason": "Not a CSV or PDF file"})
+                continue
+            total_bytes += info.file_size
+            files.append((path, info.filename, info.filename, f"{position}:{name}/{info.filename}:{info.CRC:08x}"))
+
+    if len(files) > MAX_ARCHIVE_FILES:
+        raise ValueError(f"Too many files ({len(files)}); the limit is {MAX_ARCHIVE_FILES}")
+    if total_bytes > MAX_ARCHIVE_BYTES:
+        raise ValueError(f"Archive expands to {total_bytes // (1024 * 1024)} MB; the limit is "
+                         f"{MAX_ARCHIVE_BYTES // (1024 * 1024)} MB")
+    files.sort(key=lambda file: _natural_key(file[2]))
+    return files, skipped
+
+
+def choose_mapping(columns: List[str], mappings: List[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    """The first mapping whose mapped columns are all present"""
+    for mapping in mappings:
+        if all(column in columns for column in mapping.values() if column):
+            return mapping
+    return None
+
+
+def _pdf_frame(path: str) -> pd.DataFrame:
+    from credit_card_parser import CreditCardParser
+
+    parsed = CreditCardParser().parse_statement(path, debug=False)
+    if "error" in parsed:
+        raise ValueError(parsed["error"])
+    return pd.DataFrame(parsed.get("transactions", []), columns=list(PDF_MAPPING.values()), dtype=object)
+
+
+def parse_statement_file(path: str, member: Optional[str], name: str, mappings: List[Dict[str, str]],
+                         date_format: Optional[str]) -> Dict[str, Any]:
+    """Read and prepare one file (runs in a worker process); errors come back in the result, not raised"""
+    result: Dict[str, Any] = {"name": name, "type": "pdf" if name.lower().endswith(".pdf") else "csv"}
+    try:
+        with tempfile.TemporaryDirectory() as scratch:
+            if member is not None:
+                with zipfile.ZipFile(path) as archive:
+                    path = archive.extract(member, scratch)
+            if result["type"] == "pdf":
+                df, mapping = _pdf_frame(path), PDF_MAPPING
+            else:
+                df = read_csv(path)
+                mapping = choose_mapping(df.columns.tolist(), mappings)
+                if mapping is None:
+                    raise ValueError(f"No mapping in the profile matches its columns {df.columns.tolist()}")
+        rows, rejects, date_format = prepare_transactions(df, mapping, date_format)
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+    result.update(rows=rows, rejects=rejects, date_format=date_format, total_rows=len(df), mapping=mapping)
+    return result
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: the server process has database and writer threads
+            _pool = ProcessPoolExecutor(max_workers=IMPORT_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _parse_in_order(files: List[Tuple[str, Optional[str], str, str]], mappings: List[Dict[str, str]],
+                    date_format: Optional[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """``(key, parse result)`` in file order, keeping only a few files per worker in flight"""
+    pool = _process_pool()
+    pending = iter(files)
+
+    def submit(file) -> Tuple[str, Future]:
+        path, member, name, key = file
+        return key, pool.submit(parse_statement_file, path, member, name, mappings, date_format)
+
+    window: Deque[Tuple[str, Future]] = deque(submit(file) for file in islice(pending, IMPORT_PROCESSES * 2))
+    try:
+        while window:
+            key, future = window.popleft()
+            try:
+                result = future.result()
+            except Exception:
+                # A worker died (BrokenProcessPool); start a fresh pool next time
+                _reset_pool()
+                raise
+            file = next(pending, None)
+            if file is not None:
+                window.append(submit(file))
+            yield key, result
+    finally:
+        for _, future in window:
+            future.cancel()
+
+
+def _take(pending: Deque[List[Any]], count: int) -> List[Tuple[Tuple[Dict[str, Any], str], pd.DataFrame]]:
+    """Cut up to ``count`` rows off the front of the pending ((summary, key), rows) pairs"""
+    pieces = []
+    while count and pending:
+        summary, rows = pending[0]
+        piece = rows.iloc[:count]
+        pieces.append((summary, piece))
+        if len(piece) == len(rows):
+            pending.popleft()
+        else:
+            pending[0][1] = rows.iloc[count:]
+        count -= len(piece)
+    return pieces
+
+
+def import_statement_files(db, account_id: int, paths: List[str], mappings: List[Dict[str, str]],
+                           chunk_rows: int = IMPORT_CHUNK_ROWS, committed: Optional[Dict[str, int]] = None,
+                           on_commit: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Import every statement file in ``paths`` into one account; returns the per-file summary.
+
+    ``committed`` maps file keys (see list_statement_files) to rows already
+    imported by an earlier attempt, which are skipped. ``on_commit`` is called with the running
+    summary after every commit (and after every failed file).
+    """
+    committed = dict(committed or {})
+    files, skipped = list_statement_files(paths)
+    with db.connection() as conn:
+        known_format = conn.execute("SELECT date_format FROM accounts WHERE id = ?", (account_id,)).fetchone()[0]
+
+    summary: Dict[str, Any] = {"files": [], "skipped": skipped, "imported": 0, "rejected_count": 0,
+                               "commits": 0, "committed": committed}
+    pending: Deque[List[Any]] = deque()
+    new_format = None
+
+    def commit(count: int):
+        pieces = _take(pending, count)
+        with db.transaction() as conn:
+            insert_transactions(conn, account_id, pd.concat([rows for _, rows in pieces]))
+            if new_format and not known_format:
+                conn.execute("UPDATE accounts SET date_format = ? WHERE id = ?", (new_format, account_id))
+        for (file_summary, key), rows in pieces:
+            file_summary["imported"] += len(rows)
+            committed[key] = file_summary["imported"]
+            summary["imported"] += len(rows)
+        summary["commits"] += 1
+        if on_commit:
+            on_commit(summary)
+
+    for key, result in _parse_in_order(files, mappings, known_format):
+        file_summary = {key: result[key] for key in ("name", "type")}
+        summary["files"].append(file_summary)
+        if "error" in result:
+            file_summary.update(status="failed", error=result["error"])
+            if on_commit:
+                on_commit(summary)
+            continue
+        new_format = new_format or result["date_format"]
+        already = committed.get(key, 0)
+        file_summary.update(status="imported", rows=result["total_rows"], imported=already,
+                            rejected_count=len(result["rejects"]), rejected=result["rejects"][:FILE_REJECTS_RETURNED])
+        if result["type"] == "csv":
+            file_summary["mapping"] = result["mapping"]
+        summary["rejected_count"] += len(result["rejects"])
+        summary["imported"] += already
+        pending.append([(file_summary, key), result["rows"].iloc[already:]])
+        while sum(len(rows) for _, rows in pending) >= chunk_rows:
+            commit(chunk_rows)
+    remaining = sum(len(rows) for _, rows in pending)
+    if remaining:
+        commit(remaining)
+    return summary
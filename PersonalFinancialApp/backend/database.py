@@ -0,0 +1,899 @@
+import asyncio
+import contextvars
+import functools
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+def _database_path_from_env() -> str:
+    """Resolve the SQLite file from DATABASE_URL (sqlite:///path) or fall back to data/finance.db"""
+    url = os.environ.get("DATABASE_URL", "")
+    if url.startswith("sqlite:///"):
+        return url[len("sqlite:///"):]
+    return "data/finance.db"
+
+
+DATABASE_PATH = _database_path_from_env()
+POOL_SIZE = int(os.environ.get("FINANCE_DB_POOL_SIZE", "8"))
+# Writes already queued when the writer is free share one commit; a window
+# (milliseconds) makes the writer wait for more before committing
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get("FINANCE_DB_GROUP_COMMIT_MS", "0"))
+GROUP_COMMIT_MAX_JOBS = int(os.environ.get("FINANCE_DB_GROUP_COMMIT_MAX", "64"))
+
+# Households (tenants) chosen with the X-Household header or a /h/<name>/
+# path prefix get their own database file in SHARD_DIR; requests without
+# one use DATABASE_PATH
+SHARD_DIR = os.environ.get("FINANCE_SHARD_DIR") or os.path.join(os.path.dirname(DATABASE_PATH), "households")
+MAX_OPEN_SHARDS = int(os.environ.get("FINANCE_MAX_OPEN_SHARDS", "32"))
+SHARD_POOL_SIZE = int(os.environ.get("FINANCE_SHARD_POOL_SIZE", "4"))
+TENANT_HEADER = "X-Household"
+_TENANT_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+_current_tenant: contextvars.ContextVar = contextvars.ContextVar("finance_household", default=None)
+
+# PRAGMA settings applied to every connection when it is opened. All profiles
+# use WAL so readers keep being served while an import or restore commits;
+# they differ in how much durability they trade for write speed.
+STORAGE_PROFILES = {
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 10000,
+        "cache_size": -16000,        # KiB (negative) -> ~16 MB page cache
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "wal_autocheckpoint": 1000,
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -64000,
+        "mmap_size": 268435456,      # 256 MB
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 1000,
+    },
+    "bulk-load": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "busy_timeout": 30000,
+        "cache_size": -262144,
+        "mmap_size": 1073741824,     # 1 GB
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 10000,
+    },
+}
+STORAGE_PROFILE = os.environ.get("FINANCE_DB_PROFILE", "balanced")
+
+
+def apply_storage_profile(conn: sqlite3.Connection, profile: str):
+    """Apply the PRAGMA settings of a named storage profile to a connection"""
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile '{profile}'. Available: {sorted(STORAGE_PROFILES)}")
+    for pragma, value in STORAGE_PROFILES[profile].items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+
+
+def storage_stats(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Database file size and the space taken by each table and its indexes"""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    stats = {
+        "database_bytes": page_size * page_count,
+        "free_bytes": page_size * free_pages,
+    }
+    try:
+        # Needs SQLITE_ENABLE_DBSTAT_VTAB, which most builds (including Python's) have
+        stats["tables"] = {
+            name: size for name, size in conn.execute(
+                "SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name "
+                "GROUP BY m.tbl_name ORDER BY 2 DESC"
+            )
+        }
+    except sqlite3.OperationalError:
+        pass
+    return stats
+
+
+class _WriteJob:
+    """One ``transaction()`` block waiting for, holding, or done with the writer connection"""
+
+    __slots__ = ("conn", "error", "failed", "granted", "finished", "committed", "enqueued_at", "exclusive")
+
+    def __init__(self, exclusive: bool = False):
+        self.exclusive = exclusive
+        self.conn = None
+        self.error = None
+        self.failed = False
+        self.granted = threading.Event()
+        self.finished = threading.Event()
+        self.committed = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class WriteQueue:
+    """Serializes every write through one connection owned by a writer thread.
+
+    Callers queue up; the writer opens one transaction for as many queued
+    jobs as arrive within the group-commit window, hands its connection to
+    each caller in turn inside a savepoint, and commits once for the batch.
+    A job that raises only rolls back its own savepoint. Callers return
+    after the shared commit, so a write is durable when ``transaction()``
+    exits.
+
+    Exclusive jobs (``ConnectionPool.exclusive()``) get the connection
+    between batches with no transaction open, for VACUUM and checkpoints.
+    ``stop()`` closes the connection once the queue drains; a later job
+    starts a new writer thread.
+    """
+
+    SAVEPOINT = "write_job"
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection],
+                 window_ms: float = GROUP_COMMIT_WINDOW_MS, max_jobs: int = GROUP_COMMIT_MAX_JOBS):
+        self._connect = connect
+        self.window = window_ms / 1000
+        self.max_jobs = max_jobs
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {
+            "jobs": 0,
+            "failed_jobs": 0,
+            "commits": 0,
+            "max_queue_depth": 0,
+            "max_jobs_per_commit": 0,
+            "total_queue_wait_ms": 0.0,
+            "max_queue_wait_ms": 0.0,
+            "total_commit_ms": 0.0,
+            "max_commit_ms": 0.0,
+            "exclusive_jobs": 0,
+            "rows_changed": 0,
+        }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, exclusive: bool = False) -> _WriteJob:
+        """Queue a job and block until the writer grants it the connection"""
+        job = _WriteJob(exclusive)
+        # Queued before the thread check, so a stopping writer either sees the
+        # job or has already exited and a new one is started
+        self._queue.put(job)
+        self._ensure_started()
+        with self._lock:
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue.qsize())
+        job.granted.wait()
+        if job.error is not None:
+            raise job.error
+        return job
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_jobs:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def stop(self):
+        """Close the writer connection and end the thread once queued jobs are done"""
+        self._queue.put(None)
+
+    def _exit_if_idle(self, conn: Optional[sqlite3.Connection]) -> bool:
+        with self._lock:
+            if not self._queue.empty():
+                return False
+            self._thread = None
+        if conn is not None:
+            conn.close()
+        return True
+
+    def _run(self):
+        conn = None
+        while True:
+            batch = self._next_batch()
+            stopping = None in batch
+            batch = [job for job in batch if job is not None]
+            if not batch:
+                if self._exit_if_idle(conn):
+                    return
+                continue
+            try:
+                if conn is None:
+                    conn = self._connect()
+            except Exception as e:
+                for job in batch:
+                    job.error = e
+                    job.granted.set()
+                if stopping and self._exit_if_idle(None):
+                    return
+                continue
+            changes = conn.total_changes
+            writes = [job for job in batch if not job.exclusive]
+            if writes:
+                conn = self._commit_batch(conn, writes)
+            for job in batch:
+                if not job.exclusive:
+                    continue
+                if conn is None:
+                    job.error = sqlite3.OperationalError("Writer connection was reset")
+                    job.granted.set()
+                else:
+                    self._run_exclusive(conn, job)
+            if conn is not None:
+                with self._lock:
+                    self._stats["rows_changed"] += conn.total_changes - changes
+            if stopping and self._exit_if_idle(conn):
+                return
+
+    def _run_exclusive(self, conn: sqlite3.Connection, job: _WriteJob):
+        self._record_wait((time.perf_counter() - job.enqueued_at) * 1000)
+        job.conn = conn
+        job.granted.set()
+        job.finished.wait()
+        conn.row_factory = None
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._stats["exclusive_jobs"] += 1
+        job.committed.set_result(None)
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list) -> Optional[sqlite3.Connection]:
+        """Run one group commit; returns the connection, or None if it had to be closed"""
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except Exception as e:
+            for job in batch:
+                job.error = e
+                job.granted.set()
+            return conn
+
+        succeeded = []
+        for position, job in enumerate(batch):
+            granted_at = time.perf_counter()
+            self._record_wait((granted_at - job.enqueued_at) * 1000)
+            try:
+                conn.execute(f"SAVEPOINT {self.SAVEPOINT}")
+            except Exception as e:
+                job.error = e
+                job.granted.set()
+                continue
+            job.conn = conn
+            job.granted.set()
+            job.finished.wait()
+            conn.row_factory = None
+
+            try:
+                if not conn.in_transaction:
+                    # The job's error rolled back the whole transaction, including
+                    # earlier jobs, or the block committed or rolled back itself
+                    if job.failed:
+                        lost = sqlite3.OperationalError("Write rolled back by a failure in the same group commit")
+                    else:
+                        lost = sqlite3.OperationalError("A transaction() block ended the group transaction itself")
+                    for done in succeeded + [job]:
+                        done.committed.set_exception(lost)
+                    succeeded = []
+                    conn.execute("BEGIN IMMEDIATE")
+                elif job.failed:
+                    conn.execute(f"ROLLBACK TO {self.SAVEPOINT}")
+                    conn.execute(f"RELEASE {self.SAVEPOINT}")
+                else:
+                    conn.execute(f"RELEASE {self.SAVEPOINT}")
+                    succeeded.append(job)
+            except Exception as e:
+                # e.g. the block released the savepoint itself; the writer thread must survive
+                return self._abort_batch(conn, e, succeeded + [job], batch[position + 1:])
+
+        start = time.perf_counter()
+        try:
+            conn.commit()
+            error = None
+        except Exception as e:
+            error = e
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                conn.close()
+                conn = None
+        commit_ms = (time.perf_counter() - start) * 1000
+        self._record_commit(len(batch), len(batch) - len(succeeded), commit_ms)
+        for job in succeeded:
+            if error is None:
+                job.committed.set_result(None)
+            else:
+                job.committed.set_exception(error)
+        return conn
+
+    def _abort_batch(self, conn: sqlite3.Connection, error: Exception, finished: list,
+                     waiting: list) -> Optional[sqlite3.Connection]:
+        """Fail every job of a group commit whose savepoint handling raised and roll it back.
+
+        Returns the connection, or None if even the rollback failed and it was closed.
+        """
+        for job in finished:
+            if not job.committed.done():
+                job.committed.set_exception(error)
+        for job in waiting:
+            job.error = error
+            job.granted.set()
+        self._record_commit(len(finished) + len(waiting), len(finished) + len(waiting), 0.0)
+        try:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            conn.close()
+            return None
+        return conn
+
+    def _record_wait(self, wait_ms: float):
+        with self._lock:
+            self._stats["total_queue_wait_ms"] += wait_ms
+            self._stats["max_queue_wait_ms"] = max(self._stats["max_queue_wait_ms"], wait_ms)
+
+    def _record_commit(self, jobs: int, failed: int, commit_ms: float):
+        with self._lock:
+            stats = self._stats
+            stats["jobs"] += jobs
+            stats["failed_jobs"] += failed
+            stats["commits"] += 1
+            stats["max_jobs_per_commit"] = max(stats["max_jobs_per_commit"], jobs)
+            stats["total_commit_ms"] += commit_ms
+            stats["max_commit_ms"] = max(stats["max_commit_ms"], commit_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, jobs per commit and commit latency"""
+        with self._lock:
+            stats = dict(self._stats)
+        jobs, commits = stats["jobs"] or 1, stats["commits"] or 1
+        stats.update({
+            "queue_depth": self._queue.qsize(),
+            "group_commit_window_ms": self.window * 1000,
+            "avg_jobs_per_commit": round(stats["jobs"] / commits, 2),
+            "avg_queue_wait_ms": round(stats["total_queue_wait_ms"] / jobs, 3),
+            "avg_commit_ms": round(stats["total_commit_ms"] / commits, 3),
+        })
+        for key in ("total_queue_wait_ms", "max_queue_wait_ms", "total_commit_ms", "max_commit_ms"):
+            stats[key] = round(stats[key], 3)
+        return stats
+
+
+class ConnectionPool:
+    """Pool of read-only SQLite connections plus a single queued writer.
+
+    A thread borrows one connection for the duration of its outermost
+    ``connection()`` block; nested blocks on the same thread reuse it, so
+    helpers called from inside an endpoint never open a second connection.
+    Connections are returned to the pool when the outermost block exits,
+    even if an exception (e.g. ``HTTPException``) is raised.
+
+    Pooled connections are opened with ``query_only``; all writes go through
+    ``transaction()``, which runs the block on the writer connection (see
+    ``WriteQueue``), so writers never race each other for the SQLite lock.
+    """
+
+    def __init__(self, db_path: str, max_size: int = POOL_SIZE, timeout: float = 30.0,
+                 cached_statements: int = 256, profile: str = STORAGE_PROFILE):
+        if profile not in STORAGE_PROFILES:
+            raise ValueError(f"Unknown storage profile '{profile}'. Available: {sorted(STORAGE_PROFILES)}")
+        self.db_path = db_path
+        self.profile = profile
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._idle = []
+        self._open = 0
+        self._closed = False
+        self._users = 0
+        self._retired = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._stats = {
+            "connections_opened": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+        self.writer = WriteQueue(lambda: self._connect(read_only=False))
+
+    def _connect(self, read_only: bool = True) -> sqlite3.Connection:
+        """Open a new connection; transactions are managed explicitly by ``transaction()``"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=self.cached_statements,
+        )
+        try:
+            # Only takes effect while the file is still empty (i.e. before WAL
+            # mode writes its header); older databases switch over with a VACUUM
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            apply_storage_profile(conn, self.profile)
+            conn.execute("PRAGMA foreign_keys = ON")
+            if read_only:
+                conn.execute("PRAGMA query_only = ON")
+        except Exception:
+            conn.close()
+            raise
+        with self._cond:
+            self._stats["connections_opened"] += 1
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        conn = None
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    break
+                waited = True
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise sqlite3.OperationalError("Timed out waiting for a database connection")
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+
+        wait_ms = (time.perf_counter() - start) * 1000
+        with self._cond:
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+            self._stats["total_wait_ms"] += wait_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            # A broken connection is dropped instead of going back to the pool
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            conn.close()
+            return
+        with self._cond:
+            if self._closed:
+                self._open -= 1
+                self._cond.notify()
+            else:
+                self._idle.append(conn)
+                self._cond.notify()
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow this thread's connection for the duration of the block"""
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is not None:
+            local.depth += 1
+            try:
+                yield conn
+            finally:
+                local.depth -= 1
+            return
+
+        with self._in_use():
+            conn = self._acquire()
+            local.conn = conn
+            local.depth = 1
+            try:
+                yield conn
+            finally:
+                local.conn = None
+                local.depth = 0
+                self._release(conn)
+
+    @contextmanager
+    def transaction(self, immediate: bool = True):
+        """Run the block as one queued write, committed on success and rolled back on error.
+
+        The block runs on the calling thread using the writer connection, and
+        ``connection()`` calls inside it see the uncommitted changes. Nested
+        ``transaction()`` blocks join the enclosing one. The write lock is
+        always taken up front, so ``immediate`` is accepted for compatibility.
+        """
+        local = self._local
+        if getattr(local, "writing", False):
+            yield local.conn
+            return
+
+        with self._in_use(), self._writer_job(self.writer.submit()) as conn:
+            yield conn
+
+    @contextmanager
+    def exclusive(self):
+        """Run the block on the writer connection with no transaction open.
+
+        For statements that cannot run inside a transaction (VACUUM,
+        wal_checkpoint, PRAGMA optimize). Queued writes wait until it exits.
+        """
+        if getattr(self._local, "writing", False):
+            raise RuntimeError("exclusive() cannot be used inside a transaction")
+        with self._in_use(), self._writer_job(self.writer.submit(exclusive=True)) as conn:
+            yield conn
+
+    @contextmanager
+    def _in_use(self):
+        self.retain()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def retain(self):
+        """Keep the pool open past ``retire()`` until the matching ``release()``"""
+        with self._cond:
+            self._users += 1
+
+    def release(self):
+        with self._cond:
+            self._users -= 1
+            close = self._retired and not self._users
+            if close:
+                self._retired = False
+        if close:
+            self.close()
+
+    def retire(self) -> bool:
+        """Close the pool now if nothing is using it, otherwise when the last user releases it.
+
+        Returns True if it closed now.
+        """
+        with self._cond:
+            idle = not self._users
+            self._retired = not idle
+        if idle:
+            self.close()
+        return idle
+
+    def revive(self) -> bool:
+        """Cancel a pending ``retire()``; False if the pool has already closed"""
+        with self._cond:
+            revived, self._retired = self._retired, False
+        return revived
+
+    @property
+    def closed(self) -> bool:
+        with self._cond:
+            return self._closed
+
+    @contextmanager
+    def _writer_job(self, job: _WriteJob):
+        local = self._local
+        saved = (getattr(local, "conn", None), getattr(local, "depth", 0))
+        local.conn, local.depth, local.writing = job.conn, 1, True
+        try:
+            yield job.conn
+        except BaseException:
+            job.failed = True
+            raise
+        finally:
+            local.conn, local.depth = saved
+            local.writing = False
+            job.finished.set()
+        job.committed.result()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size and checkout wait-time statistics"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "database": self.db_path,
+                "storage_profile": self.profile,
+                "max_size": self.max_size,
+                "open_connections": self._open,
+                "idle_connections": len(self._idle),
+                "in_use_connections": self._open - len(self._idle),
+            })
+        stats["writer"] = self.writer.stats()
+        checkouts = stats["checkouts"] or 1
+        stats["avg_wait_ms"] = round(stats["total_wait_ms"] / checkouts, 3)
+        stats["total_wait_ms"] = round(stats["total_wait_ms"], 3)
+        stats["max_wait_ms"] = round(stats["max_wait_ms"], 3)
+        return stats
+
+    def close_all(self):
+        """Close idle connections (connections currently borrowed are closed when returned)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def close(self):
+        """Close every connection, borrowed ones as they are returned, and stop the writer.
+
+        The pool still works afterwards, opening connections as needed.
+        """
+        with self._cond:
+            self._closed = True
+        self.close_all()
+        self.writer.stop()
+
+    def rows_changed(self) -> int:
+        return self.writer.stats()["rows_changed"]
+
+
+def valid_tenant(tenant: str) -> bool:
+    return bool(_TENANT_NAME.match(tenant))
+
+
+def current_tenant() -> Optional[str]:
+    """Household the current request or task works on (None for the default database)"""
+    return _current_tenant.get()
+
+
+@contextmanager
+def use_tenant(tenant: Optional[str]):
+    """Route ``db`` calls inside the block to a household's database"""
+    token = _current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+class ShardRouter:
+    """One SQLite file, pool and writer per household, chosen per request.
+
+    Exposes the ``ConnectionPool`` interface and forwards each call to the
+    pool of ``current_tenant()``: the default database when no household is
+    set, otherwise ``<shard_dir>/<household>.db``. Each household has its
+    own writer, so writes for different households commit in parallel. At
+    most ``max_open`` household pools stay open; the least recently used
+    one is closed when another is opened, or once its last ``connection()``,
+    ``transaction()`` or ``lease()`` block exits if it is still in use. ``prepare`` (e.g. migrations) is
+    called with every pool before first use.
+    """
+
+    def __init__(self, default_path: str, shard_dir: str = SHARD_DIR, max_open: int = MAX_OPEN_SHARDS,
+                 shard_pool_size: int = SHARD_POOL_SIZE, prepare: Optional[Callable] = None):
+        self.default = ConnectionPool(default_path)
+        self.shard_dir = shard_dir
+        self.max_open = max_open
+        self.shard_pool_size = shard_pool_size
+        self.prepare = prepare
+        self._shards: "OrderedDict[str, ConnectionPool]" = OrderedDict()
+        self._retiring: Dict[str, ConnectionPool] = {}
+        self._opening: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._evicted = 0
+        self._retired_rows = 0
+
+    def shard_path(self, tenant: str) -> str:
+        if not valid_tenant(tenant):
+            raise ValueError(f"Invalid household name '{tenant}'")
+        return os.path.join(self.shard_dir, f"{tenant}.db")
+
+    def pool(self, tenant: Optional[str] = None) -> ConnectionPool:
+        """Pool of a household (the current one by default), opening it if needed"""
+        return self._get(tenant, retain=False)
+
+    @contextmanager
+    def lease(self, tenant: Optional[str] = None):
+        """Pool of a household, kept open until the block exits even if it is evicted meanwhile"""
+        pool = self._get(tenant, retain=True)
+        try:
+            yield pool
+        finally:
+            pool.release()
+
+    def _get(self, tenant: Optional[str], retain: bool) -> ConnectionPool:
+        if tenant is None:
+            tenant = current_tenant()
+        if tenant is None:
+            if retain:
+                self.default.retain()
+            return self.default
+        with self._lock:
+            pool = self._checkout(tenant, retain)
+            if pool is not None:
+                return pool
+            opening = self._opening.setdefault(tenant, threading.Lock())
+
+        # One thread opens (and migrates) a household, outside the router lock
+        # so other households are not held up
+        with opening:
+            with self._lock:
+                pool = self._checkout(tenant, retain)
+                if pool is not None:
+                    return pool
+            pool = ConnectionPool(self.shard_path(tenant), max_size=self.shard_pool_size)
+            if self.prepare is not None:
+                self.prepare(pool)
+            with self._lock:
+                if retain:
+                    pool.retain()
+                self._shards[tenant] = pool
+                self._opened += 1
+                self._evict()
+        return pool
+
+    def _checkout(self, tenant: str, retain: bool) -> Optional[ConnectionPool]:
+        """An open pool of the household, reviving an evicted one still in use (called with the lock held)"""
+        pool = self._shards.get(tenant)
+        if pool is not None:
+            self._shards.move_to_end(tenant)
+        else:
+            pool = self._retiring.pop(tenant, None)
+            if pool is None:
+                return None
+            if not pool.revive():
+                self._retired_rows += pool.rows_changed()
+                return None
+            self._shards[tenant] = pool
+            self._evict()
+        if retain:
+            pool.retain()
+        return pool
+
+    def _evict(self):
+        """Retire least recently used pools over ``max_open`` (called with the lock held).
+
+        A pool still in use closes when its last user releases it; until then
+        it is kept in ``_retiring`` so the household reuses it rather than
+        opening a second pool and writer on the same file.
+        """
+        for tenant, old in list(self._retiring.items()):
+            if old.closed:
+                del self._retiring[tenant]
+                self._retired_rows += old.rows_changed()
+        while len(self._shards) > self.max_open:
+            tenant, old = self._shards.popitem(last=False)
+            self._evicted += 1
+            if old.retire():
+                self._retired_rows += old.rows_changed()
+            else:
+                self._retiring[tenant] = old
+
+    def tenants(self) -> List[Optional[str]]:
+        """None (the default database) followed by every household with a database file"""
+        with self._lock:
+            names = set(self._shards)
+        if os.path.isdir(self.shard_dir):
+            for file in os.listdir(self.shard_dir):
+                name, ext = os.path.splitext(file)
+                if ext == ".db" and valid_tenant(name):
+                    names.add(name)
+        return [None] + sorted(names)
+
+    def open_shards(self) -> List[Tuple[Optional[str], ConnectionPool]]:
+        with self._lock:
+            return [(None, self.default), *self._shards.items()]
+
+    def each_shard(self) -> Iterator[Tuple[Optional[str], ConnectionPool]]:
+        """Yield (household, pool) for every database; wrap the body in ``use_tenant`` to route ``db`` too"""
+        for tenant in self.tenants():
+            with self.lease(tenant) as pool:
+                yield tenant, pool
+
+    # ConnectionPool interface, for the current household
+
+    @property
+    def db_path(self) -> str:
+        return self.pool().db_path
+
+    @property
+    def writer(self) -> WriteQueue:
+        return self.pool().writer
+
+    @contextmanager
+    def connection(self):
+        with self.lease() as pool, pool.connection() as conn:
+            yield conn
+
+    @contextmanager
+    def transaction(self, immediate: bool = True):
+        with self.lease() as pool, pool.transaction(immediate) as conn:
+            yield conn
+
+    @contextmanager
+    def exclusive(self):
+        with self.lease() as pool, pool.exclusive() as conn:
+            yield conn
+
+    def rows_changed(self) -> int:
+        """Rows written through every writer, including closed household pools"""
+        with self._lock:
+            pools = [self.default, *self._shards.values(), *self._retiring.values()]
+            retired = self._retired_rows
+        return retired + sum(pool.rows_changed() for pool in pools)
+
+    def shard_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "shard_dir": self.shard_dir,
+                "max_open": self.max_open,
+                "open": list(self._shards),
+                "closing": list(self._retiring),
+                "opened": self._opened,
+                "evicted": self._evicted,
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.pool().stats()
+        stats["household"] = current_tenant()
+        stats["shards"] = self.shard_stats()
+        return stats
+
+    def close_all(self):
+        with self._lock:
+            pools = [self.default, *self._shards.values(), *self._retiring.values()]
+        for pool in pools:
+            pool.close_all()
+
+
+# Shared router used by every endpoint and by BackupManager
+db = ShardRouter(DATABASE_PATH)
+
+
+# Blocking work (sqlite3, pandas, PDF parsing) never runs on the event loop.
+# Database handlers get one worker per pooled connection, so a worker never
+# waits for a connection; file parsing has its own small executor so a slow
+# PDF cannot use up the workers that serve cheap reads.
+db_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="db")
+parse_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("FINANCE_PARSE_WORKERS", "2")), thread_name_prefix="parse"
+)
+
+
+async def run_blocking(fn: Callable, *args, executor: Optional[Executor] = None, **kwargs):
+    """Await a blocking call on a worker thread (the DB executor by default)"""
+    loop = asyncio.get_running_loop()
+    # Copy context variables (e.g. the request's tenant) into the worker
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(executor or db_executor, call)
+
+
+def offload(fn: Optional[Callable] = None, *, executor: Optional[Executor] = None):
+    """Decorator turning a blocking endpoint into an awaitable one that runs on an executor.
+
+    FastAPI still sees the wrapped function's signature, so parameters and
+    validation are unchanged.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await run_blocking(fn, *args, executor=executor, **kwargs)
+        return wrapper
+
+    return decorate(fn) if fn is not None else decorate
@@ -0,0 +1,55 @@
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+# Transaction descriptions are dictionary-encoded. A long history repeats the
+# same few thousand merchant strings ("AMAZON MKTPLACE PMTS", "STARBUCKS STORE
+# 1234") across hundreds of thousands of rows, so transactions and
+# credit_transactions store only an integer description_id and each distinct
+# text is stored once here. Queries resolve the id back to text with
+# description_sql(), so the API still returns plain strings.
+DESCRIPTIONS_TABLE = "descriptions"
+
+DESCRIPTIONS_SCHEMA = [
+    f"""CREATE TABLE IF NOT EXISTS {DESCRIPTIONS_TABLE} (
+        id INTEGER PRIMARY KEY,
+        text TEXT NOT NULL UNIQUE
+    )""",
+]
+
+_LOOKUP_CHUNK = 500
+
+
+def ensure_descriptions(conn: sqlite3.Connection):
+    for sql in DESCRIPTIONS_SCHEMA:
+        conn.execute(sql)
+
+
+def description_sql(alias: str) -> str:
+    """Scalar subquery resolving ``<alias>.description_id`` to its text"""
+    return f"(SELECT text FROM {DESCRIPTIONS_TABLE} WHERE id = {alias}.description_id)"
+
+
+def intern_descriptions(conn: sqlite3.Connection, texts: Iterable[Optional[str]]) -> List[Optional[int]]:
+    """Dictionary ids for ``texts`` in order, adding the ones not stored yet; None stays None"""
+    texts = list(texts)
+    distinct = list({text for text in texts if text is not None})
+    if not distinct:
+        return [None] * len(texts)
+
+    conn.executemany(f"INSERT OR IGNORE INTO {DESCRIPTIONS_TABLE} (text) VALUES (?)", [(text,) for text in distinct])
+    ids: Dict[str, int] = {}
+    for start in range(0, len(distinct), _LOOKUP_CHUNK):
+        chunk = distinct[start:start + _LOOKUP_CHUNK]
+        ids.update((text, description_id) for description_id, text in conn.execute(
+            f"SELECT id, text FROM {DESCRIPTIONS_TABLE} WHERE text IN ({','.join('?' * len(chunk))})", chunk
+        ))
+    return [None if text is None else ids[text] for text in texts]
+
+
+def prune_descriptions(conn: sqlite3.Connection) -> int:
+    """Delete descriptions no transaction refers to any more; returns how many"""
+    return conn.execute(f"""
+        DELETE FROM {DESCRIPTIONS_TABLE}
+        WHERE NOT EXISTS (SELECT 1 FROM transactions WHERE description_id = {DESCRIPTIONS_TABLE}.id)
+          AND NOT EXISTS (SELECT 1 FROM credit_transactions WHERE description_id = {DESCRIPTIONS_TABLE}.id)
+    """).rowcount
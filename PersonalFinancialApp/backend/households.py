@@ -0,0 +1,48 @@
+import re
+
+from starlette.responses import JSONResponse
+
+from database import TENANT_HEADER, use_tenant, valid_tenant
+
+# /h/<household>/banks is served as /banks for that household
+_PREFIX = re.compile(r"^/h/([^/]*)(/.*)?$")
+
+
+class HouseholdMiddleware:
+    """Routes each request to a household database (see ``ShardRouter``).
+
+    The household comes from a ``/h/<name>/`` path prefix, which is removed
+    before routing, or from the X-Household header. Requests with neither
+    use the default database.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        tenant = None
+        match = _PREFIX.match(scope["path"])
+        if match:
+            tenant = match.group(1)
+            path = match.group(2) or "/"
+            scope = dict(scope, path=path, raw_path=path.encode())
+        else:
+            header = TENANT_HEADER.lower().encode()
+            for name, value in scope.get("headers", []):
+                if name == header:
+                    tenant = value.decode("latin-1").strip() or None
+                    break
+
+        if tenant is not None and not valid_tenant(tenant):
+            response = JSONResponse(
+                {"detail": "Household names are 1-64 letters, digits, '-' or '_'"}, status_code=400
+            )
+            await response(scope, receive, send)
+            return
+
+        with use_tenant(tenant):
+            await self.app(scope, receive, send)
@@ -0,0 +1,275 @@
+import os
+import re
+import sqlite3
+from itertools import repeat
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from descriptions import intern_descriptions
+from ingest import infer_date_format, normalize_dates, parse_amounts
+from raw_store import store_raw
+from search import bulk_search_indexing
+
+# Column-wise CSV import. A parsed CSV is turned into transaction rows one
+# column at a time (dates, amounts, text), so no Python code runs per row
+# except the final executemany. Rows whose date or amount cannot be parsed are
+# not imported; they come back as a reject list naming the row and the
+# problem, so the caller can show what was skipped.
+#
+# Files are read straight from the upload's spooled temporary file (on disk
+# once it passes a megabyte), never decoded into one string. In streaming
+# mode they are read IMPORT_CHUNK_ROWS rows at a time and each chunk is
+# committed before the next is read, so memory stays flat whatever the size.
+# Cells are read as text, so every chunk sees the same types and the stored
+# raw rows keep the file's own spelling ("-4.50", not -4.5).
+REQUIRED_FIELDS = ("date", "description", "amount")
+REJECTS_RETURNED = 100
+IMPORT_CHUNK_ROWS = int(os.environ.get("FINANCE_IMPORT_CHUNK_ROWS", "50000"))
+_CSV_OPTIONS = {"dtype": str, "encoding": "utf-8"}
+
+
+def read_csv_columns(source: IO[bytes]) -> List[str]:
+    """Header of an uploaded CSV; the file is rewound for the real read"""
+    columns = pd.read_csv(source, nrows=0, **_CSV_OPTIONS).columns.tolist()
+    source.seek(0)
+    return columns
+
+
+def read_csv(source) -> pd.DataFrame:
+    """A whole CSV (a path or binary file) read the way imports read it"""
+    return pd.read_csv(source, **_CSV_OPTIONS)
+
+
+def read_csv_chunks(source: IO[bytes], chunk_rows: Optional[int] = None, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+    """The CSV as one frame, or as frames of ``chunk_rows`` rows read one at a time.
+
+    The first ``skip_rows`` data rows are left out (resuming an import); they
+    are still parsed, since quoted cells may span lines.
+    """
+    if not chunk_rows:
+        yield read_csv(source).iloc[skip_rows:]
+        return
+    with pd.read_csv(source, chunksize=chunk_rows, **_CSV_OPTIONS) as reader:
+        for chunk in reader:
+            if skip_rows >= len(chunk):
+                skip_rows -= len(chunk)
+                continue
+            yield chunk.iloc[skip_rows:]
+            skip_rows = 0
+
+
+# The upload preview reads only the header and a sample of rows, whatever the
+# file size. total_rows comes from counting line breaks in the spooled file
+# (it over-counts rows whose quoted cells contain line breaks). Column types
+# and a suggested mapping are inferred from the sample.
+PREVIEW_ROWS = 5
+PROFILE_SAMPLE_ROWS = 200
+COUNT_BLOCK_BYTES = 1 << 20
+TYPE_MIN_SHARE = 0.8          # share of a sample's non-empty values that must parse as the type
+TYPE_MISSES_ALLOWED = 1       # ...or this many misses, so one bad row does not turn a small sample into text
+_HEADER_HINTS = {
+    "date": re.compile(r"date|posted|time", re.I),
+    "amount": re.compile(r"amount|amt|value|debit|credit|sum", re.I),
+    "description": re.compile(r"desc|payee|merchant|narrat|detail|name|transaction", re.I),
+    "note": re.compile(r"note|memo|comment|reference", re.I),
+    "category": re.compile(r"categ", re.I),
+}
+# parse_amounts() reads the digits out of anything, so types need values that look like amounts:
+# optional sign or parentheses, currency symbol or code, thousands separators, decimals
+_AMOUNT_LIKE = re.compile(r"\(?[-+]?\s*(?:[A-Z]{3}\s*)?[$€£¥₹]?\s*[-+]?[\d,]*\.?\d+\s*(?:[A-Z]{3})?\)?-?")
+
+
+def count_csv_rows(source: IO[bytes]) -> int:
+    """Data rows in a CSV, counted as line breaks after the header; the file is rewound"""
+    lines, last = 0, b"\n"
+    for block in iter(lambda: source.read(COUNT_BLOCK_BYTES), b""):
+        lines += block.count(b"\n")
+        last = block[-1:]
+    source.seek(0)
+    if last != b"\n":
+        lines += 1      # no line break after the last row
+    return max(lines - 1, 0)
+
+
+def _type_share(matches: pd.Series) -> float:
+    """Share of a sample matching a type, or 0 when too few match for the column to have that type"""
+    share = matches.mean()
+    misses = len(matches) - matches.sum()
+    fits = share > 0.5 and (share >= TYPE_MIN_SHARE or misses <= TYPE_MISSES_ALLOWED)
+    return share if fits else 0.0
+
+
+def column_type(values: pd.Series, preferred_date_format: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """``(type, date_format)`` of a sample column: "date", "amount", "number", "text" or "empty".
+
+    The type most of the sample parses as wins; a few values that parse as
+    neither (a malformed row, a footer) do not make the column text.
+    """
+    text = values.dropna().astype(str).str.strip()
+    text = text[text != ""]
+    if text.empty:
+        return "empty", None
+    digits_only = text.str.fullmatch(r"\d+")
+    date_share, date_format = 0.0, None
+    # Plain integers are only dates as YYYYMMDD
+    if not digits_only.all() or text.str.len().eq(8).all():
+        date_format = infer_date_format(text, preferred_date_format)
+        if date_format:
+            date_share = _type_share(pd.to_datetime(text, format=date_format, errors="coerce").notna())
+    amounts = text.str.fullmatch(_AMOUNT_LIKE) & parse_amounts(text).notna()
+    amount_share = _type_share(amounts)
+    if date_share and date_share >= amount_share:
+        return "date", date_format
+    if amount_share:
+        return ("number" if digits_only[amounts].all() else "amount"), None
+    return "text", None
+
+
+def suggest_mapping(columns: List[str], types: Dict[str, str], sample: pd.DataFrame) -> Dict[str, str]:
+    """Likely date, amount, description, note and category columns, by header name and inferred type"""
+    suggested: Dict[str, str] = {}
+
+    def pick(field: str, kinds: Tuple[str, ...], fallback=None):
+        free = [column for column in columns if types[column] in kinds and column not in suggested.values()]
+        named = [column for column in free if _HEADER_HINTS[field].search(str(column))]
+        if named:
+            suggested[field] = named[0]
+        elif fallback and free:
+            suggested[field] = fallback(free)
+
+    pick("date", ("date",), lambda free: free[0])
+    pick("amount", ("amount", "number"), lambda free: next((c for c in free if types[c] == "amount"), None))
+    # Without a telling header, the description is the text column with the most distinct values
+    pick("description", ("text",), lambda free: max(free, key=lambda column: sample[column].nunique()))
+    pick("note", ("text",))
+    pick("category", ("text",))
+    return {field: column for field, column in suggested.items() if column is not None}
+
+
+def preview_csv(source: IO[bytes], date_format: Optional[str] = None, rows: int = PREVIEW_ROWS) -> Dict[str, Any]:
+    """Header, first ``rows`` rows, row count, column types and a suggested mapping of an uploaded CSV.
+
+    ``date_format`` (the account's remembered one) is preferred when inferring date columns.
+    """
+    sample = pd.read_csv(source, nrows=max(rows, PROFILE_SAMPLE_ROWS), **_CSV_OPTIONS)
+    source.seek(0)
+    columns = sample.columns.tolist()
+    types, date_formats = {}, {}
+    for column in columns:
+        types[column], column_format = column_type(sample[column], date_format)
+        if column_format:
+            date_formats[column] = column_format
+    return {
+        "columns": columns,
+        "preview": sample.head(rows).to_dict("records"),
+        "total_rows": count_csv_rows(source),
+        "column_types": types,
+        "date_formats": date_formats,
+        "suggested_mapping": suggest_mapping(columns, types, sample),
+    }
+
+
+def _text(df: pd.DataFrame, column: Optional[str], default: str) -> pd.Series:
+    """A mapped column as strings, with ``default`` for unmapped, missing or blank cells"""
+    if not column:
+        return pd.Series(default, index=df.index, dtype=object)
+    values = df[column]
+    text = values.astype(str).str.strip()
+    return text.where(values.notna() & (text != ""), default).astype(object)
+
+
+def _raw_rows(df: pd.DataFrame) -> pd.Series:
+    """Each CSV row as JSON of its cells as strings (empty for missing), for raw storage"""
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+    text = df.astype(str).where(df.notna(), "")
+    text.columns = [str(column) for column in text.columns]
+    return pd.Series(text.to_json(orient="records", lines=True).splitlines(), index=df.index, dtype=object)
+
+
+def _problem(field: str, value) -> str:
+    if pd.isna(value) or str(value).strip() == "":
+        return f"Missing {field}"
+    return f"Unparseable {field} {str(value)!r}"
+
+
+def prepare_transactions(df: pd.DataFrame, mapping: Dict[str, str], date_format: Optional[str] = None,
+                         first_row: int = 1) -> Tuple[pd.DataFrame, List[Dict[str, Any]], Optional[str]]:
+    """Parse a mapped CSV frame into ``(rows, rejects, date_format)``.
+
+    ``rows`` has date, day_number, description, amount_cents, note,
+    category and raw_data for every importable row. ``rejects``
+    holds ``{"row", "errors"}`` for the others, where ``row`` is the 1-based
+    data row in the file (``first_row`` is the number of the frame's first
+    row). ``date_format`` is the format the date column was read with.
+    """
+    raw_dates = df[mapping["date"]]
+    iso_dates, day_numbers, date_format = normalize_dates(raw_dates, date_format)
+    raw_amounts = df[mapping["amount"]]
+    amounts = parse_amounts(raw_amounts)
+
+    rows = pd.DataFrame({
+        "date": iso_dates,
+        "day_number": day_numbers,
+        "description": _text(df, mapping["description"], ""),
+        "amount_cents": amounts,
+        "note": _text(df, mapping.get("note"), ""),
+        "category": _text(df, mapping.get("category"), "Uncategorized"),
+    }, index=df.index)
+
+    bad_date, bad_amount = day_numbers.isna().to_numpy(), amounts.isna().to_numpy()
+    rejects = []
+    for position in (bad_date | bad_amount).nonzero()[0]:
+        errors = [_problem(field, values.iloc[position])
+                  for field, values, bad in (("date", raw_dates, bad_date), ("amount", raw_amounts, bad_amount))
+                  if bad[position]]
+        rejects.append({"row": first_row + int(position), "errors": errors})
+
+    valid = ~(bad_date | bad_amount)
+    rows = rows[valid].astype({"day_number": "int64", "amount_cents": "int64"})
+    rows["raw_data"] = _raw_rows(df[valid])
+    return rows, rejects, date_format
+
+
+def _next_transaction_id(conn: sqlite3.Connection) -> int:
+    # transactions uses AUTOINCREMENT: a new id is one past the largest id the table has ever had
+    return conn.execute("""
+        SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'transactions'), 0),
+                   COALESCE((SELECT MAX(id) FROM transactions), 0)) + 1
+    """).fetchone()[0]
+
+
+def insert_transactions(conn: sqlite3.Connection, account_id: int, rows: pd.DataFrame) -> int:
+    """Insert prepared rows with one executemany and store their raw CSV rows; returns the count"""
+    if rows.empty:
+        return 0
+    description_ids = intern_descriptions(conn, rows["description"].tolist())
+    first_id = _next_transaction_id(conn)
+    with bulk_search_indexing(conn, len(rows)):
+        conn.executemany("""
+            INSERT INTO transactions (account_id, date, day_number, description_id, amount_cents, note, category)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, zip(repeat(account_id), rows["date"].tolist(), rows["day_number"].tolist(), description_ids,
+                 rows["amount_cents"].tolist(), rows["note"].tolist(), rows["category"].tolist()))
+
+    # Inside one write transaction the new rows got consecutive ids
+    last_id = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'").fetchone()[0]
+    if last_id != first_id + len(rows) - 1:
+        raise RuntimeError(f"Expected transaction ids {first_id}..{first_id + len(rows) - 1}, last id is {last_id}")
+    store_raw(conn, zip(range(first_id, last_id + 1), rows["raw_data"].tolist()))
+    return len(rows)
+
+
+def import_rows(conn: sqlite3.Connection, account_id: int, df: pd.DataFrame, mapping: Dict[str, str],
+                first_row: int = 1) -> Tuple[int, List[Dict[str, Any]]]:
+    """Prepare and insert one frame of an account's CSV; returns ``(imported, rejects)``.
+
+    Dates are read in the account's remembered format, and a newly inferred
+    format is remembered for the next frame or import.
+    """
+    known_format = conn.execute("SELECT date_format FROM accounts WHERE id = ?", (account_id,)).fetchone()[0]
+    rows, rejects, date_format = prepare_transactions(df, mapping, known_format, first_row)
+    if date_format and date_format != known_format:
+        conn.execute("UPDATE accounts SET date_format = ? WHERE id = ?", (date_format, account_id))
+    return insert_transactions(conn, account_id, rows), rejects
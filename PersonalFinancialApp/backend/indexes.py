@@ -0,0 +1,121 @@
+import re
+import sqlite3
+from typing import Dict, List
+
+# Secondary indexes maintained by the backend. Every index here backs a
+# WHERE / JOIN / ORDER BY used by main.py or backup_manager.py; the comment
+# above each one names the queries it serves. Changes to this set ship with
+# a new migration in migrations.py that writes out the same statements;
+# ensure_indexes() brings a scratch database up to this set
+# (explain_query_plans.py).
+MANAGED_INDEXES: Dict[str, str] = {
+    # get_transactions, get_credit_card_info (recent), get_analytics (monthly and
+    # date ranges, covering amount), get_accounts (transaction counts),
+    # running-balance / daily-balances pages (id breaks ties within a day, so
+    # ORDER BY day_number, id needs no sort), backup/delete by account_id
+    "idx_transactions_account_day":
+        "CREATE INDEX idx_transactions_account_day ON transactions (account_id, day_number, id, amount_cents)",
+    # ledger analytics across all accounts by date range
+    "idx_transactions_day":
+        "CREATE INDEX idx_transactions_day ON transactions (day_number)",
+    "idx_credit_transactions_day":
+        "CREATE INDEX idx_credit_transactions_day ON credit_transactions (day_number)",
+    # get_categories/{account_id}, debug_transactions, fuzzy_match_category,
+    # get_analytics (category breakdown, covering amount), get_transactions
+    # filtered by category in date order (keyset on day_number, id)
+    "idx_transactions_account_category":
+        "CREATE INDEX idx_transactions_account_category "
+        "ON transactions (account_id, category, day_number, id, amount_cents)",
+    # get_transactions sorted by amount (keyset on amount_cents, id) and
+    # min/max amount or debit/credit filters; get_analytics (monthly spending,
+    # covering day_number)
+    "idx_transactions_account_amount":
+        "CREATE INDEX idx_transactions_account_amount ON transactions (account_id, amount_cents, id, day_number)",
+    # auto_categorize_transactions: the 'Uncategorized' triage path only
+    # touches the (usually small) set of rows still waiting for a category
+    "idx_transactions_uncategorized":
+        "CREATE INDEX idx_transactions_uncategorized ON transactions (account_id) "
+        "WHERE category = 'Uncategorized' OR category IS NULL",
+    # auto_categorize_transactions (one update per distinct description) and
+    # prune_descriptions (is a description still referenced)
+    "idx_transactions_description":
+        "CREATE INDEX idx_transactions_description ON transactions (description_id)",
+    "idx_credit_transactions_description":
+        "CREATE INDEX idx_credit_transactions_description ON credit_transactions (description_id)",
+    # get_banks / get_accounts / delete_bank / backup_bank
+    "idx_accounts_bank":
+        "CREATE INDEX idx_accounts_bank ON accounts (bank_id)",
+    # get_category_rules
+    "idx_category_rules_account":
+        "CREATE INDEX idx_category_rules_account ON category_rules (account_id, created_at)",
+    # get_credit_statements
+    "idx_credit_statements_account_date":
+        "CREATE INDEX idx_credit_statements_account_date ON credit_statements (credit_account_id, statement_date)",
+    # get_credit_statements (transactions per statement)
+    "idx_credit_transactions_statement":
+        "CREATE INDEX idx_credit_transactions_statement ON credit_transactions (credit_statement_id, transaction_date)",
+    # get_portfolio_statements, get_portfolio_summary(/by-date)
+    "idx_portfolio_statements_account_date":
+        "CREATE INDEX idx_portfolio_statements_account_date ON portfolio_statements (investment_account_id, statement_date)",
+    # get_securities (by statement date), get_portfolio_summary(/by-date)
+    "idx_securities_account_date_symbol":
+        "CREATE INDEX idx_securities_account_date_symbol ON securities (investment_account_id, statement_date, symbol)",
+    # get_securities (latest statement per symbol)
+    "idx_securities_account_symbol_date":
+        "CREATE INDEX idx_securities_account_symbol_date ON securities (investment_account_id, symbol, statement_date)",
+    # archived daily totals for analytics and balances (created with the archive tables)
+    "idx_transaction_archive_days_account_day":
+        "CREATE INDEX idx_transaction_archive_days_account_day "
+        "ON transaction_archive_days (account_id, day_number, category, amount_cents)",
+}
+
+_TARGET_PATTERN = re.compile(r"\bON\s+(\w+)\s*\(([^)]*)\)", re.IGNORECASE)
+
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.split()).lower()
+
+
+def ensure_indexes(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """Create missing managed indexes, rebuild changed ones and drop retired ones.
+
+    Idempotent: when the index set already matches, this is a single read of
+    sqlite_master.
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    columns = {}
+    existing = {
+        row[0]: row[1]
+        for row in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx\\_%' ESCAPE '\\'")
+    }
+
+    created, rebuilt, dropped = [], [], []
+    for name, sql in MANAGED_INDEXES.items():
+        table, column_list = _TARGET_PATTERN.search(sql).groups()
+        if table not in tables:
+            continue
+        if table not in columns:
+            columns[table] = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        # Indexes on columns added by a later migration are created when that migration runs
+        if any(part.split()[0] not in columns[table] for part in column_list.split(",")):
+            continue
+        current = existing.get(name)
+        if current is not None and _normalize(current) == _normalize(sql):
+            continue
+        if current is not None:
+            conn.execute(f"DROP INDEX {name}")
+            rebuilt.append(name)
+        else:
+            created.append(name)
+        conn.execute(sql)
+
+    for name in existing:
+        if name not in MANAGED_INDEXES:
+            conn.execute(f"DROP INDEX {name}")
+            dropped.append(name)
+
+    if created or rebuilt:
+        # Give the query planner statistics for the new indexes
+        conn.execute("ANALYZE")
+
+    return {"created": created, "rebuilt": rebuilt, "dropped": dropped}
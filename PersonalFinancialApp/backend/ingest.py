@@ -0,0 +1,147 @@
+from datetime import date, datetime
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Date layouts seen in bank exports, tried in order during inference.
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%m/%d/%Y",
+    "%m/%d/%y",
+    "%d/%m/%Y",
+    "%Y/%m/%d",
+    "%m-%d-%Y",
+    "%d-%m-%Y",
+    "%d.%m.%Y",
+    "%Y%m%d",
+    "%b %d, %Y",
+    "%d %b %Y",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+]
+
+INFERENCE_SAMPLE_SIZE = 500
+_EPOCH = date(1970, 1, 1)
+
+
+def infer_date_format(values: Iterable, preferred: Optional[str] = None) -> Optional[str]:
+    """Pick the date format that parses the most values in a sample.
+
+    ``preferred`` (typically the format remembered for the account) wins
+    whenever it parses the whole sample, so ambiguous day/month values keep
+    the interpretation established by earlier imports.
+    """
+    sample = pd.Series(list(values) if not isinstance(values, pd.Series) else values)
+    sample = sample.dropna().astype(str).str.strip()
+    sample = sample[sample != ""].head(INFERENCE_SAMPLE_SIZE)
+    if sample.empty:
+        return preferred
+
+    candidates = ([preferred] if preferred else []) + [fmt for fmt in DATE_FORMATS if fmt != preferred]
+    best_format, best_hits = None, 0
+    for fmt in candidates:
+        hits = int(pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum())
+        if hits == len(sample):
+            return fmt
+        if hits > best_hits:
+            best_format, best_hits = fmt, hits
+    return best_format
+
+
+def normalize_dates(values: pd.Series, date_format: Optional[str] = None) -> Tuple[pd.Series, pd.Series, Optional[str]]:
+    """Vectorized date normalization for a whole column.
+
+    Returns ``(iso_dates, day_numbers, date_format)``: ISO-8601 strings,
+    integer days since 1970-01-01 (nullable Int64) and the format used.
+    Values that cannot be parsed come back as None / <NA>.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = values
+    else:
+        text = values.astype("string").str.strip()
+        date_format = infer_date_format(text, date_format)
+        if date_format:
+            parsed = pd.to_datetime(text, format=date_format, errors="coerce")
+        else:
+            parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+        # Rows that do not follow the column's format get a second, per-value attempt
+        leftover = parsed.isna() & text.notna() & (text != "")
+        if leftover.any():
+            parsed.loc[leftover] = pd.to_datetime(text[leftover], format="mixed", errors="coerce")
+
+    parsed = pd.to_datetime(parsed, errors="coerce")
+    if getattr(parsed.dt, "tz", None) is not None:
+        parsed = parsed.dt.tz_localize(None)
+    valid = parsed.notna()
+    iso_dates = parsed.dt.strftime("%Y-%m-%d").astype(object).where(valid, None)
+    day_numbers = pd.Series(pd.NA, index=values.index, dtype="Int64")
+    day_numbers[valid] = parsed[valid].values.astype("datetime64[D]").astype(np.int64)
+    return iso_dates, day_numbers, date_format
+
+
+def sql_values(values: pd.Series) -> list:
+    """Column values as plain Python objects for sqlite3 (missing values become None)"""
+    return [None if pd.isna(value) else (value.item() if hasattr(value, "item") else value) for value in values]
+
+
+def parse_amounts(values: pd.Series) -> pd.Series:
+    """Vectorized amount parsing into integer cents (nullable Int64).
+
+    Handles currency symbols and codes, thousands separators, and negatives
+    written as ``-12.50``, ``12.50-`` or ``(12.50)``. Values that are not a
+    finite number come back as <NA>.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numbers = values.astype(float)
+    else:
+        text = values.astype("string").str.strip()
+        negative = (
+            text.str.startswith("-") | text.str.endswith("-") | (text.str.startswith("(") & text.str.endswith(")"))
+        ).fillna(False).astype(bool)
+        digits = text.str.replace(r"[^0-9.]", "", regex=True)
+        numbers = pd.to_numeric(digits.where(digits != ""), errors="coerce").astype(float)
+        numbers = numbers.where(~negative, -numbers)
+    numbers = numbers.where(np.isfinite(numbers))
+    return (numbers * 100).round().astype("Int64")
+
+
+def to_cents(value) -> Optional[int]:
+    """Parse a single amount into integer cents; None if it is not a number"""
+    cents = parse_amounts(pd.Series([value], dtype=object)).iloc[0]
+    return None if pd.isna(cents) else int(cents)
+
+
+def cents_to_amount(cents: Optional[int]) -> float:
+    """Integer cents as the float amount returned by the API"""
+    return cents / 100 if cents else 0.0
+
+
+def normalize_date(value, date_format: Optional[str] = None) -> Tuple[Optional[str], Optional[int]]:
+    """Normalize a single date value to ``(iso_date, day_number)``; ``(None, None)`` if unparseable"""
+    if value is None:
+        return None, None
+    if isinstance(value, datetime):
+        parsed = value.date()
+    elif isinstance(value, date):
+        parsed = value
+    else:
+        text = str(value).strip()
+        parsed = None
+        formats = ([date_format] if date_format else []) + DATE_FORMATS
+        for fmt in formats:
+            try:
+                parsed = datetime.strptime(text, fmt).date()
+                break
+            except ValueError:
+                continue
+        if parsed is None:
+            return None, None
+    return parsed.isoformat(), (parsed - _EPOCH).days
+
+
+def day_number_to_iso(day_number: int) -> str:
+    """Inverse of the day-number column"""
+    return date.fromordinal(_EPOCH.toordinal() + int(day_number)).isoformat()
@@ -0,0 +1,410 @@
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from database import DATABASE_PATH, current_tenant, use_tenant
+
+# Background jobs for operations too slow to hold an HTTP request open
+# (imports, auto-categorization, PDF parsing, backups). Endpoints called with
+# async=true queue a job and return its id at once; a pool of worker threads
+# runs queued jobs in order, each in the household it was submitted from.
+#
+# The queue lives in its own SQLite file, so jobs survive a restart: a job
+# whose worker stops heartbeating (the process died) goes back to the queue,
+# up to JOB_MAX_ATTEMPTS times. Handlers report progress through
+# Job.progress(), which is also where a cancel takes effect, and may save a
+# checkpoint there so a retried job carries on where it stopped instead of
+# starting over. Uploaded files are copied next to the queue and kept until
+# the job succeeds, so failed jobs can be retried.
+JOBS_DB_PATH = os.environ.get("FINANCE_JOBS_DB") or os.path.join(os.path.dirname(DATABASE_PATH), "jobs.db")
+JOB_WORKERS = int(os.environ.get("FINANCE_JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("FINANCE_JOB_MAX_ATTEMPTS", "3"))
+JOB_RETENTION_DAYS = float(os.environ.get("FINANCE_JOB_RETENTION_DAYS", "7"))
+POLL_SECONDS = 2                  # workers also look for jobs queued by other processes
+HEARTBEAT_SECONDS = 10
+STALE_AFTER_SECONDS = 60          # a running job without a heartbeat this long was interrupted
+PRUNE_INTERVAL_SECONDS = 3600
+PROGRESS_WRITE_SECONDS = 0.5      # progress without a checkpoint is written at most this often
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+JOBS_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        household TEXT,
+        status TEXT NOT NULL,
+        params TEXT NOT NULL,
+        input_path TEXT,
+        progress_done INTEGER NOT NULL DEFAULT 0,
+        progress_total INTEGER,
+        progress_message TEXT,
+        checkpoint TEXT,
+        result TEXT,
+        error TEXT,
+        error_status INTEGER,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        owner TEXT,
+        heartbeat REAL,
+        queued_at REAL NOT NULL,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, queued_at)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_household ON jobs (household, queued_at)",
+]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class JobCancelled(Exception):
+    """Raised by Job.progress() once the job has been cancelled"""
+
+
+class Job:
+    """A running job as its handler sees it: parameters, uploaded input, checkpoint and progress reporting"""
+
+    def __init__(self, queue: "JobQueue", row: sqlite3.Row):
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.household = row["household"]
+        self.params = json.loads(row["params"])
+        self.input_path = row["input_path"]
+        self.checkpoint = json.loads(row["checkpoint"]) if row["checkpoint"] else None
+        self._queue = queue
+        self._last_write = 0.0
+
+    @property
+    def input_paths(self) -> List[str]:
+        """Every uploaded file, in upload order (``input_path`` is the first)"""
+        if not self.input_path:
+            return []
+        job_dir = os.path.dirname(os.path.dirname(self.input_path))
+        paths = []
+        for position in sorted(os.listdir(job_dir)):
+            paths += [os.path.join(job_dir, position, name) for name in os.listdir(os.path.join(job_dir, position))]
+        return paths
+
+    def progress(self, done: int, total: Optional[int] = None, message: Optional[str] = None,
+                 checkpoint: Optional[Dict[str, Any]] = None):
+        """Record progress, and stop the handler with JobCancelled if the job was cancelled.
+
+        A checkpoint is written at once (and handed back as ``job.checkpoint``
+        on a retry); plain progress is throttled to PROGRESS_WRITE_SECONDS.
+        """
+        now = time.monotonic()
+        if checkpoint is not None or now - self._last_write >= PROGRESS_WRITE_SECONDS:
+            self._last_write = now
+            if checkpoint is not None:
+                self.checkpoint = checkpoint
+            self._queue._record_progress(self.id, done, total, message, checkpoint)
+        if self._queue._cancel_requested(self.id):
+            raise JobCancelled()
+
+
+class JobQueue:
+    """SQLite-backed job queue with a pool of worker threads, started on first use"""
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, workers: int = JOB_WORKERS):
+        self.db_path = db_path
+        self.files_dir = os.path.join(os.path.dirname(db_path) or ".", "jobs")
+        self.workers = workers
+        # Identifies this process's workers in the queue, so other processes can tell whose jobs went stale
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, Callable[[Job], Any]] = {}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._cancelled = set()
+        self._last_prune = 0.0
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        # Every statement is tiny, so one autocommit connection shared under a lock is enough
+        with self._lock:
+            if self._conn is None:
+                os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+                conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA busy_timeout = 5000")
+                for sql in JOBS_SCHEMA:
+                    conn.execute(sql)
+                self._conn = conn
+            yield self._conn
+
+    @property
+    def kinds(self) -> List[str]:
+        return list(self._handlers)
+
+    def register(self, kind: str, handler: Callable[[Job], Any]):
+        """Run ``handler(job)`` for jobs of ``kind``; its return value (JSON-serializable) is the job's result"""
+        self._handlers[kind] = handler
+
+    # --- API side ---
+
+    def submit(self, kind: str, params: Dict[str, Any],
+               uploads: Sequence[Tuple[IO[bytes], Optional[str]]] = ()) -> Dict[str, Any]:
+        """Queue a job for the current household, copying ``uploads`` (file, filename) to its input files"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        job_id = uuid.uuid4().hex
+        input_path = None
+        for position, (upload, filename) in enumerate(uploads):
+            # One directory per upload keeps the original file names, even repeated ones
+            directory = os.path.join(self.files_dir, job_id, f"{position:04d}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, os.path.basename(filename or "") or "input")
+            with open(path, "wb") as out:
+                shutil.copyfileobj(upload, out)
+            input_path = input_path or path
+
+        with self._connection() as conn:
+            conn.execute("""
+                INSERT INTO jobs (id, kind, household, status, params, input_path, queued_at, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (job_id, kind, current_tenant(), QUEUED, json.dumps(params), input_path, time.time(), _now()))
+        print(f"🧵 Queued {kind} job {job_id}")
+        self.start()
+        self._wake.set()
+        return self.get(job_id)
+
+    def _row(self, conn: sqlite3.Connection, job_id: str) -> Optional[sqlite3.Row]:
+        # Jobs are only visible from the household they were submitted in
+        return conn.execute(
+            "SELECT * FROM jobs WHERE id = ? AND household IS ?", (job_id, current_tenant())
+        ).fetchone()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connection() as conn:
+            row = self._row(conn, job_id)
+        return _describe(row) if row else None
+
+    def list(self, status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """The current household's jobs, newest first, without their results"""
+        sql, params = "SELECT * FROM jobs WHERE household IS ?", [current_tenant()]
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        sql += " ORDER BY queued_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [_describe(row, with_result=False) for row in rows]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job, or ask a running one to stop; None if there is no such job.
+
+        Raises ValueError if the job already finished.
+        """
+        with self._connection() as conn:
+            row = self._row(conn, job_id)
+            if row is None:
+                return None
+            if row["status"] in FINISHED:
+                raise ValueError(f"Job already {row['status']}")
+            conn.execute("""
+                UPDATE jobs SET cancel_requested = 1,
+                    status = CASE status WHEN ? THEN ? ELSE status END,
+                    finished_at = CASE status WHEN ? THEN ? ELSE finished_at END
+                WHERE id = ?
+            """, (QUEUED, CANCELLED, QUEUED, _now(), job_id))
+        self._cancelled.add(job_id)
+        return self.get(job_id)
+
+    def retry(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Queue a failed or cancelled job again, keeping its checkpoint; None if there is no such job.
+
+        Raises ValueError if the job is not failed or cancelled.
+        """
+        with self._connection() as conn:
+            row = self._row(conn, job_id)
+            if row is None:
+                return None
+            if row["status"] not in (FAILED, CANCELLED):
+                raise ValueError(f"Only failed or cancelled jobs can be retried; this one is {row['status']}")
+            if row["input_path"] and not os.path.exists(row["input_path"]):
+                raise ValueError("The job's uploaded file is no longer available")
+            conn.execute("""
+                UPDATE jobs SET status = ?, cancel_requested = 0, result = NULL, error = NULL,
+                    error_status = NULL, owner = NULL, started_at = NULL, finished_at = NULL, queued_at = ?
+                WHERE id = ?
+            """, (QUEUED, time.time(), job_id))
+        self._cancelled.discard(job_id)
+        self.start()
+        self._wake.set()
+        return self.get(job_id)
+
+    # --- worker side ---
+
+    def _record_progress(self, job_id: str, done: int, total: Optional[int], message: Optional[str],
+                         checkpoint: Optional[Dict[str, Any]]):
+        with self._connection() as conn:
+            conn.execute("""
+                UPDATE jobs SET progress_done = ?, progress_total = ?, progress_message = ?,
+                    checkpoint = COALESCE(?, checkpoint), heartbeat = ?
+                WHERE id = ?
+            """, (done, total, message, json.dumps(checkpoint) if checkpoint is not None else None,
+                  time.time(), job_id))
+            # A cancel sent to another process only reaches this one through the queue
+            if conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]:
+                self._cancelled.add(job_id)
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        return job_id in self._cancelled
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Take the oldest queued job (one statement, so two workers never take the same one)"""
+        with self._connection() as conn:
+            return conn.execute("""
+                UPDATE jobs SET status = ?, attempts = attempts + 1, owner = ?, heartbeat = ?, started_at = ?
+                WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY queued_at LIMIT 1) AND status = ?
+                RETURNING *
+            """, (RUNNING, self.owner, time.time(), _now(), QUEUED, QUEUED)).fetchone()
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None,
+                error_status: Optional[int] = None):
+        with self._connection() as conn:
+            conn.execute("""
+                UPDATE jobs SET status = ?, result = ?, error = ?, error_status = ?, finished_at = ?, owner = NULL
+                WHERE id = ?
+            """, (status, None if result is None else json.dumps(result, default=str), error, error_status,
+                  _now(), job_id))
+
+    def _run(self, row: sqlite3.Row):
+        job = Job(self, row)
+        start = time.perf_counter()
+        result, error, error_status = None, None, None
+        try:
+            with use_tenant(job.household):
+                result = self._handlers[job.kind](job)
+            status = SUCCEEDED
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as e:
+            # HTTPExceptions from shared endpoint code keep their status code and detail
+            status, error, error_status = FAILED, str(getattr(e, "detail", "") or e), getattr(e, "status_code", None)
+            print(f"⚠️  Job {job.id} ({job.kind}) failed: {error}")
+        finally:
+            self._cancelled.discard(job.id)
+        self._finish(job.id, status, result, error, error_status)
+        if status == SUCCEEDED and job.input_path:
+            shutil.rmtree(os.path.join(self.files_dir, job.id), ignore_errors=True)
+        print(f"🧵 Job {job.id} ({job.kind}) {status} in {time.perf_counter() - start:.2f}s")
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                row = self._claim()
+            except sqlite3.Error as e:
+                print(f"⚠️  Job queue unavailable: {e}")
+                row = None
+            if row is None:
+                self._wake.wait(POLL_SECONDS)
+                self._wake.clear()
+                continue
+            self._run(row)
+
+    def _recover_stale(self) -> int:
+        """Requeue running jobs whose worker stopped heartbeating, or fail them after JOB_MAX_ATTEMPTS"""
+        with self._connection() as conn:
+            stale = conn.execute(
+                "SELECT id, kind, attempts FROM jobs WHERE status = ? AND (heartbeat IS NULL OR heartbeat < ?)",
+                (RUNNING, time.time() - STALE_AFTER_SECONDS),
+            ).fetchall()
+            for job_id, kind, attempts in stale:
+                if attempts < JOB_MAX_ATTEMPTS:
+                    conn.execute("UPDATE jobs SET status = ?, owner = NULL, queued_at = ? WHERE id = ? AND status = ?",
+                                 (QUEUED, time.time(), job_id, RUNNING))
+                    print(f"🧵 Requeued interrupted {kind} job {job_id}")
+                else:
+                    conn.execute("""
+                        UPDATE jobs SET status = ?, owner = NULL, finished_at = ?, error = ?
+                        WHERE id = ? AND status = ?
+                    """, (FAILED, _now(), f"Interrupted {attempts} times; retry it to run it again", job_id, RUNNING))
+        if stale:
+            self._wake.set()
+        return len(stale)
+
+    def prune(self, older_than_days: float = JOB_RETENTION_DAYS) -> int:
+        """Delete finished jobs (and their uploaded files) older than ``older_than_days``"""
+        with self._connection() as conn:
+            rows = conn.execute(f"""
+                DELETE FROM jobs WHERE status IN ({','.join('?' * len(FINISHED))})
+                AND julianday(finished_at) < julianday('now', ?)
+                RETURNING id
+            """, (*FINISHED, f"-{older_than_days} days")).fetchall()
+        for (job_id,) in rows:
+            shutil.rmtree(os.path.join(self.files_dir, job_id), ignore_errors=True)
+        return len(rows)
+
+    def _housekeeping(self):
+        while True:
+            try:
+                with self._connection() as conn:
+                    conn.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = ?",
+                                 (time.time(), self.owner, RUNNING))
+                self._recover_stale()
+                if time.monotonic() - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+                    self._last_prune = time.monotonic()
+                    self.prune()
+            except sqlite3.Error as e:
+                print(f"⚠️  Job queue housekeeping failed: {e}")
+            if self._stop.wait(HEARTBEAT_SECONDS):
+                return
+
+    def start(self) -> "JobQueue":
+        with self._lock:
+            if self._threads and not self._stop.is_set():
+                return self
+            self._stop.clear()
+            self._threads = [threading.Thread(target=self._housekeeping, name="jobs-housekeeping", daemon=True)]
+            self._threads += [threading.Thread(target=self._work, name=f"jobs-{n}", daemon=True)
+                              for n in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        with self._lock:
+            self._stop.set()
+            self._wake.set()
+            self._threads = []
+
+
+def _describe(row: sqlite3.Row, with_result: bool = True) -> Dict[str, Any]:
+    job = {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "params": json.loads(row["params"]),
+        "progress": {"done": row["progress_done"], "total": row["progress_total"], "message": row["progress_message"]},
+        "attempts": row["attempts"],
+        "cancel_requested": bool(row["cancel_requested"]),
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"],
+        "error": row["error"],
+        "error_status": row["error_status"],
+    }
+    if with_result:
+        job["result"] = json.loads(row["result"]) if row["result"] else None
+    return job
@@ -0,0 +1,107 @@
+import sqlite3
+from typing import Any, Dict, Optional
+
+from descriptions import description_sql
+from ingest import cents_to_amount
+from purge import HIDDEN_ACCOUNTS_SQL
+
+# Every money movement in one place: bank/CSV transactions and credit card
+# statement transactions, tagged with the table they came from. It is a view,
+# not a copy, so it can never drift from its sources; WHERE clauses on
+# day_number, account_id or amount_cents are pushed down into both halves and
+# use each table's own indexes. account_id is accounts.id for 'bank' rows and
+# credit_accounts.id for 'credit' rows, so filter on (source, account_id).
+LEDGER_VIEW = "ledger"
+SOURCES = ("bank", "credit")
+
+
+LEDGER_SCHEMA = [
+    f"""CREATE VIEW IF NOT EXISTS {LEDGER_VIEW} AS
+        SELECT 'bank' AS source, t.id AS id, t.account_id AS account_id, NULL AS statement_id,
+               t.date AS date, t.day_number AS day_number, {description_sql("t")} AS description,
+               t.amount_cents AS amount_cents, t.note AS note, t.category AS category
+        FROM transactions t
+        UNION ALL
+        SELECT 'credit', ct.id, cs.credit_account_id, ct.credit_statement_id,
+               ct.transaction_date, ct.day_number, {description_sql("ct")},
+               ct.amount_cents, NULL, ct.category
+        FROM credit_transactions ct
+        JOIN credit_statements cs ON cs.id = ct.credit_statement_id""",
+    # Categorizing through the view updates whichever table the row lives in
+    f"""CREATE TRIGGER IF NOT EXISTS ledger_category_update INSTEAD OF UPDATE OF category ON {LEDGER_VIEW} BEGIN
+        UPDATE transactions SET category = new.category WHERE old.source = 'bank' AND id = old.id;
+        UPDATE credit_transactions SET category = new.category WHERE old.source = 'credit' AND id = old.id;
+    END""",
+]
+
+
+def ensure_ledger(conn: sqlite3.Connection):
+    """Create the current ledger view (migrations.py keeps the form each migration created)"""
+    for sql in LEDGER_SCHEMA:
+        conn.execute(sql)
+
+
+def ledger_filters(source: Optional[str] = None, account_id: Optional[int] = None,
+                   first_day: Optional[int] = None, last_day: Optional[int] = None):
+    """WHERE clause (starting with `` AND``) and parameters for ledger queries"""
+    filters = f" AND NOT (source = 'bank' AND account_id IN ({HIDDEN_ACCOUNTS_SQL}))"
+    params = []
+    for condition, value in (
+        ("source = ?", source),
+        ("account_id = ?", account_id),
+        ("day_number >= ?", first_day),
+        ("day_number <= ?", last_day),
+    ):
+        if value is not None:
+            filters += f" AND {condition}"
+            params.append(value)
+    return filters, params
+
+
+def ledger_analytics(conn: sqlite3.Connection, source: Optional[str] = None, account_id: Optional[int] = None,
+                     first_day: Optional[int] = None, last_day: Optional[int] = None) -> Dict[str, Any]:
+    """Monthly and per-category spending across every source, one query each"""
+    filters, params = ledger_filters(source, account_id, first_day, last_day)
+
+    monthly: Dict[str, Dict[str, Any]] = {}
+    for month, row_source, total in conn.execute(f"""
+        SELECT strftime('%Y-%m', day_number * 86400, 'unixepoch') AS month, source, -SUM(amount_cents)
+        FROM {LEDGER_VIEW}
+        WHERE amount_cents < 0{filters}
+        GROUP BY month, source
+        ORDER BY month
+    """, params):
+        entry = monthly.setdefault(month, {"month": month, "amount": 0.0, "by_source": {}})
+        entry["by_source"][row_source] = cents_to_amount(total)
+        entry["amount"] = round(entry["amount"] + cents_to_amount(total), 2)
+
+    categories = [
+        {"category": row[0], "amount": cents_to_amount(row[1]), "transaction_count": row[2]}
+        for row in conn.execute(f"""
+            SELECT category, -SUM(amount_cents) AS total, COUNT(*)
+            FROM {LEDGER_VIEW}
+            WHERE amount_cents < 0{filters}
+            GROUP BY category
+            ORDER BY total DESC
+        """, params)
+    ]
+
+    totals = {
+        row[0]: {"spending": cents_to_amount(row[1]), "income": cents_to_amount(row[2]), "transaction_count": row[3]}
+        for row in conn.execute(f"""
+            SELECT source, -SUM(MIN(amount_cents, 0)), SUM(MAX(amount_cents, 0)), COUNT(*)
+            FROM {LEDGER_VIEW}
+            WHERE 1 = 1{filters}
+            GROUP BY source
+        """, params)
+    }
+    return {"monthly_spending": list(monthly.values()), "categories": categories, "sources": totals}
+
+
+def categorize_ledger_entry(conn: sqlite3.Connection, source: str, entry_id: int, category: str) -> bool:
+    """Set the category of one ledger row; False if it does not exist"""
+    # Writes through INSTEAD OF triggers are not counted in rowcount, so check first
+    if conn.execute(f"SELECT 1 FROM {LEDGER_VIEW} WHERE source = ? AND id = ?", (source, entry_id)).fetchone() is None:
+        return False
+    conn.execute(f"UPDATE {LEDGER_VIEW} SET category = ? WHERE source = ? AND id = ?", (category, source, entry_id))
+    return True
@@ -0,0 +1,60 @@
+import sqlite3
+from typing import Any, List, Optional, Tuple
+
+from descriptions import description_sql
+
+# Keyset pagination for transaction listings. A page never uses OFFSET: the
+# next page starts strictly after the (sort key, id) of the last row returned,
+# which the indexes below turn into a range seek, so page 500 costs the same
+# as page 1.
+#
+#   sort=date    -> idx_transactions_account_day      (account_id, day_number, id, ...)
+#                   idx_transactions_account_category (account_id, category, day_number, id, ...)
+#   sort=amount  -> idx_transactions_account_amount   (account_id, amount_cents, id)
+SORT_COLUMNS = {"date": "day_number", "amount": "amount_cents"}
+SIGNS = {"debit": "amount_cents < 0", "credit": "amount_cents > 0"}
+PAGE_LIMIT = 1000
+
+
+def transaction_filters(account_id: int, first_day: Optional[int] = None, last_day: Optional[int] = None,
+                        category: Optional[str] = None, min_cents: Optional[int] = None,
+                        max_cents: Optional[int] = None, sign: Optional[str] = None) -> Tuple[str, List[Any]]:
+    """WHERE clause and parameters for a filtered listing of one account's transactions"""
+    conditions, params = ["account_id = ?"], [account_id]
+    for condition, value in (
+        ("day_number >= ?", first_day),
+        ("day_number <= ?", last_day),
+        ("category = ?", category),
+        ("amount_cents >= ?", min_cents),
+        ("amount_cents <= ?", max_cents),
+    ):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    if sign:
+        conditions.append(SIGNS[sign])
+    return " AND ".join(conditions), params
+
+
+def transactions_page(conn: sqlite3.Connection, where: str, params: List[Any], sort: str = "date",
+                      descending: bool = True, after: Optional[Tuple[int, int]] = None,
+                      limit: int = 100) -> List[tuple]:
+    """One page of ``(id, date, description, amount_cents, note, category, sort_key)`` after the ``after`` key"""
+    column = SORT_COLUMNS[sort]
+    direction = "DESC" if descending else "ASC"
+    keyset, keyset_params = "", []
+    if after is not None:
+        keyset = f" AND ({column}, id) {'<' if descending else '>'} (?, ?)"
+        keyset_params = list(after)
+    return conn.execute(f"""
+        SELECT id, date, {description_sql('transactions')}, amount_cents, note, category, {column}
+        FROM transactions
+        WHERE {where}{keyset}
+        ORDER BY {column} {direction}, id {direction}
+        LIMIT ?
+    """, [*params, *keyset_params, limit]).fetchall()
+
+
+def count_transactions(conn: sqlite3.Connection, where: str, params: List[Any]) -> int:
+    """Number of rows matching the filters (index-only count)"""
+    return conn.execute(f"SELECT COUNT(*) FROM transactions WHERE {where}", params).fetchone()[0]
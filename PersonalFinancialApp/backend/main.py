@@ -1,4 +1,4 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import pandas as pd
@@ -10,8 +10,34 @@ import os
 import numpy as np
 from difflib import SequenceMatcher
 import re
+import shutil
+import time
+import tempfile
 from pathlib import Path
-from backup_manager import BackupManager
+from backup_manager import BackupManager, InvalidBackupError
+from database import db, storage_stats, offload, parse_executor
+from households import HouseholdMiddleware
+from migrations import run_migrations
+from search import (search_index_exists, search_transactions, search_ledger, count_search_matches,
+                    HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE)
+from ledger import SOURCES as LEDGER_SOURCES, ledger_analytics, categorize_ledger_entry
+from purge import PURGE_BATCH_SIZE, hide_account, hide_bank, schedule_purge
+from maintenance import MaintenanceScheduler
+from jobs import Job, JobCancelled, JobQueue
+from analytics_mirror import analytics_mirror, account_analytics, mirror_ledger_analytics, sqlite_freshness
+from archive import (archive_catalog, archive_closed_months, archive_enabled, archived_count, archived_page,
+                     merge_account_analytics, merge_ledger_analytics, restore_account, restore_month,
+                     search_archive, valid_month, ARCHIVE_AFTER_MONTHS, ARCHIVE_DAYS_TABLE)
+from raw_store import fetch_raw
+from importer import (IMPORT_CHUNK_ROWS, REJECTS_RETURNED, REQUIRED_FIELDS, import_rows, preview_csv,
+                      read_csv_chunks, read_csv_columns)
+from bulk_import import import_statement_files
+from descriptions import DESCRIPTIONS_TABLE, description_sql, intern_descriptions
+from listing import SORT_COLUMNS, SIGNS, PAGE_LIMIT as LISTING_PAGE_LIMIT, transaction_filters, transactions_page, count_transactions
+from balances import (display_balance, display_balance_sql, verify_balances, opening_balance,
+                      running_balance_page, daily_balance_page, archived_day_totals, add_archived_to_running)
+from ingest import (normalize_date, normalize_dates, parse_amounts, sql_values, to_cents, cents_to_amount,
+                    day_number_to_iso)
 
 app = FastAPI(title="Personal Finance Manager")
 
@@ -21,158 +47,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
+# Picks the household database for each request (X-Household header or /h/<name>/ prefix)
+app.add_middleware(HouseholdMiddleware)
 
 # Database setup
-DATABASE_PATH = "data/finance.db"
 os.makedirs("data", exist_ok=True)
 
-def init_db():
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Drop existing tables to recreate clean schema
-    cursor.execute("DROP TABLE IF EXISTS transactions")
-    cursor.execute("DROP TABLE IF EXISTS accounts") 
-    cursor.execute("DROP TABLE IF EXISTS banks")
-    
-    # Create banks table
-    cursor.execute("""
-        CREATE TABLE banks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Create accounts table
-    cursor.execute("""
-        CREATE TABLE accounts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            bank_id INTEGER,
-            name TEXT NOT NULL,
-            account_type TEXT DEFAULT 'checking',
-            balance REAL DEFAULT 0.0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (bank_id) REFERENCES banks (id)
-        )
-    """)
-    
-    # Create transactions table
-    cursor.execute("""
-        CREATE TABLE transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            account_id INTEGER,
-            date TEXT,
-            description TEXT,
-            amount REAL,
-            note TEXT,
-            category TEXT DEFAULT 'Uncategorized',
-            raw_data TEXT,
-            FOREIGN KEY (account_id) REFERENCES accounts (id)
-        )
-    """)
-    
-    # Create investment accounts table
-    cursor.execute("""
-        CREATE TABLE investment_accounts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            account_type TEXT DEFAULT 'brokerage',
-            custodian TEXT,
-            account_number TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Create securities table
-    cursor.execute("""
-        CREATE TABLE securities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            investment_account_id INTEGER,
-            symbol TEXT,
-            name TEXT,
-            security_type TEXT,
-            quantity REAL,
-            share_price REAL,
-            total_cost REAL,
-            market_value REAL,
-            unrealized_gain_loss REAL,
-            statement_date TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (investment_account_id) REFERENCES investment_accounts (id)
-        )
-    """)
-    
-    # Create portfolio statements table
-    cursor.execute("""
-        CREATE TABLE portfolio_statements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            investment_account_id INTEGER,
-            statement_date TEXT,
-            opening_balance REAL,
-            period_gain_loss REAL,
-            ending_balance REAL,
-            total_market_value REAL,
-            total_cost_basis REAL,
-            total_unrealized_gain_loss REAL,
-            statement_file_path TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (investment_account_id) REFERENCES investment_accounts (id)
-        )
-    """)
-    
-    # Create credit card accounts table
-    cursor.execute("""
-        CREATE TABLE credit_accounts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            account_type TEXT DEFAULT 'credit',
-            provider TEXT,
-            account_number TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Create credit card statements table
-    cursor.execute("""
-        CREATE TABLE credit_statements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            credit_account_id INTEGER,
-            statement_date TEXT,
-            payment_due_date TEXT,
-            new_balance REAL,
-            minimum_payment_due REAL,
-            statement_file_path TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (credit_account_id) REFERENCES credit_accounts (id)
-        )
-    """)
-    
-    # Create credit card transactions table
-    cursor.execute("""
-        CREATE TABLE credit_transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            credit_statement_id INTEGER,
-            transaction_date TEXT,
-            description TEXT,
-            amount REAL,
-            category TEXT DEFAULT 'Uncategorized',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (credit_statement_id) REFERENCES credit_statements (id)
-        )
-    """)
-    
-    conn.commit()
-    conn.close()
-    print("Database schema recreated successfully")
+# Bring the schema up to date; a single version check when already current
+run_migrations(db)
+
+def prepare_household(pool):
+    """Migrate a household database when it is opened and finish any interrupted purge"""
+    run_migrations(pool)
+    schedule_purge(pool)
 
-# Only initialize database if it doesn't exist
-if not os.path.exists(DATABASE_PATH):
-    init_db()
-    print("Database initialized for the first time")
-else:
-    print("Database already exists, skipping initialization")
+db.prepare = prepare_household
 
 class ColumnMapping(BaseModel):
     date: str
@@ -258,18 +149,6 @@ class PortfolioStatementModel(BaseModel):
     total_unrealized_gain_loss: float
     securities: List[SecurityModel]
 
-def safe_float(value):
-    """Safely convert value to float, handling NaN and infinite values"""
-    try:
-        if pd.isna(value):
-            return 0.0
-        val = float(value)
-        if not (val == val) or val == float('inf') or val == float('-inf'):
-            return 0.0
-        return val
-    except (ValueError, TypeError):
-        return 0.0
-
 def clean_for_json(obj):
     """Clean data structure for JSON serialization"""
     if isinstance(obj, dict):
@@ -289,20 +168,31 @@ def clean_for_json(obj):
     else:
         return str(obj) if obj is not None else ""
 
-def fuzzy_match_category(description: str, account_id: int, threshold: float = 0.4):
+def parse_day_range(date_from: Optional[str], date_to: Optional[str]):
+    """Convert optional date_from/date_to query parameters to day numbers (400 if unparseable)"""
+    first_day = normalize_date(date_from)[1] if date_from else None
+    last_day = normalize_date(date_to)[1] if date_to else None
+    if (date_from and first_day is None) or (date_to and last_day is None):
+        raise HTTPException(status_code=400, detail="Invalid date_from/date_to")
+    return first_day, last_day
+
+def categorized_descriptions(conn, account_id: int):
+    """Distinct (description, category) pairs already categorized in an account"""
+    return conn.execute(f"""
+        SELECT d.text, c.category
+        FROM (
+            SELECT DISTINCT description_id, category
+            FROM transactions
+            WHERE account_id = ? AND category != 'Uncategorized' AND category IS NOT NULL
+        ) c
+        JOIN {DESCRIPTIONS_TABLE} d ON d.id = c.description_id
+    """, (account_id,)).fetchall()
+
+def fuzzy_match_category(description: str, account_id: int, threshold: float = 0.4, categorized_transactions=None):
     """Find the best matching category for a description using fuzzy matching"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Get existing categorized transactions for this account
-    cursor.execute("""
-        SELECT DISTINCT description, category 
-        FROM transactions 
-        WHERE account_id = ? AND category != 'Uncategorized' AND category IS NOT NULL
-    """, (account_id,))
-    
-    categorized_transactions = cursor.fetchall()
-    conn.close()
+    if categorized_transactions is None:
+        with db.connection() as conn:
+            categorized_transactions = categorized_descriptions(conn, account_id)
     
     print(f"Fuzzy matching for '{description}' - found {len(categorized_transactions)} categorized transactions")
     
@@ -344,340 +234,297 @@ def fuzzy_match_category(description: str, account_id: int, threshold: float = 0
     print(f"Final result: {result} (best score: {best_score:.3f})")
     return result
 
-def create_category_rules_table():
-    """Create table for storing category matching rules"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS category_rules (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            account_id INTEGER,
-            pattern TEXT NOT NULL,
-            category TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (account_id) REFERENCES accounts (id)
-        )
-    """)
-    
-    conn.commit()
-    conn.close()
-
-def create_predefined_categories_table():
-    """Create table for predefined hierarchical categories"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Drop existing table to recreate with new structure
-    cursor.execute("DROP TABLE IF EXISTS predefined_categories")
-    
-    cursor.execute("""
-        CREATE TABLE predefined_categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            category_path TEXT UNIQUE NOT NULL,
-            level_1 TEXT NOT NULL,
-            level_2 TEXT,
-            level_3 TEXT,
-            level_4 TEXT,
-            display_name TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Insert the hierarchical categories
-    categories_data = [
-        # Income
-        ("Income", "Income", None, None, None, "Income"),
-        ("Income:Salary", "Income", "Salary", None, None, "Salary & Wages"),
-        ("Income:Business", "Income", "Business", None, None, "Business Income"),
-        ("Income:Freelance", "Income", "Freelance", None, None, "Freelance/Contract"),
-        ("Income:Investments", "Income", "Investments", None, None, "Investments"),
-        ("Income:Investments:Dividends", "Income", "Investments", "Dividends", None, "Dividends"),
-        ("Income:Investments:Interest", "Income", "Investments", "Interest", None, "Interest"),
-        ("Income:Investments:CapitalGains", "Income", "Investments", "CapitalGains", None, "Capital Gains"),
-        ("Income:Investments:Rental", "Income", "Investments", "Rental", None, "Rental Income"),
-        ("Income:Government", "Income", "Government", None, None, "Government Benefits"),
-        ("Income:Other", "Income", "Other", None, None, "Other Income"),
-        
-        # Expenses
-        ("Expenses", "Expenses", None, None, None, "Expenses"),
-        
-        # Housing & Household
-        ("Expenses:Housing", "Expenses", "Housing", None, None, "Housing"),
-        ("Expenses:Housing:Rent", "Expenses", "Housing", "Rent", None, "Rent"),
-        ("Expenses:Housing:Mortgage", "Expenses", "Housing", "Mortgage", None, "Mortgage"),
-        ("Expenses:Housing:PropertyTax", "Expenses", "Housing", "PropertyTax", None, "Property Tax"),
-        ("Expenses:Housing:HomeInsurance", "Expenses", "Housing", "HomeInsurance", None, "Home Insurance"),
-        ("Expenses:Housing:Utilities", "Expenses", "Housing", "Utilities", None, "Utilities"),
-        ("Expenses:Housing:Utilities:Electricity", "Expenses", "Housing", "Utilities", "Electricity", "Electricity"),
-        ("Expenses:Housing:Utilities:Gas", "Expenses", "Housing", "Utilities", "Gas", "Gas"),
-        ("Expenses:Housing:Utilities:Water", "Expenses", "Housing", "Utilities", "Water", "Water & Sewer"),
-        ("Expenses:Housing:Utilities:Internet", "Expenses", "Housing", "Utilities", "Internet", "Internet"),
-        ("Expenses:Housing:Utilities:Cable", "Expenses", "Housing", "Utilities", "Cable", "Cable/Streaming"),
-        ("Expenses:Housing:Utilities:Phone", "Expenses", "Housing", "Utilities", "Phone", "Phone"),
-        ("Expenses:Housing:Maintenance", "Expenses", "Housing", "Maintenance", None, "Maintenance & Repairs"),
-        ("Expenses:Housing:Improvement", "Expenses", "Housing", "Improvement", None, "Home Improvement"),
-        
-        ("Expenses:Household", "Expenses", "Household", None, None, "Household Items"),
-        ("Expenses:Household:Cleaning", "Expenses", "Household", "Cleaning", None, "Cleaning Supplies"),
-        ("Expenses:Household:Kitchen", "Expenses", "Household", "Kitchen", None, "Kitchen & Dining"),
-        ("Expenses:Household:Furniture", "Expenses", "Household", "Furniture", None, "Furniture"),
-        ("Expenses:Household:Decor", "Expenses", "Household", "Decor", None, "Home Decor"),
-        ("Expenses:Household:Gardening", "Expenses", "Household", "Gardening", None, "Gardening"),
-        ("Expenses:Household:Gardening:Plants", "Expenses", "Household", "Gardening", "Plants", "Seeds & Plants"),
-        ("Expenses:Household:Gardening:Tools", "Expenses", "Household", "Gardening", "Tools", "Tools & Equipment"),
-        ("Expenses:Household:Gardening:Supplies", "Expenses", "Household", "Gardening", "Supplies", "Fertilizer & Soil"),
-        
-        # Food & Dining
-        ("Expenses:Food", "Expenses", "Food", None, None, "Food & Dining"),
-        ("Expenses:Food:Groceries", "Expenses", "Food", "Groceries", None, "Groceries"),
-        ("Expenses:Food:Groceries:Produce", "Expenses", "Food", "Groceries", "Produce", "Fresh Produce"),
-        ("Expenses:Food:Groceries:Meat", "Expenses", "Food", "Groceries", "Meat", "Meat & Seafood"),
-        ("Expenses:Food:Groceries:Dairy", "Expenses", "Food", "Groceries", "Dairy", "Dairy & Eggs"),
-        ("Expenses:Food:Groceries:Pantry", "Expenses", "Food", "Groceries", "Pantry", "Pantry Items"),
-        ("Expenses:Food:Groceries:Beverages", "Expenses", "Food", "Groceries", "Beverages", "Beverages"),
-        ("Expenses:Food:DiningOut", "Expenses", "Food", "DiningOut", None, "Dining Out"),
-        ("Expenses:Food:DiningOut:Restaurants", "Expenses", "Food", "DiningOut", "Restaurants", "Restaurants"),
-        ("Expenses:Food:DiningOut:FastFood", "Expenses", "Food", "DiningOut", "FastFood", "Fast Food"),
-        ("Expenses:Food:DiningOut:Coffee", "Expenses", "Food", "DiningOut", "Coffee", "Coffee Shops"),
-        ("Expenses:Food:DiningOut:Bars", "Expenses", "Food", "DiningOut", "Bars", "Bars & Nightlife"),
-        ("Expenses:Food:Delivery", "Expenses", "Food", "Delivery", None, "Food Delivery"),
-        
-        # Transportation
-        ("Expenses:Transportation", "Expenses", "Transportation", None, None, "Transportation"),
-        ("Expenses:Transportation:Vehicle", "Expenses", "Transportation", "Vehicle", None, "Vehicle Expenses"),
-        ("Expenses:Transportation:Vehicle:Fuel", "Expenses", "Transportation", "Vehicle", "Fuel", "Fuel"),
-        ("Expenses:Transportation:Vehicle:Payment", "Expenses", "Transportation", "Vehicle", "Payment", "Car Payment"),
-        ("Expenses:Transportation:Vehicle:Insurance", "Expenses", "Transportation", "Vehicle", "Insurance", "Car Insurance"),
-        ("Expenses:Transportation:Vehicle:Maintenance", "Expenses", "Transportation", "Vehicle", "Maintenance", "Maintenance & Repairs"),
-        ("Expenses:Transportation:Vehicle:Registration", "Expenses", "Transportation", "Vehicle", "Registration", "Registration & Fees"),
-        ("Expenses:Transportation:PublicTransit", "Expenses", "Transportation", "PublicTransit", None, "Public Transportation"),
-        ("Expenses:Transportation:RideShare", "Expenses", "Transportation", "RideShare", None, "Ride Share"),
-        ("Expenses:Transportation:Parking", "Expenses", "Transportation", "Parking", None, "Parking"),
-        ("Expenses:Transportation:Travel", "Expenses", "Transportation", "Travel", None, "Travel"),
-        
-        # Personal Care & Health
-        ("Expenses:Healthcare", "Expenses", "Healthcare", None, None, "Healthcare"),
-        ("Expenses:Healthcare:Doctor", "Expenses", "Healthcare", "Doctor", None, "Doctor Visits"),
-        ("Expenses:Healthcare:Dental", "Expenses", "Healthcare", "Dental", None, "Dental"),
-        ("Expenses:Healthcare:Vision", "Expenses", "Healthcare", "Vision", None, "Vision"),
-        ("Expenses:Healthcare:Pharmacy", "Expenses", "Healthcare", "Pharmacy", None, "Pharmacy"),
-        ("Expenses:Healthcare:Insurance", "Expenses", "Healthcare", "Insurance", None, "Health Insurance"),
-        ("Expenses:Healthcare:Mental", "Expenses", "Healthcare", "Mental", None, "Mental Health"),
-        
-        ("Expenses:PersonalCare", "Expenses", "PersonalCare", None, None, "Personal Care"),
-        ("Expenses:PersonalCare:Hair", "Expenses", "PersonalCare", "Hair", None, "Haircare"),
-        ("Expenses:PersonalCare:Skincare", "Expenses", "PersonalCare", "Skincare", None, "Skincare"),
-        ("Expenses:PersonalCare:Clothing", "Expenses", "PersonalCare", "Clothing", None, "Clothing"),
-        ("Expenses:PersonalCare:Clothing:Work", "Expenses", "PersonalCare", "Clothing", "Work", "Work Clothes"),
-        ("Expenses:PersonalCare:Clothing:Casual", "Expenses", "PersonalCare", "Clothing", "Casual", "Casual Wear"),
-        ("Expenses:PersonalCare:Clothing:Shoes", "Expenses", "PersonalCare", "Clothing", "Shoes", "Shoes"),
-        ("Expenses:PersonalCare:Clothing:Accessories", "Expenses", "PersonalCare", "Clothing", "Accessories", "Accessories"),
-        ("Expenses:PersonalCare:Fitness", "Expenses", "PersonalCare", "Fitness", None, "Fitness & Gym"),
-        
-        # Family & Dependents
-        ("Expenses:Family", "Expenses", "Family", None, None, "Family & Dependents"),
-        ("Expenses:Family:Childcare", "Expenses", "Family", "Childcare", None, "Childcare"),
-        ("Expenses:Family:ChildEducation", "Expenses", "Family", "ChildEducation", None, "Child Education"),
-        ("Expenses:Family:ChildActivities", "Expenses", "Family", "ChildActivities", None, "Child Activities"),
-        ("Expenses:Family:Support", "Expenses", "Family", "Support", None, "Family Support"),
-        ("Expenses:Family:Pets", "Expenses", "Family", "Pets", None, "Pet Care"),
-        
-        # Entertainment & Lifestyle
-        ("Expenses:Entertainment", "Expenses", "Entertainment", None, None, "Entertainment & Lifestyle"),
-        ("Expenses:Entertainment:Movies", "Expenses", "Entertainment", "Movies", None, "Movies & Theater"),
-        ("Expenses:Entertainment:Concerts", "Expenses", "Entertainment", "Concerts", None, "Concerts & Events"),
-        ("Expenses:Entertainment:Hobbies", "Expenses", "Entertainment", "Hobbies", None, "Hobbies"),
-        ("Expenses:Entertainment:Sports", "Expenses", "Entertainment", "Sports", None, "Sports & Recreation"),
-        ("Expenses:Entertainment:Subscriptions", "Expenses", "Entertainment", "Subscriptions", None, "Subscriptions"),
-        ("Expenses:Entertainment:Subscriptions:Streaming", "Expenses", "Entertainment", "Subscriptions", "Streaming", "Streaming Services"),
-        ("Expenses:Entertainment:Subscriptions:Software", "Expenses", "Entertainment", "Subscriptions", "Software", "Software"),
-        ("Expenses:Entertainment:Subscriptions:Magazines", "Expenses", "Entertainment", "Subscriptions", "Magazines", "Magazines"),
-        ("Expenses:Entertainment:Vacation", "Expenses", "Entertainment", "Vacation", None, "Travel & Vacation"),
-        
-        # Professional & Education
-        ("Expenses:Professional", "Expenses", "Professional", None, None, "Professional & Education"),
-        ("Expenses:Professional:Development", "Expenses", "Professional", "Development", None, "Professional Development"),
-        ("Expenses:Professional:Education", "Expenses", "Professional", "Education", None, "Education & Training"),
-        ("Expenses:Professional:WorkExpenses", "Expenses", "Professional", "WorkExpenses", None, "Work Expenses"),
-        ("Expenses:Professional:Services", "Expenses", "Professional", "Services", None, "Professional Services"),
-        
-        # Financial & Administrative
-        ("Expenses:Financial", "Expenses", "Financial", None, None, "Financial & Administrative"),
-        ("Expenses:Financial:BankFees", "Expenses", "Financial", "BankFees", None, "Bank Fees"),
-        ("Expenses:Financial:CreditCardFees", "Expenses", "Financial", "CreditCardFees", None, "Credit Card Fees"),
-        ("Expenses:Financial:ProfessionalServices", "Expenses", "Financial", "ProfessionalServices", None, "Professional Services"),
-        ("Expenses:Financial:ProfessionalServices:Legal", "Expenses", "Financial", "ProfessionalServices", "Legal", "Legal"),
-        ("Expenses:Financial:ProfessionalServices:Accounting", "Expenses", "Financial", "ProfessionalServices", "Accounting", "Accounting"),
-        ("Expenses:Financial:ProfessionalServices:Financial", "Expenses", "Financial", "ProfessionalServices", "Financial", "Financial Planning"),
-        ("Expenses:Financial:Insurance", "Expenses", "Financial", "Insurance", None, "Insurance"),
-        ("Expenses:Financial:Insurance:Life", "Expenses", "Financial", "Insurance", "Life", "Life Insurance"),
-        ("Expenses:Financial:Insurance:Disability", "Expenses", "Financial", "Insurance", "Disability", "Disability Insurance"),
-        ("Expenses:Financial:Taxes", "Expenses", "Financial", "Taxes", None, "Taxes"),
-        
-        # Miscellaneous
-        ("Expenses:Miscellaneous", "Expenses", "Miscellaneous", None, None, "Miscellaneous"),
-        ("Expenses:Miscellaneous:Donations", "Expenses", "Miscellaneous", "Donations", None, "Donations"),
-        ("Expenses:Miscellaneous:Fees", "Expenses", "Miscellaneous", "Fees", None, "Fees"),
-        ("Expenses:Miscellaneous:Other", "Expenses", "Miscellaneous", "Other", None, "Other"),
-        
-        # Transfers
-        ("Transfers", "Transfers", None, None, None, "Transfers"),
-        ("Transfers:BankTransfer", "Transfers", "BankTransfer", None, None, "Bank Transfer"),
-        ("Transfers:InternalTransfer", "Transfers", "InternalTransfer", None, None, "Internal Transfer"),
-        ("Transfers:CreditCardPayment", "Transfers", "CreditCardPayment", None, None, "Credit Card Payment"),
-        
-        # Credit Card Specific Categories
-        ("Expenses:CreditCard", "Expenses", "CreditCard", None, None, "Credit Card Expenses"),
-        ("Expenses:CreditCard:AnnualFee", "Expenses", "CreditCard", "AnnualFee", None, "Annual Fee"),
-        ("Expenses:CreditCard:LateFee", "Expenses", "CreditCard", "LateFee", None, "Late Fee"),
-        ("Expenses:CreditCard:Interest", "Expenses", "CreditCard", "Interest", None, "Interest Charge"),
-        ("Expenses:CreditCard:ForeignTransaction", "Expenses", "CreditCard", "ForeignTransaction", None, "Foreign Transaction Fee"),
-        ("Expenses:CreditCard:BalanceTransfer", "Expenses", "CreditCard", "BalanceTransfer", None, "Balance Transfer Fee"),
-        
-        # Deposits
-        ("Deposits", "Deposits", None, None, None, "Deposits"),
-        ("Deposits:CashDeposit", "Deposits", "CashDeposit", None, None, "Cash Deposit"),
-        ("Deposits:CheckDeposit", "Deposits", "CheckDeposit", None, None, "Check Deposit"),
-        ("Deposits:Refund", "Deposits", "Refund", None, None, "Refund"),
-        
-        # Savings and Investments
-        ("SavingsAndInvestments", "SavingsAndInvestments", None, None, None, "Savings & Investments"),
-        ("SavingsAndInvestments:EmergencyFund", "SavingsAndInvestments", "EmergencyFund", None, None, "Emergency Fund"),
-        ("SavingsAndInvestments:Retirement", "SavingsAndInvestments", "Retirement", None, None, "Retirement"),
-        ("SavingsAndInvestments:Brokerage", "SavingsAndInvestments", "Brokerage", None, None, "Brokerage"),
-    ]
-    
-    cursor.executemany("""
-        INSERT INTO predefined_categories (category_path, level_1, level_2, level_3, level_4, display_name)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, categories_data)
-    
-    conn.commit()
-    conn.close()
-    print("Predefined categories table created and populated successfully")
-
-# Initialize the tables
-create_category_rules_table()
-create_predefined_categories_table()
-
 @app.get("/")
 async def root():
     return {"message": "Personal Finance Manager API"}
 
+maintenance = MaintenanceScheduler(db)
+# Background jobs for slow operations called with async=true (see jobs.py)
+jobs = JobQueue()
+
+@app.on_event("startup")
+async def start_background_checks():
+    # ANALYZE, incremental vacuum, checkpoints, integrity and balance checks (see maintenance.py)
+    maintenance.start()
+    # Run jobs still queued (or interrupted) when the server last stopped
+    jobs.start()
+    # Finish purges of deleted banks/accounts interrupted by a restart
+    # (household databases are checked when they are opened)
+    schedule_purge(db.default)
+
+@app.get("/admin/balances/verify")
+@offload
+def verify_account_balances():
+    """Recount every account balance from its transactions and report drift"""
+    with db.connection() as conn:
+        return verify_balances(conn)
+
+@app.post("/admin/balances/repair")
+@offload
+def repair_account_balances():
+    """Reset drifted balances to the sum of their transactions"""
+    with db.transaction() as conn:
+        return verify_balances(conn, repair=True)
+
+@app.get("/admin/db/stats")
+@offload
+def get_database_stats():
+    """Connection pool size and wait-time statistics, database size per table, open household databases"""
+    with db.connection() as conn:
+        storage = storage_stats(conn)
+    return {"pool": db.stats(), "storage": storage}
+
+@app.get("/admin/maintenance")
+@offload
+def get_maintenance_status():
+    """Last run, duration and result of each maintenance task, plus free pages and WAL size"""
+    return maintenance.status()
+
+@app.post("/admin/maintenance/{task}")
+@offload
+def run_maintenance_task(task: str):
+    """Run one maintenance task now on every database (e.g. analyze, incremental_vacuum, checkpoint, quick_check, vacuum)"""
+    if task not in maintenance.task_names:
+        raise HTTPException(status_code=404, detail=f"Unknown maintenance task. Available: {maintenance.task_names}")
+    return maintenance.run_task(task)
+
+def queued_job(kind: str, params: dict, uploads: List[UploadFile] = ()):
+    """Queue a background job (with copies of the uploaded files) and answer 202 with its id"""
+    job = jobs.submit(kind, params, [(upload.file, upload.filename) for upload in uploads])
+    return JSONResponse(status_code=202, content={
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/jobs/{job['id']}",
+    })
+
+def _import_job(job: Job):
+    with open(job.input_path, "rb") as source:
+        return run_import(job.params["account_id"], source, job.params["mapping"], job.params["stream"], job)
+
+jobs.register("import_transactions", _import_job)
+jobs.register("import_archive",
+              lambda job: run_archive_import(job.params["account_id"], job.input_paths, job.params["mappings"], job))
+jobs.register("auto_categorize", lambda job: categorize_account(job.params["account_id"], job))
+jobs.register("parse_credit_card_statement", lambda job: parse_credit_card_pdf(job.input_path))
+jobs.register("backup_bank", lambda job: create_bank_backup(job.params["bank_id"], job.params.get("bank_name")))
+
+def _job_or_404(job: Optional[dict]) -> dict:
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs")
+@offload
+def list_jobs(status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50):
+    """Background jobs of this household, newest first"""
+    return {"jobs": jobs.list(status, kind, min(max(limit, 1), 500))}
+
+@app.get("/jobs/{job_id}")
+@offload
+def get_job(job_id: str):
+    """Status and progress of a job, with its result or error once finished"""
+    return _job_or_404(jobs.get(job_id))
+
+@app.get("/jobs/{job_id}/result")
+@offload
+def get_job_result(job_id: str):
+    """What the endpoint would have returned without async=true (its error if the job failed)"""
+    job = _job_or_404(jobs.get(job_id))
+    if job["status"] == "succeeded":
+        return job["result"]
+    if job["status"] == "failed":
+        raise HTTPException(status_code=job["error_status"] or 500, detail=job["error"])
+    raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+
+@app.post("/jobs/{job_id}/cancel")
+@offload
+def cancel_job(job_id: str):
+    """Cancel a queued job, or stop a running one at its next progress point"""
+    try:
+        return _job_or_404(jobs.cancel(job_id))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/jobs/{job_id}/retry")
+@offload
+def retry_job(job_id: str):
+    """Queue a failed or cancelled job again (a streamed import carries on after its last committed chunk)"""
+    try:
+        return _job_or_404(jobs.retry(job_id))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+class ArchiveRestoreRequest(BaseModel):
+    account_id: int
+    month: Optional[str] = None
+
+@app.get("/admin/archive")
+@offload
+def get_archive(account_id: Optional[int] = None):
+    """Archived account months (see archive.py)"""
+    with db.connection() as conn:
+        months = archive_catalog(conn, account_id)
+    return {"enabled": archive_enabled(), "archive_after_months": ARCHIVE_AFTER_MONTHS, "months": months}
+
+@app.post("/admin/archive")
+@offload
+def run_archive(older_than_months: Optional[int] = None):
+    """Archive closed months now (default age FINANCE_ARCHIVE_AFTER_MONTHS)"""
+    if not archive_enabled():
+        raise HTTPException(status_code=503, detail="Archiving needs a Parquet engine (pip install pyarrow)")
+    months = ARCHIVE_AFTER_MONTHS if older_than_months is None else older_than_months
+    if months < 1:
+        raise HTTPException(status_code=400, detail="older_than_months must be at least 1")
+    with db.lease() as pool:
+        return archive_closed_months(pool, months)
+
+@app.post("/admin/archive/restore")
+@offload
+def restore_archive(request: ArchiveRestoreRequest):
+    """Move one archived month (or every archived month of an account) back into the transactions table"""
+    if request.month is None:
+        with db.lease() as pool:
+            return {"account_id": request.account_id, "restored": restore_account(pool, request.account_id)}
+    if not valid_month(request.month):
+        raise HTTPException(status_code=400, detail="month must be YYYY-MM")
+    with db.lease() as pool:
+        restored = restore_month(pool, request.account_id, request.month)
+    if restored is None:
+        raise HTTPException(status_code=404, detail="That month is not archived")
+    return {"account_id": request.account_id, "restored": {request.month: restored}}
+
 @app.get("/banks")
-async def get_banks():
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT b.id, b.name, 
-               COUNT(a.id) as account_count,
-               COALESCE(SUM(a.balance), 0) as total_balance
-        FROM banks b 
-        LEFT JOIN accounts a ON b.id = a.bank_id 
-        GROUP BY b.id, b.name
-    """)
-    banks = [
-        {
-            "id": row[0], 
-            "name": row[1], 
-            "account_count": row[2],
-            "total_balance": safe_float(row[3])
-        } 
-        for row in cursor.fetchall()
-    ]
-    conn.close()
+@offload
+def get_banks():
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT b.id, b.name, 
+                   COUNT(a.id) as account_count,
+                   COALESCE(SUM(""" + display_balance_sql("a") + """), 0) as total_balance
+            FROM banks b 
+            LEFT JOIN accounts a ON b.id = a.bank_id AND a.deleted_at IS NULL
+            WHERE b.deleted_at IS NULL
+            GROUP BY b.id, b.name
+        """)
+        banks = [
+            {
+                "id": row[0], 
+                "name": row[1], 
+                "account_count": row[2],
+                "total_balance": cents_to_amount(row[3])
+            } 
+            for row in cursor.fetchall()
+        ]
     return banks
 
 @app.post("/banks")
-async def create_bank(bank: BankModel):
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("INSERT INTO banks (name) VALUES (?)", (bank.name,))
-        bank_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return {"id": bank_id, "name": bank.name}
-    except sqlite3.IntegrityError:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Bank already exists")
+@offload
+def create_bank(bank: BankModel):
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("INSERT INTO banks (name) VALUES (?)", (bank.name,))
+            bank_id = cursor.lastrowid
+            return {"id": bank_id, "name": bank.name}
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=400, detail="Bank already exists")
 
 @app.get("/banks/{bank_id}/accounts")
-async def get_accounts(bank_id: int):
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT a.id, a.name, a.account_type, a.balance,
-               COUNT(t.id) as transaction_count
-        FROM accounts a 
-        LEFT JOIN transactions t ON a.id = t.account_id 
-        WHERE a.bank_id = ?
-        GROUP BY a.id, a.name, a.account_type, a.balance
-    """, (bank_id,))
-    accounts = [
-        {
-            "id": row[0],
-            "name": row[1],
-            "account_type": row[2],
-            "balance": safe_float(row[3]),
-            "transaction_count": row[4]
-        }
-        for row in cursor.fetchall()
-    ]
-    conn.close()
+@offload
+def get_accounts(bank_id: int):
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT a.id, a.name, a.account_type, """ + display_balance_sql("a") + """,
+                   COUNT(t.id) + COALESCE((SELECT SUM(d.transaction_count) FROM """ + ARCHIVE_DAYS_TABLE + """ d
+                                           WHERE d.account_id = a.id), 0) as transaction_count
+            FROM accounts a 
+            LEFT JOIN transactions t ON a.id = t.account_id 
+            WHERE a.bank_id = ? AND a.deleted_at IS NULL
+            GROUP BY a.id, a.name, a.account_type, a.balance_cents
+        """, (bank_id,))
+        accounts = [
+            {
+                "id": row[0],
+                "name": row[1],
+                "account_type": row[2],
+                "balance": cents_to_amount(row[3]),
+                "transaction_count": row[4]
+            }
+            for row in cursor.fetchall()
+        ]
     return accounts
 
 @app.post("/banks/{bank_id}/accounts")
-async def create_account(bank_id: int, account: AccountModel):
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    try:
-        # Special handling for credit card accounts
-        if account.account_type == "credit":
-            # For credit cards, we might want to set initial balance to 0 or negative
-            # and add some credit card specific fields in the future
-            print(f"Creating credit card account: {account.name}")
-        
-        cursor.execute(
-            "INSERT INTO accounts (bank_id, name, account_type) VALUES (?, ?, ?)",
-            (bank_id, account.name, account.account_type)
-        )
-        account_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        # Return account info with additional metadata for credit cards
-        response = {"id": account_id, "name": account.name, "account_type": account.account_type}
-        if account.account_type == "credit":
-            response["is_credit_card"] = True
-            response["message"] = "Credit card account created successfully. You can now import credit card statements."
-        
-        return response
-    except Exception as e:
-        conn.close()
-        raise HTTPException(status_code=400, detail=str(e))
+@offload
+def create_account(bank_id: int, account: AccountModel):
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        try:
+            # Special handling for credit card accounts
+            if account.account_type == "credit":
+                # For credit cards, we might want to set initial balance to 0 or negative
+                # and add some credit card specific fields in the future
+                print(f"Creating credit card account: {account.name}")
+        
+            cursor.execute("SELECT 1 FROM banks WHERE id = ? AND deleted_at IS NULL", (bank_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail="Bank not found")
+        
+            cursor.execute(
+                "INSERT INTO accounts (bank_id, name, account_type) VALUES (?, ?, ?)",
+                (bank_id, account.name, account.account_type)
+            )
+            account_id = cursor.lastrowid
+        
+            # Return account info with additional metadata for credit cards
+            response = {"id": account_id, "name": account.name, "account_type": account.account_type}
+            if account.account_type == "credit":
+                response["is_credit_card"] = True
+                response["message"] = "Credit card account created successfully. You can now import credit card statements."
+        
+            return response
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/upload-csv/{account_id}")
-async def upload_csv(account_id: int, file: UploadFile = File(...)):
+@offload
+def upload_csv(account_id: int, file: UploadFile = File(...)):
+    """Preview a CSV before import: columns, first rows, row count, column types and a suggested mapping.
+
+    Only the header and a sample of rows are parsed, so large files preview as fast as small ones.
+    """
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
     
-    content = await file.read()
-    df = pd.read_csv(pd.io.common.StringIO(content.decode('utf-8')))
+    # Dates are read the way this account's earlier imports read them
+    with db.connection() as conn:
+        account = conn.execute("SELECT date_format FROM accounts WHERE id = ?", (account_id,)).fetchone()
     
-    # Clean the preview data for JSON serialization
-    preview_data = df.head(5).to_dict('records')
-    cleaned_preview = clean_for_json(preview_data)
+    try:
+        preview = preview_csv(file.file, account[0] if account else None)
+    except (UnicodeDecodeError, pd.errors.EmptyDataError, pd.errors.ParserError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read CSV: {str(e)}")
     
-    return {
-        "columns": df.columns.tolist(),
-        "preview": cleaned_preview,
-        "total_rows": len(df)
-    }
+    # Clean the preview data for JSON serialization
+    preview["preview"] = clean_for_json(preview["preview"])
+    return preview
 
 @app.post("/import-transactions/{account_id}")
-async def import_transactions(account_id: int, file: UploadFile = File(...), mapping: str = Form(...)):
+@offload
+def import_transactions(account_id: int, file: UploadFile = File(...), mapping: str = Form(...),
+                        stream: bool = Form(False), run_async: bool = Query(False, alias="async")):
+    """Import a CSV using a column mapping.
+
+    By default the whole file is imported in one transaction. With
+    ``stream=true`` it is read and committed IMPORT_CHUNK_ROWS rows at a
+    time, so memory stays flat for very large exports; if a chunk fails, the
+    chunks before it stay imported. With ``async=true`` the file is checked,
+    queued as a background job, and the job id returned at once.
+    """
     try:
         print(f"Received mapping parameter: {mapping}")
         print(f"Mapping type: {type(mapping)}")
@@ -689,18 +536,17 @@ async def import_transactions(account_id: int, file: UploadFile = File(...), map
         print(f"Parsed mapping: {column_mapping}")
         
         # Validate required fields
-        required_fields = ['date', 'description', 'amount']
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if not column_mapping.get(field):
                 raise HTTPException(status_code=400, detail=f"Required field '{field}' not mapped")
         
-        content = await file.read()
-        df = pd.read_csv(pd.io.common.StringIO(content.decode('utf-8')))
-        print(f"CSV loaded with {len(df)} rows and columns: {df.columns.tolist()}")
+        # Only the header is read here; rows are read below, straight from the spooled upload
+        columns = read_csv_columns(file.file)
+        print(f"CSV columns: {columns}")
         
         # Validate that mapped columns exist in CSV
         for field, column in column_mapping.items():
-            if column and column not in df.columns:
+            if column and column not in columns:
                 raise HTTPException(status_code=400, detail=f"Column '{column}' not found in CSV")
                 
     except json.JSONDecodeError as e:
@@ -710,72 +556,62 @@ async def import_transactions(account_id: int, file: UploadFile = File(...), map
         print(f"Error in import setup: {e}")
         raise HTTPException(status_code=400, detail=f"Error processing request: {str(e)}")
     
+    if run_async:
+        require_account(account_id)
+        return queued_job("import_transactions", {"account_id": account_id, "mapping": column_mapping, "stream": stream},
+                          [file])
+    return run_import(account_id, file.file, column_mapping, stream)
+
+def require_account(account_id: int):
+    with db.connection() as conn:
+        if conn.execute("SELECT 1 FROM accounts WHERE id = ?", (account_id,)).fetchone() is None:
+            raise HTTPException(status_code=404, detail="Account not found")
+
+def run_import(account_id: int, source, column_mapping: Dict[str, str], stream: bool, job: Optional[Job] = None):
+    """Import a checked CSV (see import_transactions).
+
+    As a job it reports progress after every committed chunk and saves the
+    running totals as its checkpoint, so a retry skips the rows already imported.
+    """
+    require_account(account_id)
+    totals = {"rows": 0, "imported": 0, "rejected_count": 0, "rejected": [], "chunks": 0}
+    if job and job.checkpoint:
+        totals.update(job.checkpoint)
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        imported_count = 0
-        for _, row in df.iterrows():
-            try:
-                date_val = str(row[column_mapping['date']])
-                desc_val = str(row[column_mapping['description']])
-                
-                # Handle amount conversion safely
-                amount_str = str(row[column_mapping['amount']]).replace(',', '').replace('$', '').strip()
-                try:
-                    amount_val = float(amount_str)
-                    # Check for NaN or infinite values
-                    if not (amount_val == amount_val) or amount_val == float('inf') or amount_val == float('-inf'):
-                        amount_val = 0.0
-                except (ValueError, TypeError):
-                    amount_val = 0.0
-                
-                note_val = str(row.get(column_mapping.get('note', ''), ''))
-                category_val = str(row.get(column_mapping.get('category', ''), 'Uncategorized'))
-                
-                # Create a clean dict for JSON serialization
-                row_dict = {}
-                for key, value in row.to_dict().items():
-                    try:
-                        # Convert to string to avoid JSON serialization issues
-                        row_dict[str(key)] = str(value) if pd.notna(value) else ''
-                    except:
-                        row_dict[str(key)] = ''
-                
-                cursor.execute("""
-                    INSERT INTO transactions (account_id, date, description, amount, note, category, raw_data)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (account_id, date_val, desc_val, amount_val, note_val, category_val, json.dumps(row_dict)))
-                imported_count += 1
-            except Exception as e:
-                print(f"Error processing row: {e}")
-                continue
-        
-        # Update account balance with special handling for credit cards
-        cursor.execute("SELECT account_type FROM accounts WHERE id = ?", (account_id,))
-        account_type_result = cursor.fetchone()
-        account_type = account_type_result[0] if account_type_result else "checking"
-        
-        if account_type == "credit":
-            # For credit cards, negative amounts are expenses (increases balance owed)
-            # Positive amounts are payments (decreases balance owed)
-            cursor.execute("SELECT SUM(amount) FROM transactions WHERE account_id = ?", (account_id,))
-            balance = safe_float(cursor.fetchone()[0] or 0)
-            # Credit card balance is typically negative (amount owed)
-            if balance > 0:
-                balance = -balance  # Convert to negative for credit card debt
-        else:
-            # For regular accounts, positive amounts are credits, negative are debits
-            cursor.execute("SELECT SUM(amount) FROM transactions WHERE account_id = ?", (account_id,))
-            balance = safe_float(cursor.fetchone()[0] or 0)
-        
-        cursor.execute("UPDATE accounts SET balance = ? WHERE id = ?", (balance, account_id))
-        
-        conn.commit()
-        conn.close()
+        start = time.perf_counter()
+        # Whole columns are parsed at once (dates in the account's known format);
+        # rows with an unparseable date or amount are rejected, not imported.
+        # Each chunk is its own transaction: one executemany for the rows, then
+        # their original CSV rows to compressed side storage.
+        for df in read_csv_chunks(source, IMPORT_CHUNK_ROWS if stream else None, skip_rows=totals["rows"]):
+            with db.transaction() as conn:
+                count, chunk_rejected = import_rows(conn, account_id, df, column_mapping, totals["rows"] + 1)
+            totals["rows"] += len(df)
+            totals["imported"] += count
+            totals["rejected_count"] += len(chunk_rejected)
+            totals["rejected"].extend(chunk_rejected[:REJECTS_RETURNED - len(totals["rejected"])])
+            totals["chunks"] += 1
+            if job:
+                job.progress(totals["rows"], message=f"Imported {totals['imported']} transactions", checkpoint=totals)
+        imported_count = totals["imported"]
+        print(f"📥 Imported {imported_count} transactions ({totals['rejected_count']} rejected) "
+              f"in {totals['chunks']} chunk(s) in {time.perf_counter() - start:.2f}s")
+        
+        # The balance was kept current by the insert triggers; credit cards show what is owed as negative
+        with db.connection() as conn:
+            account_type, balance_cents = conn.execute(
+                "SELECT account_type, balance_cents FROM accounts WHERE id = ?", (account_id,)
+            ).fetchone()
+        balance = cents_to_amount(display_balance(account_type, balance_cents))
         
         # Return additional info for credit card accounts
-        response = {"message": f"Imported {imported_count} transactions"}
+        response = {
+            "message": f"Imported {imported_count} transactions",
+            "imported": imported_count,
+            "rejected_count": totals["rejected_count"],
+            "rejected": totals["rejected"],
+            "chunks": totals["chunks"],
+        }
         
         if account_type == "credit":
             response["credit_card_info"] = {
@@ -786,122 +622,203 @@ async def import_transactions(account_id: int, file: UploadFile = File(...), map
             }
         
         return response
+    except (HTTPException, JobCancelled):
+        raise
     except Exception as e:
         print(f"Error in transaction import: {e}")
-        raise HTTPException(status_code=500, detail=f"Error importing transactions: {str(e)}")
+        detail = f"Error importing transactions: {str(e)}"
+        if totals["imported"]:
+            detail += f" ({totals['imported']} transactions from earlier chunks were imported)"
+        raise HTTPException(status_code=500, detail=detail)
+
+@app.post("/import-archive/{account_id}")
+@offload(executor=parse_executor)
+def import_archive(account_id: int, files: List[UploadFile] = File(...), mapping: str = Form(...),
+                   run_async: bool = Query(False, alias="async")):
+    """Import many statements at once: zip archives of CSVs and PDF statements, or the files themselves.
+
+    ``mapping`` is a column mapping, or a list of mappings tried in order for
+    each CSV. Files are parsed in parallel, imported in file-name order and
+    committed IMPORT_CHUNK_ROWS rows at a time; the response summarizes each file.
+    """
+    try:
+        mappings = json.loads(mapping)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON in mapping parameter")
+    if isinstance(mappings, dict):
+        mappings = [mappings]
+    if not mappings or not all(isinstance(item, dict) for item in mappings):
+        raise HTTPException(status_code=400, detail="mapping must be a column mapping or a list of them")
+    for item in mappings:
+        for field in REQUIRED_FIELDS:
+            if not item.get(field):
+                raise HTTPException(status_code=400, detail=f"Required field '{field}' not mapped")
+    for upload in files:
+        if not upload.filename.lower().endswith((".zip", ".csv", ".pdf")):
+            raise HTTPException(status_code=400, detail=f"{upload.filename}: files must be zip archives, CSVs or PDFs")
+    require_account(account_id)
+    
+    if run_async:
+        return queued_job("import_archive", {"account_id": account_id, "mappings": mappings}, files)
+    with tempfile.TemporaryDirectory(dir="data") as directory:
+        paths = []
+        for position, upload in enumerate(files):
+            os.makedirs(os.path.join(directory, str(position)))
+            paths.append(os.path.join(directory, str(position), os.path.basename(upload.filename)))
+            with open(paths[-1], "wb") as out:
+                shutil.copyfileobj(upload.file, out)
+        return run_archive_import(account_id, paths, mappings)
+
+def run_archive_import(account_id: int, paths: List[str], mappings: List[Dict[str, str]], job: Optional[Job] = None):
+    """Import saved statement files (see import_archive); as a job, a retry skips rows already committed"""
+    require_account(account_id)
+    
+    imported = 0
+    
+    def report(summary):
+        nonlocal imported
+        imported = summary["imported"]
+        if job:
+            done = len(summary["files"])
+            job.progress(done, None, f"Imported {imported} transactions from {done} files",
+                         checkpoint={"committed": summary["committed"]})
+    
+    try:
+        start = time.perf_counter()
+        summary = import_statement_files(db, account_id, paths, mappings, IMPORT_CHUNK_ROWS,
+                                         committed=(job.checkpoint or {}).get("committed") if job else None,
+                                         on_commit=report)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobCancelled:
+        raise
+    except Exception as e:
+        print(f"Error in archive import: {e}")
+        detail = f"Error importing statements: {str(e)}"
+        if imported:
+            detail += f" ({imported} transactions from earlier commits were imported)"
+        raise HTTPException(status_code=500, detail=detail)
+    failed = sum(1 for file in summary["files"] if file["status"] == "failed")
+    print(f"📦 Imported {summary['imported']} transactions from {len(summary['files']) - failed} files "
+          f"({failed} failed) in {summary['commits']} commit(s) in {time.perf_counter() - start:.2f}s")
+    return {
+        "message": f"Imported {summary['imported']} transactions from {len(summary['files']) - failed} files",
+        "imported": summary["imported"],
+        "rejected_count": summary["rejected_count"],
+        "commits": summary["commits"],
+        "files": summary["files"],
+        "skipped": summary["skipped"],
+    }
 
 @app.get("/accounts/{account_id}/credit-card-info")
-async def get_credit_card_info(account_id: int):
+@offload
+def get_credit_card_info(account_id: int):
     """Get credit card specific information for an account"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    with db.connection() as conn:
+        cursor = conn.cursor()
     
-    try:
-        # Check if this is a credit card account
-        cursor.execute("SELECT account_type, name FROM accounts WHERE id = ?", (account_id,))
-        account_result = cursor.fetchone()
-        
-        if not account_result:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
-        account_type, account_name = account_result
-        
-        if account_type != "credit":
-            raise HTTPException(status_code=400, detail="This endpoint is only for credit card accounts")
+        try:
+            # Check if this is a credit card account
+            cursor.execute("SELECT account_type, name FROM accounts WHERE id = ?", (account_id,))
+            account_result = cursor.fetchone()
+        
+            if not account_result:
+                raise HTTPException(status_code=404, detail="Account not found")
+        
+            account_type, account_name = account_result
+        
+            if account_type != "credit":
+                raise HTTPException(status_code=400, detail="This endpoint is only for credit card accounts")
+        
+            # Get credit card specific data
+            # Live transactions plus archived day totals
+            cursor.execute(f"""
+                SELECT SUM(n), SUM(expenses), SUM(payments), SUM(balance) FROM (
+                    SELECT 
+                        COUNT(*) as n,
+                        SUM(CASE WHEN amount_cents < 0 THEN -amount_cents ELSE 0 END) as expenses,
+                        SUM(CASE WHEN amount_cents > 0 THEN amount_cents ELSE 0 END) as payments,
+                        SUM(amount_cents) as balance
+                    FROM transactions 
+                    WHERE account_id = ? 
+                    UNION ALL
+                    SELECT SUM(transaction_count), -SUM(spending_cents), SUM(amount_cents - spending_cents),
+                           SUM(amount_cents)
+                    FROM {ARCHIVE_DAYS_TABLE}
+                    WHERE account_id = ?
+                )
+            """, (account_id, account_id))
         
-        # Get credit card specific data
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as transaction_count,
-                SUM(CASE WHEN amount < 0 THEN ABS(amount) ELSE 0 END) as total_expenses,
-                SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) as total_payments,
-                SUM(amount) as current_balance
-            FROM transactions 
-            WHERE account_id = ? 
-        """, (account_id,))
+            transaction_count, *totals = cursor.fetchone()
+            stats = [transaction_count] + [cents_to_amount(total) for total in totals]
+        
+            # Get recent transactions
+            cursor.execute(f"""
+                SELECT date, {description_sql('transactions')}, amount_cents, category
+                FROM transactions 
+                WHERE account_id = ? 
+                ORDER BY day_number DESC, id DESC 
+                LIMIT 10
+            """, (account_id,))
+        
+            recent_transactions = [
+                {
+                    "date": row[0],
+                    "description": row[1],
+                    "amount": cents_to_amount(row[2]),
+                    "category": row[3]
+                }
+                for row in cursor.fetchall()
+            ]
         
-        stats = cursor.fetchone()
         
-        # Get recent transactions
-        cursor.execute("""
-            SELECT date, description, amount, category
-            FROM transactions 
-            WHERE account_id = ? 
-            ORDER BY date DESC 
-            LIMIT 10
-        """, (account_id,))
-        
-        recent_transactions = [
-            {
-                "date": row[0],
-                "description": row[1],
-                "amount": row[2],
-                "category": row[3]
+            return {
+                "account_id": account_id,
+                "account_name": account_name,
+                "account_type": account_type,
+                "transaction_count": stats[0] or 0,
+                "total_expenses": stats[1] or 0,
+                "total_payments": stats[2] or 0,
+                "current_balance": stats[3] or 0,
+                "amount_owed": abs(stats[3]) if stats[3] and stats[3] < 0 else 0,
+                "recent_transactions": recent_transactions,
+                "credit_card_tips": [
+                    "Negative balance indicates amount owed",
+                    "Negative amounts are expenses/charges",
+                    "Positive amounts are payments/credits",
+                    "Use this endpoint to monitor credit card spending"
+                ]
             }
-            for row in cursor.fetchall()
-        ]
-        
-        conn.close()
-        
-        return {
-            "account_id": account_id,
-            "account_name": account_name,
-            "account_type": account_type,
-            "transaction_count": stats[0] or 0,
-            "total_expenses": stats[1] or 0,
-            "total_payments": stats[2] or 0,
-            "current_balance": stats[3] or 0,
-            "amount_owed": abs(stats[3]) if stats[3] and stats[3] < 0 else 0,
-            "recent_transactions": recent_transactions,
-            "credit_card_tips": [
-                "Negative balance indicates amount owed",
-                "Negative amounts are expenses/charges",
-                "Positive amounts are payments/credits",
-                "Use this endpoint to monitor credit card spending"
-            ]
-        }
         
-    except Exception as e:
-        conn.close()
-        raise HTTPException(status_code=500, detail=f"Error getting credit card info: {str(e)}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error getting credit card info: {str(e)}")
 
 @app.post("/parse-credit-card-statement")
-async def parse_credit_card_statement(file: UploadFile = File(...)):
-    """Parse a credit card statement PDF and extract data"""
+@offload(executor=parse_executor)
+def parse_credit_card_statement(file: UploadFile = File(...), run_async: bool = Query(False, alias="async")):
+    """Parse a credit card statement PDF and extract data (as a background job with async=true)"""
     try:
         if not file.filename.endswith('.pdf'):
             raise HTTPException(status_code=400, detail="File must be a PDF")
         
+        if run_async:
+            return queued_job("parse_credit_card_statement", {"filename": file.filename}, [file])
+        
         # Save the uploaded file temporarily
         temp_file_path = f"./data/temp_credit_card_{file.filename}"
         os.makedirs("./data", exist_ok=True)
         
         with open(temp_file_path, "wb") as buffer:
-            content = await file.read()
+            content = file.file.read()
             buffer.write(content)
         
         try:
-            # Import and use the credit card parser
-            from credit_card_parser import CreditCardParser
-            
-            parser = CreditCardParser()
-            parsed_data = parser.parse_statement(temp_file_path, debug=True)
-            
-            if "error" in parsed_data:
-                raise HTTPException(status_code=400, detail=parsed_data["error"])
-            
-            # Format for import
-            import_data = parser.format_for_import(parsed_data)
+            response = parse_credit_card_pdf(temp_file_path)
             
             # Clean up temp file
             os.remove(temp_file_path)
             
-            # Return in the format the frontend expects
-            return {
-                "success": True,
-                "parsed_data": import_data,
-                "message": "PDF parsed successfully"
-            }
+            return response
             
         except ImportError:
             # Fallback if credit card parser is not available
@@ -915,124 +832,210 @@ async def parse_credit_card_statement(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
-@app.get("/transactions/{account_id}")
-async def get_transactions(account_id: int, limit: int = 100):
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, date, description, amount, note, category 
-        FROM transactions 
-        WHERE account_id = ? 
-        ORDER BY date DESC 
-        LIMIT ?
-    """, (account_id, limit))
+def parse_credit_card_pdf(path: str):
+    """Parse a saved credit card statement PDF into the import format the frontend expects"""
+    # Import and use the credit card parser
+    from credit_card_parser import CreditCardParser
+    
+    parser = CreditCardParser()
+    parsed_data = parser.parse_statement(path, debug=True)
+    
+    if "error" in parsed_data:
+        raise HTTPException(status_code=400, detail=parsed_data["error"])
     
-    transactions = [
+    # Format for import
+    import_data = parser.format_for_import(parsed_data)
+    
+    # Return in the format the frontend expects
+    return {
+        "success": True,
+        "parsed_data": import_data,
+        "message": "PDF parsed successfully"
+    }
+
+@app.get("/transactions/search")
+@offload
+def search_transactions_endpoint(q: str, account_id: Optional[int] = None,
+                                       date_from: Optional[str] = None, date_to: Optional[str] = None,
+                                       min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+                                       limit: int = 50, offset: int = 0):
+    """Full-text search over descriptions and notes (prefix matching, ranked, highlighted)"""
+    # Declared before /transactions/{account_id} so "search" is not taken as an account id
+    first_day, last_day = parse_day_range(date_from, date_to)
+    limit = max(1, min(limit, 500))
+
+    start = time.perf_counter()
+    with db.connection() as conn:
+        if not search_index_exists(conn):
+            raise HTTPException(status_code=503, detail="Full-text search is not available (SQLite built without FTS5)")
+        min_cents = to_cents(min_amount) if min_amount is not None else None
+        max_cents = to_cents(max_amount) if max_amount is not None else None
+        offset = max(0, offset)
+        results = search_transactions(
+            conn, q, account_id=account_id, first_day=first_day, last_day=last_day,
+            min_cents=min_cents, max_cents=max_cents, limit=limit, offset=offset,
+        )
+        # Archived matches rank after every live match
+        if len(results) < limit:
+            live_total = offset + len(results) if results or offset == 0 else count_search_matches(
+                conn, q, account_id=account_id, first_day=first_day, last_day=last_day,
+                min_cents=min_cents, max_cents=max_cents)
+            archived = search_archive(conn, db.db_path, q, account_id, first_day, last_day, min_cents, max_cents,
+                                      (HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE))
+            skip = max(0, offset - live_total)
+            results += archived[skip:skip + limit - len(results)]
+    return {
+        "query": q,
+        "results": results,
+        "count": len(results),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+@app.get("/transactions/{account_id}")
+@offload
+def get_transactions(account_id: int, response: Response, limit: int = 100, cursor: Optional[str] = None,
+                     date_from: Optional[str] = None, date_to: Optional[str] = None,
+                     category: Optional[str] = None, min_amount: Optional[float] = None,
+                     max_amount: Optional[float] = None, sign: Optional[str] = None,
+                     sort: str = "date", order: str = "desc", include_total: Optional[bool] = None):
+    """One page of an account's transactions, filtered and sorted server-side.
+
+    Pages are keyset-paginated: pass the X-Next-Cursor response header back
+    as ``cursor`` (with the same filters and sort) to get the next page.
+    X-Total-Count holds the number of matching rows; it is computed for the
+    first page only unless ``include_total`` is set, so deep pages stay cheap.
+    """
+    if sort not in SORT_COLUMNS or order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail=f"sort must be one of {sorted(SORT_COLUMNS)}, order asc or desc")
+    if sign is not None and sign not in SIGNS:
+        raise HTTPException(status_code=400, detail=f"sign must be one of {sorted(SIGNS)}")
+    first_day, last_day = parse_day_range(date_from, date_to)
+    where, params = transaction_filters(account_id, first_day, last_day, category,
+                                        to_cents(min_amount), to_cents(max_amount), sign)
+    after = tuple(_parse_cursor(cursor, 2)) if cursor else None
+    limit = max(1, min(limit, LISTING_PAGE_LIMIT))
+
+    descending = order == "desc"
+    min_cents, max_cents = to_cents(min_amount), to_cents(max_amount)
+    with db.connection() as conn:
+        rows = transactions_page(conn, where, params, sort, descending, after, limit + 1)
+        # Archived months are merged in; partitions that cannot reach this page are not read
+        bound = (rows[-1][6], rows[-1][0]) if len(rows) > limit else None
+        archived = archived_page(conn, db.db_path, account_id, first_day, last_day, category, min_cents,
+                                 max_cents, sign, sort, descending, after, limit + 1, bound)
+        if archived:
+            rows = sorted(rows + archived, key=lambda row: (row[6] is not None, row[6] or 0, row[0]),
+                          reverse=descending)[:limit + 1]
+        if include_total or (include_total is None and cursor is None):
+            total = count_transactions(conn, where, params) + archived_count(
+                conn, db.db_path, account_id, first_day, last_day, category, min_cents, max_cents, sign)
+            response.headers["X-Total-Count"] = str(total)
+
+    page = rows[:limit]
+    if len(rows) > limit:
+        response.headers["X-Next-Cursor"] = f"{page[-1][6]}:{page[-1][0]}"
+    return [
         {
             "id": row[0],
             "date": row[1],
             "description": row[2],
-            "amount": safe_float(row[3]),
+            "amount": cents_to_amount(row[3]),
             "note": row[4],
             "category": row[5]
         }
-        for row in cursor.fetchall()
+        for row in page
     ]
-    conn.close()
-    return transactions
+
+@app.get("/transactions/{transaction_id}/raw")
+@offload
+def get_transaction_raw(transaction_id: int):
+    """Original CSV row a transaction was imported from"""
+    with db.connection() as conn:
+        raw = fetch_raw(conn, [transaction_id]).get(transaction_id)
+    if raw is None:
+        raise HTTPException(status_code=404, detail="No raw data stored for this transaction")
+    return {"transaction_id": transaction_id, "raw_data": json.loads(raw)}
 
 @app.post("/sample-data/{account_id}")
-async def load_sample_data(account_id: int):
+@offload
+def load_sample_data(account_id: int):
     """Load sample transaction data from JSON file"""
     try:
         with open('sample_data.json', 'r') as f:
             sample_transactions = json.load(f)
         
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        for transaction in sample_transactions:
-            try:
-                amount = float(transaction['amount'])
-                # Check for NaN or infinite values
-                if not (amount == amount) or amount == float('inf') or amount == float('-inf'):
-                    amount = 0.0
-                    
-                cursor.execute("""
-                    INSERT INTO transactions (account_id, date, description, amount, note, category)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    account_id,
-                    str(transaction['date']),
-                    str(transaction['description']),
-                    amount,
-                    str(transaction['note']),
-                    'Uncategorized'
-                ))
-            except Exception as e:
-                print(f"Error loading sample transaction: {e}")
-                continue
-        
-        # Update account balance
-        cursor.execute("SELECT SUM(amount) FROM transactions WHERE account_id = ?", (account_id,))
-        balance = safe_float(cursor.fetchone()[0] or 0)
-        cursor.execute("UPDATE accounts SET balance = ? WHERE id = ?", (balance, account_id))
-        
-        conn.commit()
-        conn.close()
+        # Dates and amounts are parsed a column at a time, not per row
+        sample = pd.DataFrame(sample_transactions, columns=["date", "description", "amount", "note"], dtype=object)
+        raw_dates = sample["date"].astype(str)
+        iso_dates, day_numbers, _ = normalize_dates(raw_dates)
+        amounts = parse_amounts(sample["amount"]).fillna(0)
+        
+        with db.transaction() as conn:
+            cursor = conn.cursor()
+            description_ids = intern_descriptions(cursor, sample["description"].astype(str).tolist())
+            cursor.executemany("""
+                INSERT INTO transactions (account_id, date, day_number, description_id, amount_cents, note, category)
+                VALUES (?, ?, ?, ?, ?, ?, 'Uncategorized')
+            """, zip(
+                [account_id] * len(sample),
+                iso_dates.fillna(raw_dates).tolist(),
+                sql_values(day_numbers),
+                description_ids,
+                sql_values(amounts),
+                sample["note"].astype(str).tolist(),
+            ))
         
         return {"message": f"Loaded {len(sample_transactions)} sample transactions"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/categories")
-async def get_categories():
+@offload
+def get_categories():
     """Get hierarchical categories"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT category_path, level_1, level_2, level_3, level_4, display_name
-            FROM predefined_categories
-            ORDER BY category_path
-        """)
-        
-        categories = [dict(row) for row in cursor.fetchall()]
-        
-        # Build hierarchical structure
-        hierarchy = {}
-        flat_list = []
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
         
-        for cat in categories:
-            flat_list.append({
-                'value': cat['category_path'],
-                'label': cat['display_name'],
-                'level_1': cat['level_1'],
-                'level_2': cat['level_2'],
-                'level_3': cat['level_3'],
-                'level_4': cat['level_4']
-            })
+            cursor.execute("""
+                SELECT category_path, level_1, level_2, level_3, level_4, display_name
+                FROM predefined_categories
+                ORDER BY category_path
+            """)
+        
+            categories = [dict(row) for row in cursor.fetchall()]
+        
+            # Build hierarchical structure
+            hierarchy = {}
+            flat_list = []
+        
+            for cat in categories:
+                flat_list.append({
+                    'value': cat['category_path'],
+                    'label': cat['display_name'],
+                    'level_1': cat['level_1'],
+                    'level_2': cat['level_2'],
+                    'level_3': cat['level_3'],
+                    'level_4': cat['level_4']
+                })
             
-            # Build nested structure
-            current = hierarchy
-            levels = [cat['level_1'], cat['level_2'], cat['level_3'], cat['level_4']]
-            path_parts = []
+                # Build nested structure
+                current = hierarchy
+                levels = [cat['level_1'], cat['level_2'], cat['level_3'], cat['level_4']]
+                path_parts = []
             
-            for i, level in enumerate(levels):
-                if level:
-                    path_parts.append(level)
-                    if level not in current:
-                        current[level] = {
-                            'children': {},
-                            'path': ':'.join(path_parts),
-                            'display_name': cat['display_name'] if i == len([l for l in levels if l]) - 1 else level,
-                            'level': i + 1
-                        }
-                    current = current[level]['children']
-        
-        conn.close()
+                for i, level in enumerate(levels):
+                    if level:
+                        path_parts.append(level)
+                        if level not in current:
+                            current[level] = {
+                                'children': {},
+                                'path': ':'.join(path_parts),
+                                'display_name': cat['display_name'] if i == len([l for l in levels if l]) - 1 else level,
+                                'level': i + 1
+                            }
+                        current = current[level]['children']
         return {
             "success": True, 
             "categories": {
@@ -1045,214 +1048,412 @@ async def get_categories():
         raise HTTPException(status_code=500, detail=f"Failed to get categories: {str(e)}")
 
 @app.get("/analytics/{account_id}")
-async def get_analytics(account_id: int):
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Monthly spending
-    cursor.execute("""
-        SELECT strftime('%Y-%m', date) as month, SUM(amount) as total
-        FROM transactions 
-        WHERE account_id = ? AND amount < 0
-        GROUP BY month
-        ORDER BY month
-    """, (account_id,))
-    monthly_spending = [{"month": row[0], "amount": safe_float(abs(row[1]))} for row in cursor.fetchall()]
+@offload
+def get_analytics(account_id: int, date_from: Optional[str] = None, date_to: Optional[str] = None):
+    # Optional date range, compared as day numbers so the account/day index is used
+    first_day, last_day = parse_day_range(date_from, date_to)
+    # Served from the columnar mirror when it is enabled and current (see analytics_mirror.py)
+    mirror = analytics_mirror(db.pool())
+    if mirror is not None:
+        result = mirror.query(lambda cur, hidden: account_analytics(cur, account_id, first_day, last_day))
+        if result is not None:
+            with db.connection() as conn:
+                return merge_account_analytics(conn, result, account_id, first_day, last_day)
+
+    range_filter = ""
+    range_params = []
+    if first_day is not None:
+        range_filter += " AND day_number >= ?"
+        range_params.append(first_day)
+    if last_day is not None:
+        range_filter += " AND day_number <= ?"
+        range_params.append(last_day)
+
+    with db.connection() as conn:
+        cursor = conn.cursor()
     
-    # Category breakdown
-    cursor.execute("""
-        SELECT category, SUM(ABS(amount)) as total
-        FROM transactions 
-        WHERE account_id = ? AND amount < 0
-        GROUP BY category
-        ORDER BY total DESC
-    """, (account_id,))
-    categories = [{"category": row[0], "amount": safe_float(row[1])} for row in cursor.fetchall()]
+        # Monthly spending
+        cursor.execute(f"""
+            SELECT strftime('%Y-%m', day_number * 86400, 'unixepoch') as month, SUM(amount_cents) as total
+            FROM transactions 
+            WHERE account_id = ? AND amount_cents < 0{range_filter}
+            GROUP BY month
+            ORDER BY month
+        """, (account_id, *range_params))
+        monthly_spending = [{"month": row[0], "amount": cents_to_amount(abs(row[1]))} for row in cursor.fetchall()]
     
-    conn.close()
+        # Category breakdown
+        cursor.execute(f"""
+            SELECT category, -SUM(amount_cents) as total
+            FROM transactions 
+            WHERE account_id = ? AND amount_cents < 0{range_filter}
+            GROUP BY category
+            ORDER BY total DESC
+        """, (account_id, *range_params))
+        categories = [{"category": row[0], "amount": cents_to_amount(row[1])} for row in cursor.fetchall()]
+        result = {
+            "monthly_spending": monthly_spending,
+            "categories": categories,
+            "freshness": sqlite_freshness(),
+        }
+        return merge_account_analytics(conn, result, account_id, first_day, last_day)
+
+def _ledger_source(source: Optional[str]) -> Optional[str]:
+    if source is not None and source not in LEDGER_SOURCES:
+        raise HTTPException(status_code=400, detail=f"source must be one of {list(LEDGER_SOURCES)}")
+    return source
+
+@app.get("/ledger/analytics")
+@offload
+def get_ledger_analytics(source: Optional[str] = None, account_id: Optional[int] = None,
+                         date_from: Optional[str] = None, date_to: Optional[str] = None):
+    """Spending by month and category across bank and credit card transactions"""
+    source = _ledger_source(source)
+    first_day, last_day = parse_day_range(date_from, date_to)
+    mirror = analytics_mirror(db.pool())
+    if mirror is not None:
+        result = mirror.query(lambda cur, hidden: mirror_ledger_analytics(
+            cur, hidden, source, account_id, first_day, last_day))
+        if result is not None:
+            with db.connection() as conn:
+                return merge_ledger_analytics(conn, result, source, account_id, first_day, last_day)
+    with db.connection() as conn:
+        result = ledger_analytics(conn, source, account_id, first_day, last_day)
+        result["freshness"] = sqlite_freshness()
+        return merge_ledger_analytics(conn, result, source, account_id, first_day, last_day)
+
+@app.get("/ledger/search")
+@offload
+def search_ledger_endpoint(q: str, source: Optional[str] = None, account_id: Optional[int] = None,
+                           date_from: Optional[str] = None, date_to: Optional[str] = None,
+                           limit: int = 50, offset: int = 0):
+    """Full-text search over bank and credit card transactions together"""
+    source = _ledger_source(source)
+    first_day, last_day = parse_day_range(date_from, date_to)
+    limit = max(1, min(limit, 500))
+
+    start = time.perf_counter()
+    with db.connection() as conn:
+        if not search_index_exists(conn):
+            raise HTTPException(status_code=503, detail="Full-text search is not available (SQLite built without FTS5)")
+        results = search_ledger(conn, q, source=source, account_id=account_id, first_day=first_day,
+                                last_day=last_day, limit=limit, offset=max(0, offset))
     return {
-        "monthly_spending": monthly_spending,
-        "categories": categories
+        "query": q,
+        "results": results,
+        "count": len(results),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+@app.put("/ledger/{source}/{entry_id}/category")
+@offload
+def update_ledger_category(source: str, entry_id: int, request: dict):
+    """Update the category of a bank or credit card transaction"""
+    _ledger_source(source)
+    category = request.get('category')
+    if not category:
+        raise HTTPException(status_code=400, detail="Category is required")
+    with db.transaction() as conn:
+        if not categorize_ledger_entry(conn, source, entry_id, category):
+            raise HTTPException(status_code=404, detail="Transaction not found")
+    return {"success": True, "message": "Transaction category updated successfully"}
+
+# Day number bounds used when no date range is given
+_FIRST_DAY = -719162   # 0001-01-01
+_LAST_DAY = 2932896    # 9999-12-31
+BALANCE_PAGE_LIMIT = 1000
+
+def _balance_account_type(conn, account_id: int) -> str:
+    row = conn.execute("SELECT account_type FROM accounts WHERE id = ?", (account_id,)).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Account not found")
+    return row[0]
+
+def _parse_cursor(cursor: str, parts: int):
+    try:
+        values = [int(part) for part in cursor.split(":")]
+    except ValueError:
+        values = []
+    if len(values) != parts:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+@app.get("/accounts/{account_id}/running-balance")
+@offload
+def get_running_balance(account_id: int, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                              cursor: Optional[str] = None, limit: int = 500):
+    """Transactions in date order with the balance after each one, one page at a time.
+
+    Pass the returned next_cursor to get the following page; it carries the
+    running balance so later pages never rescan earlier history.
+    """
+    first_day, last_day = parse_day_range(date_from, date_to)
+    first_day = _FIRST_DAY if first_day is None else first_day
+    last_day = _LAST_DAY if last_day is None else last_day
+    limit = max(1, min(limit, BALANCE_PAGE_LIMIT))
+
+    with db.connection() as conn:
+        account_type = _balance_account_type(conn, account_id)
+        if cursor:
+            after_day, after_id, opening = _parse_cursor(cursor, 3)
+        else:
+            after_day, after_id = first_day, 0
+            opening = opening_balance(conn, account_id, first_day)
+        rows = running_balance_page(conn, account_id, opening, (after_day, after_id), last_day, limit + 1)
+        # Archived transactions are not listed but still move the balance
+        if rows:
+            archived_from = after_day + 1 if cursor else first_day
+            rows = add_archived_to_running(rows, archived_day_totals(conn, account_id, archived_from, rows[-1][2]))
+
+    page, has_more = rows[:limit], len(rows) > limit
+    return {
+        "account_id": account_id,
+        "account_type": account_type,
+        "opening_balance": cents_to_amount(display_balance(account_type, opening)),
+        "transactions": [
+            {
+                "id": row[0],
+                "date": row[1],
+                "description": row[3],
+                "amount": cents_to_amount(row[4]),
+                "category": row[5],
+                "running_balance": cents_to_amount(display_balance(account_type, row[6])),
+            }
+            for row in page
+        ],
+        "next_cursor": f"{page[-1][2]}:{page[-1][0]}:{page[-1][6]}" if has_more else None,
+    }
+
+@app.get("/accounts/{account_id}/daily-balances")
+@offload
+def get_daily_balances(account_id: int, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                             cursor: Optional[str] = None, limit: int = 366):
+    """Closing balance for each day with activity in the range, paginated like /running-balance"""
+    first_day, last_day = parse_day_range(date_from, date_to)
+    first_day = _FIRST_DAY if first_day is None else first_day
+    last_day = _LAST_DAY if last_day is None else last_day
+    limit = max(1, min(limit, BALANCE_PAGE_LIMIT))
+
+    with db.connection() as conn:
+        account_type = _balance_account_type(conn, account_id)
+        if cursor:
+            after_day, opening = _parse_cursor(cursor, 2)
+        else:
+            after_day = first_day - 1
+            opening = opening_balance(conn, account_id, first_day)
+        rows = daily_balance_page(conn, account_id, opening, after_day, last_day, limit + 1)
+
+    page, has_more = rows[:limit], len(rows) > limit
+    return {
+        "account_id": account_id,
+        "account_type": account_type,
+        "opening_balance": cents_to_amount(display_balance(account_type, opening)),
+        "days": [
+            {
+                "date": day_number_to_iso(row[0]),
+                "transaction_count": row[1],
+                "net_change": cents_to_amount(row[2]),
+                "closing_balance": cents_to_amount(display_balance(account_type, row[3])),
+            }
+            for row in page
+        ],
+        "next_cursor": f"{page[-1][0]}:{page[-1][3]}" if has_more else None,
     }
 
 @app.post("/batch-update-category")
-async def batch_update_category(update: BatchCategoryUpdate):
+@offload
+def batch_update_category(update: BatchCategoryUpdate):
     """Update category for multiple transactions"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    with db.transaction() as conn:
+        cursor = conn.cursor()
     
-    try:
-        # Update the transactions
-        placeholders = ','.join(['?' for _ in update.transaction_ids])
-        cursor.execute(f"""
-            UPDATE transactions 
-            SET category = ? 
-            WHERE id IN ({placeholders})
-        """, [update.category] + update.transaction_ids)
+        try:
+            # Update the transactions
+            placeholders = ','.join(['?' for _ in update.transaction_ids])
+            cursor.execute(f"""
+                UPDATE transactions 
+                SET category = ? 
+                WHERE id IN ({placeholders})
+            """, [update.category] + update.transaction_ids)
         
-        updated_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+            updated_count = cursor.rowcount
         
-        return {"message": f"Updated {updated_count} transactions to category '{update.category}'"}
-    except Exception as e:
-        conn.close()
-        raise HTTPException(status_code=500, detail=str(e))
+            return {"message": f"Updated {updated_count} transactions to category '{update.category}'"}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/categories/{account_id}")
-async def get_categories(account_id: int):
+@offload
+def get_categories(account_id: int):
     """Get all unique categories for an account"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    with db.connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT DISTINCT category, COUNT(*) as count
-        FROM transactions 
-        WHERE account_id = ? AND category IS NOT NULL
-        GROUP BY category
-        ORDER BY count DESC
-    """, (account_id,))
+        cursor.execute("""
+            SELECT DISTINCT category, COUNT(*) as count
+            FROM transactions 
+            WHERE account_id = ? AND category IS NOT NULL
+            GROUP BY category
+            ORDER BY count DESC
+        """, (account_id,))
     
-    categories = [{"name": row[0], "count": row[1]} for row in cursor.fetchall()]
-    conn.close()
+        categories = [{"name": row[0], "count": row[1]} for row in cursor.fetchall()]
     return categories
 
 @app.post("/auto-categorize/{account_id}")
-async def auto_categorize_transactions(account_id: int):
-    """Automatically categorize uncategorized transactions using fuzzy matching"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
+@offload
+def auto_categorize_transactions(account_id: int, run_async: bool = Query(False, alias="async")):
+    """Automatically categorize uncategorized transactions using fuzzy matching (as a background job with async=true)"""
+    if run_async:
+        return queued_job("auto_categorize", {"account_id": account_id})
+    return categorize_account(account_id)
+
+def categorize_account(account_id: int, job: Optional[Job] = None):
+    """Fuzzy-match every uncategorized description of an account; a cancelled job changes nothing"""
     try:
-        # Check how many categorized transactions we have to learn from
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM transactions 
-            WHERE account_id = ? AND category != 'Uncategorized' AND category IS NOT NULL
-        """, (account_id,))
-        categorized_count = cursor.fetchone()[0]
-        print(f"Found {categorized_count} categorized transactions to learn from")
-        
-        # Get uncategorized transactions
-        cursor.execute("""
-            SELECT id, description 
-            FROM transactions 
-            WHERE account_id = ? AND (category = 'Uncategorized' OR category IS NULL)
-        """, (account_id,))
-        
-        uncategorized = cursor.fetchall()
-        print(f"Found {len(uncategorized)} uncategorized transactions to process")
-        updated_count = 0
-        
-        for transaction_id, description in uncategorized:
-            print(f"Processing transaction {transaction_id}: {description}")
-            suggested_category = fuzzy_match_category(description, account_id)
+        # Matching reads only, so it runs on a read connection; the writer is
+        # held just for the grouped updates at the end
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            # Check how many categorized transactions we have to learn from
+            cursor.execute("""
+                SELECT COUNT(*) 
+                FROM transactions 
+                WHERE account_id = ? AND category != 'Uncategorized' AND category IS NOT NULL
+            """, (account_id,))
+            categorized_count = cursor.fetchone()[0]
+            print(f"Found {categorized_count} categorized transactions to learn from")
+        
+            # Uncategorized transactions grouped by description: each distinct
+            # description is matched once and all of its rows updated together
+            cursor.execute(f"""
+                SELECT description_id, {description_sql('transactions')}, COUNT(*)
+                FROM transactions 
+                WHERE account_id = ? AND (category = 'Uncategorized' OR category IS NULL)
+                GROUP BY description_id
+            """, (account_id,))
+        
+            uncategorized = cursor.fetchall()
+            learned = categorized_descriptions(conn, account_id)
+        uncategorized_count = sum(row[2] for row in uncategorized)
+        print(f"Found {uncategorized_count} uncategorized transactions ({len(uncategorized)} distinct descriptions) to process")
+        
+        matches = []
+        for position, (description_id, description, count) in enumerate(uncategorized):
+            if job:
+                job.progress(position, len(uncategorized), f"Matched {position} of {len(uncategorized)} descriptions")
+            print(f"Processing {count} transactions: {description}")
+            suggested_category = fuzzy_match_category(description or "", account_id,
+                                                      categorized_transactions=learned)
             print(f"Suggested category: {suggested_category}")
-            
             if suggested_category != "Uncategorized":
-                cursor.execute("""
+                matches.append((suggested_category, account_id, description_id))
+        
+        if job:
+            # Last chance to cancel: once the updates start they all commit
+            job.progress(len(uncategorized), len(uncategorized), f"Saving {len(matches)} matched descriptions")
+        updated_count = 0
+        with db.transaction() as conn:
+            for match in matches:
+                # Rows categorized meanwhile keep their category
+                updated_count += conn.execute("""
                     UPDATE transactions 
                     SET category = ? 
-                    WHERE id = ?
-                """, (suggested_category, transaction_id))
-                updated_count += 1
-                print(f"Updated transaction {transaction_id} to category: {suggested_category}")
+                    WHERE account_id = ? AND description_id IS ?
+                      AND (category = 'Uncategorized' OR category IS NULL)
+                """, match).rowcount
+        print(f"Updated {updated_count} transactions")
         
-        conn.commit()
-        conn.close()
-        
-        return {"message": f"Auto-categorized {updated_count} transactions out of {len(uncategorized)} uncategorized transactions. Had {categorized_count} categorized transactions to learn from."}
+        return {"message": f"Auto-categorized {updated_count} transactions out of {uncategorized_count} uncategorized transactions. Had {categorized_count} categorized transactions to learn from."}
+    except JobCancelled:
+        raise
     except Exception as e:
         print(f"Error in auto-categorize: {e}")
-        conn.close()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/category-rules")
-async def create_category_rule(rule: CategoryRule):
+@offload
+def create_category_rule(rule: CategoryRule):
     """Create a new category matching rule"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    with db.transaction() as conn:
+        cursor = conn.cursor()
     
-    try:
-        cursor.execute("""
-            INSERT INTO category_rules (account_id, pattern, category)
-            VALUES (?, ?, ?)
-        """, (rule.account_id, rule.pattern, rule.category))
+        try:
+            cursor.execute("""
+                INSERT INTO category_rules (account_id, pattern, category)
+                VALUES (?, ?, ?)
+            """, (rule.account_id, rule.pattern, rule.category))
         
-        rule_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            rule_id = cursor.lastrowid
         
-        return {"id": rule_id, "message": "Category rule created successfully"}
-    except Exception as e:
-        conn.close()
-        raise HTTPException(status_code=500, detail=str(e))
+            return {"id": rule_id, "message": "Category rule created successfully"}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/category-rules/{account_id}")
-async def get_category_rules(account_id: int):
+@offload
+def get_category_rules(account_id: int):
     """Get all category rules for an account"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    with db.connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT id, pattern, category, created_at
-        FROM category_rules 
-        WHERE account_id = ?
-        ORDER BY created_at DESC
-    """, (account_id,))
+        cursor.execute("""
+            SELECT id, pattern, category, created_at
+            FROM category_rules 
+            WHERE account_id = ?
+            ORDER BY created_at DESC
+        """, (account_id,))
     
-    rules = [
-        {
-            "id": row[0],
-            "pattern": row[1], 
-            "category": row[2],
-            "created_at": row[3]
-        } 
-        for row in cursor.fetchall()
-    ]
-    conn.close()
+        rules = [
+            {
+                "id": row[0],
+                "pattern": row[1], 
+                "category": row[2],
+                "created_at": row[3]
+            } 
+            for row in cursor.fetchall()
+        ]
     return rules
 
 @app.get("/debug/transactions/{account_id}")
-async def debug_transactions(account_id: int):
+@offload
+def debug_transactions(account_id: int):
     """Debug endpoint to see transaction categories"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT category, COUNT(*) as count
-        FROM transactions 
-        WHERE account_id = ?
-        GROUP BY category
-        ORDER BY count DESC
-    """, (account_id,))
+    with db.connection() as conn:
+        cursor = conn.cursor()
     
-    category_counts = [{"category": row[0], "count": row[1]} for row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT category, COUNT(*) as count
+            FROM transactions 
+            WHERE account_id = ?
+            GROUP BY category
+            ORDER BY count DESC
+        """, (account_id,))
     
-    cursor.execute("SELECT COUNT(*) FROM transactions WHERE account_id = ?", (account_id,))
-    total_count = cursor.fetchone()[0]
+        category_counts = [{"category": row[0], "count": row[1]} for row in cursor.fetchall()]
     
-    conn.close()
+        cursor.execute("SELECT COUNT(*) FROM transactions WHERE account_id = ?", (account_id,))
+        total_count = cursor.fetchone()[0]
     return {
         "total_transactions": total_count,
         "category_breakdown": category_counts
     }
 
 @app.get("/predefined-categories")
-async def get_predefined_categories():
+@offload
+def get_predefined_categories():
     """Get list of predefined categories from database"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    with db.connection() as conn:
+        cursor = conn.cursor()
     
-    # Get all categories
-    cursor.execute("""
-        SELECT category_path, level_1, level_2, level_3, level_4, display_name
-        FROM predefined_categories
-        ORDER BY category_path
-    """)
+        # Get all categories
+        cursor.execute("""
+            SELECT category_path, level_1, level_2, level_3, level_4, display_name
+            FROM predefined_categories
+            ORDER BY category_path
+        """)
     
-    categories_data = cursor.fetchall()
-    conn.close()
+        categories_data = cursor.fetchall()
     
     # Group categories by level_1
     grouped = {}
@@ -1289,19 +1490,19 @@ async def get_predefined_categories():
     }
 
 @app.get("/predefined-categories/hierarchy")
-async def get_category_hierarchy():
+@offload
+def get_category_hierarchy():
     """Get hierarchical category structure for tree display"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    with db.connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT category_path, level_1, level_2, level_3, level_4, display_name
-        FROM predefined_categories
-        ORDER BY category_path
-    """)
+        cursor.execute("""
+            SELECT category_path, level_1, level_2, level_3, level_4, display_name
+            FROM predefined_categories
+            ORDER BY category_path
+        """)
     
-    categories_data = cursor.fetchall()
-    conn.close()
+        categories_data = cursor.fetchall()
     
     # Build hierarchical structure
     hierarchy = {}
@@ -1351,54 +1552,53 @@ async def get_category_hierarchy():
     return hierarchy
 
 @app.get("/predefined-categories/search")
-async def search_categories(q: str = ""):
+@offload
+def search_categories(q: str = ""):
     """Search categories by name or path"""
     if not q or len(q) < 2:
         return []
     
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT category_path, display_name
-        FROM predefined_categories
-        WHERE display_name LIKE ? OR category_path LIKE ?
-        ORDER BY 
-            CASE 
-                WHEN display_name LIKE ? THEN 1
-                WHEN display_name LIKE ? THEN 2
-                ELSE 3
-            END,
-            display_name
-        LIMIT 20
-    """, (f"%{q}%", f"%{q}%", f"{q}%", f"%{q}%"))
-    
-    results = [
-        {
-            "path": row[0],
-            "display_name": row[1]
-        }
-        for row in cursor.fetchall()
-    ]
+    with db.connection() as conn:
+        cursor = conn.cursor()
     
-    conn.close()
+        cursor.execute("""
+            SELECT category_path, display_name
+            FROM predefined_categories
+            WHERE display_name LIKE ? OR category_path LIKE ?
+            ORDER BY 
+                CASE 
+                    WHEN display_name LIKE ? THEN 1
+                    WHEN display_name LIKE ? THEN 2
+                    ELSE 3
+                END,
+                display_name
+            LIMIT 20
+        """, (f"%{q}%", f"%{q}%", f"{q}%", f"%{q}%"))
+    
+        results = [
+            {
+                "path": row[0],
+                "display_name": row[1]
+            }
+            for row in cursor.fetchall()
+        ]
     return results
 
 @app.get("/predefined-categories/grouped")
-async def get_grouped_categories():
+@offload
+def get_grouped_categories():
     """Get categories grouped by main category for better organization"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    with db.connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT level_1, display_name, category_path
-        FROM predefined_categories
-        WHERE level_2 IS NOT NULL
-        ORDER BY level_1, display_name
-    """)
+        cursor.execute("""
+            SELECT level_1, display_name, category_path
+            FROM predefined_categories
+            WHERE level_2 IS NOT NULL
+            ORDER BY level_1, display_name
+        """)
     
-    categories_data = cursor.fetchall()
-    conn.close()
+        categories_data = cursor.fetchall()
     
     # Group by level_1
     grouped = {}
@@ -1413,31 +1613,29 @@ async def get_grouped_categories():
     return grouped
 
 @app.post("/predefined-categories")
-async def add_predefined_category(category_data: dict):
+@offload
+def add_predefined_category(category_data: dict):
     """Add a new predefined category"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        # Extract category data
-        level_1 = category_data.get("level_1", "Transfers")
-        level_2 = category_data.get("level_2", "Personal")
-        level_3 = category_data.get("level_3")
-        level_4 = category_data.get("level_4")
-        display_name = category_data.get("display_name", "Wife Transfer")
+        with db.transaction() as conn:
+            cursor = conn.cursor()
         
-        # Build category path
-        category_path = ":".join(filter(None, [level_1, level_2, level_3, level_4]))
+            # Extract category data
+            level_1 = category_data.get("level_1", "Transfers")
+            level_2 = category_data.get("level_2", "Personal")
+            level_3 = category_data.get("level_3")
+            level_4 = category_data.get("level_4")
+            display_name = category_data.get("display_name", "Wife Transfer")
         
-        # Insert new category
-        cursor.execute("""
-            INSERT INTO predefined_categories 
-            (category_path, level_1, level_2, level_3, level_4, display_name)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (category_path, level_1, level_2, level_3, level_4, display_name))
+            # Build category path
+            category_path = ":".join(filter(None, [level_1, level_2, level_3, level_4]))
         
-        conn.commit()
-        conn.close()
+            # Insert new category
+            cursor.execute("""
+                INSERT INTO predefined_categories 
+                (category_path, level_1, level_2, level_3, level_4, display_name)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (category_path, level_1, level_2, level_3, level_4, display_name))
         
         return {"message": f"Category '{display_name}' added successfully", "category": category_data}
         
@@ -1449,7 +1647,7 @@ if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
 # Initialize backup manager
-backup_manager = BackupManager()
+backup_manager = BackupManager(db)
 
 class BackupRequest(BaseModel):
     bank_id: int
@@ -1460,10 +1658,16 @@ class RestoreRequest(BaseModel):
     new_bank_name: Optional[str] = None
 
 @app.post("/backup/bank")
-async def backup_bank(request: BackupRequest):
-    """Create a backup of a specific bank and all its data"""
+@offload
+def backup_bank(request: BackupRequest, run_async: bool = Query(False, alias="async")):
+    """Create a backup of a specific bank and all its data (as a background job with async=true)"""
+    if run_async:
+        return queued_job("backup_bank", {"bank_id": request.bank_id, "bank_name": request.bank_name})
+    return create_bank_backup(request.bank_id, request.bank_name)
+
+def create_bank_backup(bank_id: int, bank_name: Optional[str] = None):
     try:
-        backup_path = backup_manager.backup_bank(request.bank_id, request.bank_name)
+        backup_path = backup_manager.backup_bank(bank_id, bank_name)
         return {
             "success": True,
             "message": "Bank backup created successfully",
@@ -1475,11 +1679,12 @@ async def backup_bank(request: BackupRequest):
         raise HTTPException(status_code=500, detail=f"Backup failed: {str(e)}")
 
 @app.post("/restore/bank")
-async def restore_bank(request: RestoreRequest):
+@offload
+def restore_bank(request: RestoreRequest):
     """Restore a bank from a backup file"""
     try:
         # Construct full backup file path
-        backup_path = f"./backups/{request.backup_file}"
+        backup_path = backup_manager.backup_path(request.backup_file)
         result = backup_manager.restore_bank(backup_path, request.new_bank_name)
         return {
             "success": True,
@@ -1488,11 +1693,14 @@ async def restore_bank(request: RestoreRequest):
         }
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except InvalidBackupError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Restore failed: {str(e)}")
 
 @app.get("/backups")
-async def list_backups():
+@offload
+def list_backups():
     """List all available backup files"""
     try:
         backups = backup_manager.list_backups()
@@ -1503,11 +1711,22 @@ async def list_backups():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list backups: {str(e)}")
 
+@app.post("/admin/backups/all")
+@offload
+def backup_all_households():
+    """Back up every bank in the default database and in every household database"""
+    try:
+        files = backup_manager.backup_all()
+        return {"success": True, "backups": files}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Backup failed: {str(e)}")
+
 @app.delete("/backups/{backup_filename}")
-async def delete_backup(backup_filename: str):
+@offload
+def delete_backup(backup_filename: str):
     """Delete a backup file"""
     try:
-        backup_path = f"./backups/{backup_filename}"
+        backup_path = backup_manager.backup_path(backup_filename)
         success = backup_manager.delete_backup(backup_path)
         if success:
             return {"success": True, "message": "Backup deleted successfully"}
@@ -1517,96 +1736,92 @@ async def delete_backup(backup_filename: str):
         raise HTTPException(status_code=500, detail=f"Failed to delete backup: {str(e)}")
 
 @app.post("/setup-demo")
-async def setup_demo():
+@offload
+def setup_demo():
     """Create demo bank and account with sample data"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        with db.transaction() as conn:
+            cursor = conn.cursor()
         
-        # Create demo bank
-        cursor.execute("INSERT OR IGNORE INTO banks (name) VALUES (?)", ("Demo Bank",))
-        cursor.execute("SELECT id FROM banks WHERE name = ?", ("Demo Bank",))
-        bank_id = cursor.fetchone()[0]
+            # Create demo bank
+            cursor.execute("INSERT OR IGNORE INTO banks (name) VALUES (?)", ("Demo Bank",))
+            cursor.execute("SELECT id FROM banks WHERE name = ?", ("Demo Bank",))
+            bank_id = cursor.fetchone()[0]
         
-        # Create demo account
-        cursor.execute("""
-            INSERT OR IGNORE INTO accounts (bank_id, name, account_type, balance) 
-            VALUES (?, ?, ?, ?)
-        """, (bank_id, "Demo Checking", "checking", 5000.00))
-        
-        cursor.execute("SELECT id FROM accounts WHERE bank_id = ? AND name = ?", (bank_id, "Demo Checking"))
-        account_id = cursor.fetchone()[0]
-        
-        # Add sample transactions
-        sample_transactions = [
-            ("2024-01-15", "Salary Deposit", 3000.00, "Income:Salary"),
-            ("2024-01-16", "Grocery Store", -120.50, "Expenses:Food:Groceries"),
-            ("2024-01-17", "Gas Station", -45.00, "Expenses:Transportation:Fuel"),
-            ("2024-01-18", "Restaurant", -65.25, "Expenses:Food:DiningOut"),
-            ("2024-01-19", "Electric Bill", -89.99, "Expenses:Housing:Utilities:Electricity"),
-            ("2024-01-20", "ATM Withdrawal", -100.00, "Transfers:CashWithdrawal"),
-            ("2024-01-25", "Mortgage Payment", -1850.00, "Expenses:Housing:Mortgage"),
-            ("2024-01-26", "Water Bill", -125.00, "Expenses:Housing:Utilities:Water"),
-            ("2024-01-27", "Internet Service", -95.50, "Expenses:Housing:Utilities:Internet"),
-            ("2024-01-28", "Home Insurance", -200.00, "Expenses:Housing:HomeInsurance"),
-            ("2024-01-29", "Property Tax", -450.00, "Expenses:Housing:PropertyTax"),
-        ]
-        
-        for date, desc, amount, category in sample_transactions:
+            # Create demo account
             cursor.execute("""
-                INSERT OR IGNORE INTO transactions (account_id, date, description, amount, category)
-                VALUES (?, ?, ?, ?, ?)
-            """, (account_id, date, desc, amount, category))
-        
-        # Update account balance
-        cursor.execute("SELECT SUM(amount) FROM transactions WHERE account_id = ?", (account_id,))
-        balance = safe_float(cursor.fetchone()[0] or 0)
-        cursor.execute("UPDATE accounts SET balance = ? WHERE id = ?", (balance, account_id))
+                INSERT OR IGNORE INTO accounts (bank_id, name, account_type) 
+                VALUES (?, ?, ?)
+            """, (bank_id, "Demo Checking", "checking"))
+        
+            cursor.execute("SELECT id FROM accounts WHERE bank_id = ? AND name = ? AND deleted_at IS NULL",
+                           (bank_id, "Demo Checking"))
+            account_id = cursor.fetchone()[0]
+        
+            # Add sample transactions
+            sample_transactions = [
+                ("2024-01-15", "Salary Deposit", 3000.00, "Income:Salary"),
+                ("2024-01-16", "Grocery Store", -120.50, "Expenses:Food:Groceries"),
+                ("2024-01-17", "Gas Station", -45.00, "Expenses:Transportation:Fuel"),
+                ("2024-01-18", "Restaurant", -65.25, "Expenses:Food:DiningOut"),
+                ("2024-01-19", "Electric Bill", -89.99, "Expenses:Housing:Utilities:Electricity"),
+                ("2024-01-20", "ATM Withdrawal", -100.00, "Transfers:CashWithdrawal"),
+                ("2024-01-25", "Mortgage Payment", -1850.00, "Expenses:Housing:Mortgage"),
+                ("2024-01-26", "Water Bill", -125.00, "Expenses:Housing:Utilities:Water"),
+                ("2024-01-27", "Internet Service", -95.50, "Expenses:Housing:Utilities:Internet"),
+                ("2024-01-28", "Home Insurance", -200.00, "Expenses:Housing:HomeInsurance"),
+                ("2024-01-29", "Property Tax", -450.00, "Expenses:Housing:PropertyTax"),
+            ]
         
-        conn.commit()
-        conn.close()
+            dates, descriptions, amounts, categories = zip(*sample_transactions)
+            _, day_numbers, _ = normalize_dates(pd.Series(dates), "%Y-%m-%d")
+            cursor.executemany("""
+                INSERT OR IGNORE INTO transactions (account_id, date, day_number, description_id, amount_cents, category)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, zip([account_id] * len(dates), dates, sql_values(day_numbers), intern_descriptions(cursor, descriptions),
+                     sql_values(parse_amounts(pd.Series(amounts))), categories))
         
         return {"success": True, "message": "Demo data created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create demo data: {str(e)}")
 
 @app.delete("/banks/{bank_id}")
-async def delete_bank(bank_id: int):
-    """Delete a bank and all its associated accounts and transactions"""
+@offload
+def delete_bank(bank_id: int):
+    """Delete a bank and all its associated accounts and transactions.
+
+    Small banks are deleted at once. Larger ones are hidden immediately and
+    emptied by the background purge, a batch at a time.
+    """
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        # Check if bank exists
-        cursor.execute("SELECT id, name FROM banks WHERE id = ?", (bank_id,))
-        bank = cursor.fetchone()
-        if not bank:
-            raise HTTPException(status_code=404, detail="Bank not found")
-        
-        bank_name = bank[1]
-        
-        # Get account IDs for this bank
-        cursor.execute("SELECT id FROM accounts WHERE bank_id = ?", (bank_id,))
-        account_ids = [row[0] for row in cursor.fetchall()]
-        
-        # Delete transactions for all accounts of this bank
-        if account_ids:
-            placeholders = ','.join('?' * len(account_ids))
-            cursor.execute(f"DELETE FROM transactions WHERE account_id IN ({placeholders})", account_ids)
-            transactions_deleted = cursor.rowcount
-        else:
-            transactions_deleted = 0
+        with db.transaction() as conn:
+            cursor = conn.cursor()
         
-        # Delete accounts for this bank
-        cursor.execute("DELETE FROM accounts WHERE bank_id = ?", (bank_id,))
-        accounts_deleted = cursor.rowcount
+            # Check if bank exists
+            cursor.execute("SELECT id, name FROM banks WHERE id = ? AND deleted_at IS NULL", (bank_id,))
+            bank = cursor.fetchone()
+            if not bank:
+                raise HTTPException(status_code=404, detail="Bank not found")
         
-        # Delete the bank
-        cursor.execute("DELETE FROM banks WHERE id = ?", (bank_id,))
+            bank_name = bank[1]
         
-        conn.commit()
-        conn.close()
+            cursor.execute("""
+                SELECT COUNT(DISTINCT a.id), COUNT(t.id)
+                FROM accounts a LEFT JOIN transactions t ON t.account_id = a.id
+                WHERE a.bank_id = ?
+            """, (bank_id,))
+            accounts_deleted, transactions_deleted = cursor.fetchone()
+        
+            # Accounts and their transactions, rules etc. go with the bank (ON DELETE CASCADE)
+            if transactions_deleted <= PURGE_BATCH_SIZE:
+                cursor.execute("DELETE FROM banks WHERE id = ?", (bank_id,))
+                purge = "completed"
+            else:
+                hide_bank(cursor, bank_id)
+                purge = "scheduled"
         
+        if purge == "scheduled":
+            schedule_purge(db.pool())
         return {
             "success": True, 
             "message": f"Bank '{bank_name}' deleted successfully",
@@ -1614,7 +1829,8 @@ async def delete_bank(bank_id: int):
                 "bank": bank_name,
                 "accounts": accounts_deleted,
                 "transactions": transactions_deleted
-            }
+            },
+            "purge": purge
         }
     except HTTPException:
         raise
@@ -1622,38 +1838,42 @@ async def delete_bank(bank_id: int):
         raise HTTPException(status_code=500, detail=f"Failed to delete bank: {str(e)}")
 
 @app.delete("/accounts/{account_id}")
-async def delete_account(account_id: int):
-    """Delete an account and all its transactions"""
+@offload
+def delete_account(account_id: int):
+    """Delete an account and all its transactions (large accounts are purged in the background)"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        with db.transaction() as conn:
+            cursor = conn.cursor()
         
-        # Check if account exists
-        cursor.execute("SELECT id, name, bank_id FROM accounts WHERE id = ?", (account_id,))
-        account = cursor.fetchone()
-        if not account:
-            raise HTTPException(status_code=404, detail="Account not found")
-        
-        account_name = account[1]
-        bank_id = account[2]
+            # Check if account exists
+            cursor.execute("SELECT id, name FROM accounts WHERE id = ? AND deleted_at IS NULL", (account_id,))
+            account = cursor.fetchone()
+            if not account:
+                raise HTTPException(status_code=404, detail="Account not found")
         
-        # Delete transactions for this account
-        cursor.execute("DELETE FROM transactions WHERE account_id = ?", (account_id,))
-        transactions_deleted = cursor.rowcount
+            account_name = account[1]
         
-        # Delete the account
-        cursor.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
+            cursor.execute("SELECT COUNT(*) FROM transactions WHERE account_id = ?", (account_id,))
+            transactions_deleted = cursor.fetchone()[0]
         
-        conn.commit()
-        conn.close()
+            # Transactions and category rules go with the account (ON DELETE CASCADE)
+            if transactions_deleted <= PURGE_BATCH_SIZE:
+                cursor.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
+                purge = "completed"
+            else:
+                hide_account(cursor, account_id)
+                purge = "scheduled"
         
+        if purge == "scheduled":
+            schedule_purge(db.pool())
         return {
             "success": True,
             "message": f"Account '{account_name}' deleted successfully", 
             "deleted": {
                 "account": account_name,
                 "transactions": transactions_deleted
-            }
+            },
+            "purge": purge
         }
     except HTTPException:
         raise
@@ -1661,29 +1881,27 @@ async def delete_account(account_id: int):
         raise HTTPException(status_code=500, detail=f"Failed to delete account: {str(e)}")
 
 @app.put("/transactions/{transaction_id}/category")
-async def update_transaction_category(transaction_id: int, request: dict):
+@offload
+def update_transaction_category(transaction_id: int, request: dict):
     """Update the category of a specific transaction"""
     try:
         category = request.get('category')
         if not category:
             raise HTTPException(status_code=400, detail="Category is required")
         
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        with db.transaction() as conn:
+            cursor = conn.cursor()
         
-        # Check if transaction exists
-        cursor.execute("SELECT id FROM transactions WHERE id = ?", (transaction_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Transaction not found")
+            # Check if transaction exists
+            cursor.execute("SELECT id FROM transactions WHERE id = ?", (transaction_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail="Transaction not found")
         
-        # Update category
-        cursor.execute(
-            "UPDATE transactions SET category = ? WHERE id = ?",
-            (category, transaction_id)
-        )
-        
-        conn.commit()
-        conn.close()
+            # Update category
+            cursor.execute(
+                "UPDATE transactions SET category = ? WHERE id = ?",
+                (category, transaction_id)
+            )
         
         return {"success": True, "message": "Transaction category updated successfully"}
         
@@ -1693,32 +1911,30 @@ async def update_transaction_category(transaction_id: int, request: dict):
         raise HTTPException(status_code=500, detail=f"Failed to update category: {str(e)}")
 
 @app.delete("/data/all")
-async def delete_all_data():
+@offload
+def delete_all_data():
     """Delete all data (banks, accounts, transactions) - DANGEROUS OPERATION"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        # Count existing data
-        cursor.execute("SELECT COUNT(*) FROM transactions")
-        transactions_count = cursor.fetchone()[0]
+        with db.transaction() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("SELECT COUNT(*) FROM accounts")
-        accounts_count = cursor.fetchone()[0]
+            # Count existing data
+            cursor.execute("SELECT COUNT(*) FROM transactions")
+            transactions_count = cursor.fetchone()[0]
         
-        cursor.execute("SELECT COUNT(*) FROM banks")
-        banks_count = cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) FROM accounts")
+            accounts_count = cursor.fetchone()[0]
         
-        # Delete all data
-        cursor.execute("DELETE FROM transactions")
-        cursor.execute("DELETE FROM accounts")
-        cursor.execute("DELETE FROM banks")
+            cursor.execute("SELECT COUNT(*) FROM banks")
+            banks_count = cursor.fetchone()[0]
         
-        # Reset auto-increment counters
-        cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('banks', 'accounts', 'transactions')")
+            # Delete all data
+            cursor.execute("DELETE FROM transactions")
+            cursor.execute("DELETE FROM accounts")
+            cursor.execute("DELETE FROM banks")
         
-        conn.commit()
-        conn.close()
+            # Reset auto-increment counters
+            cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('banks', 'accounts', 'transactions')")
         
         return {
             "success": True,
@@ -1733,10 +1949,11 @@ async def delete_all_data():
         raise HTTPException(status_code=500, detail=f"Failed to delete all data: {str(e)}")
 
 @app.get("/backups/{backup_filename}/inspect")
-async def inspect_backup(backup_filename: str):
+@offload
+def inspect_backup(backup_filename: str):
     """Inspect the contents of a backup file without restoring it"""
     try:
-        backup_path = f"./backups/{backup_filename}"
+        backup_path = backup_manager.backup_path(backup_filename)
         
         # Check if backup file exists
         if not Path(backup_path).exists():
@@ -1806,7 +2023,8 @@ async def inspect_backup(backup_filename: str):
         raise HTTPException(status_code=500, detail=f"Failed to inspect backup: {str(e)}")
 
 @app.post("/restore/selective")
-async def restore_selective(request: dict):
+@offload
+def restore_selective(request: dict):
     """Restore specific banks from a backup file"""
     try:
         backup_file = request.get('backup_file')
@@ -1816,7 +2034,7 @@ async def restore_selective(request: dict):
         if not backup_file:
             raise HTTPException(status_code=400, detail="Backup file is required")
         
-        backup_path = f"./backups/{backup_file}"
+        backup_path = backup_manager.backup_path(backup_file)
         
         # If no specific bank selected, restore all (existing behavior)
         if not selected_bank_id:
@@ -1837,6 +2055,8 @@ async def restore_selective(request: dict):
             
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except InvalidBackupError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -1845,27 +2065,26 @@ async def restore_selective(request: dict):
 # Investment Portfolio Management Endpoints
 
 @app.post("/investment-accounts")
-async def create_investment_account(account: InvestmentAccountModel):
+@offload
+def create_investment_account(account: InvestmentAccountModel):
     """Create a new investment account"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        with db.transaction() as conn:
+            cursor = conn.cursor()
         
-        # Special handling for credit card accounts
-        if account.account_type == "credit":
-            print(f"Creating credit card investment account: {account.name}")
-            # For credit cards, we might want to set custodian to the credit card issuer
-            if not account.custodian:
-                account.custodian = "Credit Card Issuer"
+            # Special handling for credit card accounts
+            if account.account_type == "credit":
+                print(f"Creating credit card investment account: {account.name}")
+                # For credit cards, we might want to set custodian to the credit card issuer
+                if not account.custodian:
+                    account.custodian = "Credit Card Issuer"
         
-        cursor.execute("""
-            INSERT INTO investment_accounts (name, account_type, custodian, account_number)
-            VALUES (?, ?, ?, ?)
-        """, (account.name, account.account_type, account.custodian, account.account_number))
+            cursor.execute("""
+                INSERT INTO investment_accounts (name, account_type, custodian, account_number)
+                VALUES (?, ?, ?, ?)
+            """, (account.name, account.account_type, account.custodian, account.account_number))
         
-        account_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            account_id = cursor.lastrowid
         
         # Return account info with additional metadata for credit cards
         response = {
@@ -1889,36 +2108,36 @@ async def create_investment_account(account: InvestmentAccountModel):
         raise HTTPException(status_code=500, detail=f"Failed to create investment account: {str(e)}")
 
 @app.get("/investment-accounts")
-async def get_investment_accounts():
+@offload
+def get_investment_accounts():
     """Get all investment accounts"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        with db.connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT id, name, account_type, custodian, account_number, created_at
-            FROM investment_accounts
-            ORDER BY created_at DESC
-        """)
-        
-        accounts = []
-        for row in cursor.fetchall():
-            accounts.append({
-                "id": row[0],
-                "name": row[1],
-                "account_type": row[2],
-                "custodian": row[3],
-                "account_number": row[4],
-                "created_at": row[5]
-            })
-        
-        conn.close()
+            cursor.execute("""
+                SELECT id, name, account_type, custodian, account_number, created_at
+                FROM investment_accounts
+                ORDER BY created_at DESC
+            """)
+        
+            accounts = []
+            for row in cursor.fetchall():
+                accounts.append({
+                    "id": row[0],
+                    "name": row[1],
+                    "account_type": row[2],
+                    "custodian": row[3],
+                    "account_number": row[4],
+                    "created_at": row[5]
+                })
         return accounts
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch investment accounts: {str(e)}")
 
 @app.post("/portfolio-statements/{account_id}")
-async def import_portfolio_statement(
+@offload
+def import_portfolio_statement(
     account_id: int,
     statement: str = Form(...),
     file: UploadFile = File(...)
@@ -1927,111 +2146,68 @@ async def import_portfolio_statement(
     try:
         # Parse the statement JSON string
         import json
+        content = file.file.read()
         statement_data = json.loads(statement)
         
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        # Check if this is a credit card account
-        cursor.execute("SELECT account_type FROM investment_accounts WHERE id = ?", (account_id,))
-        account_result = cursor.fetchone()
-        
-        if account_result and account_result[0] == "credit":
-            # This is a credit card account - use credit card parsing instead
-            raise HTTPException(status_code=400, detail="Credit card accounts should use the credit card statement endpoints")
-            conn.close()
+        with db.transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Credit card accounts have their own statement endpoints
+            cursor.execute("SELECT account_type FROM investment_accounts WHERE id = ?", (account_id,))
+            account_result = cursor.fetchone()
             
-            # Use the credit card parser
-            from credit_card_parser import CreditCardParser
+            if account_result and account_result[0] == "credit":
+                raise HTTPException(status_code=400, detail="Credit card accounts should use the credit card statement endpoints")
             
-            # Save the uploaded file temporarily
-            temp_file_path = f"./data/temp_credit_card_{file.filename}"
+            # Regular investment account processing
+            # Save the uploaded file
+            file_path = f"./data/portfolio_statement_{account_id}_{statement_data.get('statement_date', 'unknown')}.pdf"
             os.makedirs("./data", exist_ok=True)
             
-            with open(temp_file_path, "wb") as buffer:
-                content = await file.read()
+            with open(file_path, "wb") as buffer:
                 buffer.write(content)
             
-            try:
-                parser = CreditCardParser()
-                parsed_data = parser.parse_statement(temp_file_path)
-                
-                if "error" in parsed_data:
-                    raise HTTPException(status_code=400, detail=parsed_data["error"])
-                
-                # Format for import
-                import_data = parser.format_for_import(parsed_data)
-                
-                # Clean up temp file
-                os.remove(temp_file_path)
-                
-                return {
-                    "success": True,
-                    "message": "Credit card statement parsed successfully",
-                    "parsed_data": import_data,
-                    "note": "This is a credit card account. Use the parsed data to import transactions.",
-                    "account_type": "credit_card"
-                }
-                
-            except Exception as e:
-                # Clean up temp file on error
-                if os.path.exists(temp_file_path):
-                    os.remove(temp_file_path)
-                raise HTTPException(status_code=500, detail=f"Error parsing credit card statement: {str(e)}")
-        
-        # Regular investment account processing
-        # Save the uploaded file
-        file_path = f"./data/portfolio_statement_{account_id}_{statement_data.get('statement_date', 'unknown')}.pdf"
-        os.makedirs("./data", exist_ok=True)
-        
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # Insert portfolio statement
-        cursor.execute("""
-            INSERT INTO portfolio_statements (
-                investment_account_id, statement_date, opening_balance, period_gain_loss,
-                ending_balance, total_market_value, total_cost_basis,
-                total_unrealized_gain_loss, statement_file_path
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            account_id,
-            statement_data.get('statement_date'),
-            statement_data.get('opening_balance', 0.0),
-            statement_data.get('period_gain_loss', 0.0),
-            statement_data.get('ending_balance', 0.0),
-            statement_data.get('total_market_value', 0.0),
-            statement_data.get('total_cost_basis', 0.0),
-            statement_data.get('total_unrealized_gain_loss', 0.0),
-            file_path
-        ))
-        
-        statement_id = cursor.lastrowid
-        
-        # Insert securities data
-        securities = statement_data.get('securities', [])
-        for security in securities:
+            # Insert portfolio statement
             cursor.execute("""
-                INSERT INTO securities (
-                    investment_account_id, symbol, name, security_type, quantity,
-                    share_price, total_cost, market_value, unrealized_gain_loss, statement_date
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO portfolio_statements (
+                    investment_account_id, statement_date, opening_balance, period_gain_loss,
+                    ending_balance, total_market_value, total_cost_basis,
+                    total_unrealized_gain_loss, statement_file_path
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 account_id,
-                security.get('symbol', ''),
-                security.get('name', ''),
-                security.get('security_type', 'Unknown'),
-                security.get('quantity', 0.0),
-                security.get('share_price', 0.0),
-                security.get('total_cost', 0.0),
-                security.get('market_value', 0.0),
-                security.get('unrealized_gain_loss', 0.0),
-                statement_data.get('statement_date')
+                statement_data.get('statement_date'),
+                statement_data.get('opening_balance', 0.0),
+                statement_data.get('period_gain_loss', 0.0),
+                statement_data.get('ending_balance', 0.0),
+                statement_data.get('total_market_value', 0.0),
+                statement_data.get('total_cost_basis', 0.0),
+                statement_data.get('total_unrealized_gain_loss', 0.0),
+                file_path
             ))
         
-        conn.commit()
-        conn.close()
+            statement_id = cursor.lastrowid
+        
+            # Insert securities data
+            securities = statement_data.get('securities', [])
+            for security in securities:
+                cursor.execute("""
+                    INSERT INTO securities (
+                        investment_account_id, symbol, name, security_type, quantity,
+                        share_price, total_cost, market_value, unrealized_gain_loss, statement_date
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    account_id,
+                    security.get('symbol', ''),
+                    security.get('name', ''),
+                    security.get('security_type', 'Unknown'),
+                    security.get('quantity', 0.0),
+                    security.get('share_price', 0.0),
+                    security.get('total_cost', 0.0),
+                    security.get('market_value', 0.0),
+                    security.get('unrealized_gain_loss', 0.0),
+                    statement_data.get('statement_date')
+                ))
         
         return {
             "success": True,
@@ -2046,137 +2222,134 @@ async def import_portfolio_statement(
         raise HTTPException(status_code=500, detail=f"Failed to import portfolio statement: {str(e)}")
 
 @app.get("/portfolio-statements/{account_id}")
-async def get_portfolio_statements(account_id: int):
+@offload
+def get_portfolio_statements(account_id: int):
     """Get portfolio statements for an investment account"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, statement_date, opening_balance, period_gain_loss, ending_balance,
-                   total_market_value, total_cost_basis, total_unrealized_gain_loss,
-                   statement_file_path, created_at
-            FROM portfolio_statements
-            WHERE investment_account_id = ?
-            ORDER BY statement_date DESC
-        """, (account_id,))
-        
-        statements = []
-        for row in cursor.fetchall():
-            statements.append({
-                "id": row[0],
-                "statement_date": row[1],
-                "opening_balance": row[2],
-                "period_gain_loss": row[3],
-                "ending_balance": row[4],
-                "total_market_value": row[5],
-                "total_cost_basis": row[6],
-                "total_unrealized_gain_loss": row[7],
-                "statement_file_path": row[8],
-                "created_at": row[9]
-            })
+        with db.connection() as conn:
+            cursor = conn.cursor()
         
-        conn.close()
+            cursor.execute("""
+                SELECT id, statement_date, opening_balance, period_gain_loss, ending_balance,
+                       total_market_value, total_cost_basis, total_unrealized_gain_loss,
+                       statement_file_path, created_at
+                FROM portfolio_statements
+                WHERE investment_account_id = ?
+                ORDER BY statement_date DESC
+            """, (account_id,))
+        
+            statements = []
+            for row in cursor.fetchall():
+                statements.append({
+                    "id": row[0],
+                    "statement_date": row[1],
+                    "opening_balance": row[2],
+                    "period_gain_loss": row[3],
+                    "ending_balance": row[4],
+                    "total_market_value": row[5],
+                    "total_cost_basis": row[6],
+                    "total_unrealized_gain_loss": row[7],
+                    "statement_file_path": row[8],
+                    "created_at": row[9]
+                })
         return statements
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch portfolio statements: {str(e)}")
 
 @app.get("/securities/{account_id}")
-async def get_securities(account_id: int, statement_date: Optional[str] = None):
+@offload
+def get_securities(account_id: int, statement_date: Optional[str] = None):
     """Get securities for an investment account, optionally filtered by statement date"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        with db.connection() as conn:
+            cursor = conn.cursor()
         
-        if statement_date:
-            cursor.execute("""
-                SELECT id, symbol, name, security_type, quantity, share_price,
-                       total_cost, market_value, unrealized_gain_loss, statement_date
-                FROM securities
-                WHERE investment_account_id = ? AND statement_date = ?
-                ORDER BY symbol
-            """, (account_id, statement_date))
-        else:
-            # Get latest securities for each symbol
-            cursor.execute("""
-                SELECT s1.id, s1.symbol, s1.name, s1.security_type, s1.quantity,
-                       s1.share_price, s1.total_cost, s1.market_value,
-                       s1.unrealized_gain_loss, s1.statement_date
-                FROM securities s1
-                INNER JOIN (
-                    SELECT symbol, MAX(statement_date) as max_date
+            if statement_date:
+                cursor.execute("""
+                    SELECT id, symbol, name, security_type, quantity, share_price,
+                           total_cost, market_value, unrealized_gain_loss, statement_date
                     FROM securities
-                    WHERE investment_account_id = ?
-                    GROUP BY symbol
-                ) s2 ON s1.symbol = s2.symbol AND s1.statement_date = s2.max_date
-                WHERE s1.investment_account_id = ?
-                ORDER BY s1.symbol
-            """, (account_id, account_id))
-        
-        securities = []
-        for row in cursor.fetchall():
-            securities.append({
-                "id": row[0],
-                "symbol": row[1],
-                "name": row[2],
-                "security_type": row[3],
-                "quantity": row[4],
-                "share_price": row[5],
-                "total_cost": row[6],
-                "market_value": row[7],
-                "unrealized_gain_loss": row[8],
-                "statement_date": row[9]
-            })
-        
-        conn.close()
+                    WHERE investment_account_id = ? AND statement_date = ?
+                    ORDER BY symbol
+                """, (account_id, statement_date))
+            else:
+                # Get latest securities for each symbol
+                cursor.execute("""
+                    SELECT s1.id, s1.symbol, s1.name, s1.security_type, s1.quantity,
+                           s1.share_price, s1.total_cost, s1.market_value,
+                           s1.unrealized_gain_loss, s1.statement_date
+                    FROM securities s1
+                    INNER JOIN (
+                        SELECT symbol, MAX(statement_date) as max_date
+                        FROM securities
+                        WHERE investment_account_id = ?
+                        GROUP BY symbol
+                    ) s2 ON s1.symbol = s2.symbol AND s1.statement_date = s2.max_date
+                    WHERE s1.investment_account_id = ?
+                    ORDER BY s1.symbol
+                """, (account_id, account_id))
+        
+            securities = []
+            for row in cursor.fetchall():
+                securities.append({
+                    "id": row[0],
+                    "symbol": row[1],
+                    "name": row[2],
+                    "security_type": row[3],
+                    "quantity": row[4],
+                    "share_price": row[5],
+                    "total_cost": row[6],
+                    "market_value": row[7],
+                    "unrealized_gain_loss": row[8],
+                    "statement_date": row[9]
+                })
         return securities
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch securities: {str(e)}")
 
 @app.get("/portfolio-summary/{account_id}")
-async def get_portfolio_summary(account_id: int):
+@offload
+def get_portfolio_summary(account_id: int):
     """Get a summary of the investment portfolio"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        with db.connection() as conn:
+            cursor = conn.cursor()
         
-        # Get latest statement
-        cursor.execute("""
-            SELECT statement_date, opening_balance, period_gain_loss, ending_balance,
-                   total_market_value, total_cost_basis, total_unrealized_gain_loss
-            FROM portfolio_statements
-            WHERE investment_account_id = ?
-            ORDER BY statement_date DESC
-            LIMIT 1
-        """, (account_id,))
-        
-        statement = cursor.fetchone()
-        if not statement:
-            raise HTTPException(status_code=404, detail="No portfolio statements found")
-        
-        # Get current securities
-        cursor.execute("""
-            SELECT symbol, name, security_type, quantity, share_price,
-                   total_cost, market_value, unrealized_gain_loss
-            FROM securities
-            WHERE investment_account_id = ? AND statement_date = ?
-            ORDER BY market_value DESC
-        """, (account_id, statement[0]))
-        
-        securities = []
-        for row in cursor.fetchall():
-            securities.append({
-                "symbol": row[0],
-                "name": row[1],
-                "security_type": row[2],
-                "quantity": row[3],
-                "share_price": row[4],
-                "total_cost": row[5],
-                "market_value": row[6],
-                "unrealized_gain_loss": row[7]
-            })
-        
-        conn.close()
+            # Get latest statement
+            cursor.execute("""
+                SELECT statement_date, opening_balance, period_gain_loss, ending_balance,
+                       total_market_value, total_cost_basis, total_unrealized_gain_loss
+                FROM portfolio_statements
+                WHERE investment_account_id = ?
+                ORDER BY statement_date DESC
+                LIMIT 1
+            """, (account_id,))
+        
+            statement = cursor.fetchone()
+            if not statement:
+                raise HTTPException(status_code=404, detail="No portfolio statements found")
+        
+            # Get current securities
+            cursor.execute("""
+                SELECT symbol, name, security_type, quantity, share_price,
+                       total_cost, market_value, unrealized_gain_loss
+                FROM securities
+                WHERE investment_account_id = ? AND statement_date = ?
+                ORDER BY market_value DESC
+            """, (account_id, statement[0]))
+        
+            securities = []
+            for row in cursor.fetchall():
+                securities.append({
+                    "symbol": row[0],
+                    "name": row[1],
+                    "security_type": row[2],
+                    "quantity": row[3],
+                    "share_price": row[4],
+                    "total_cost": row[5],
+                    "market_value": row[6],
+                    "unrealized_gain_loss": row[7]
+                })
         
         return {
             "statement_date": statement[0],
@@ -2193,49 +2366,48 @@ async def get_portfolio_summary(account_id: int):
         raise HTTPException(status_code=500, detail=f"Failed to fetch portfolio summary: {str(e)}")
 
 @app.get("/portfolio-summary/{account_id}/by-date")
-async def get_portfolio_summary_by_date(account_id: int, statement_date: str):
+@offload
+def get_portfolio_summary_by_date(account_id: int, statement_date: str):
     """Get a summary of the investment portfolio for a specific statement date"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        with db.connection() as conn:
+            cursor = conn.cursor()
         
-        # Get specific statement by date
-        cursor.execute("""
-            SELECT statement_date, opening_balance, period_gain_loss, ending_balance,
-                   total_market_value, total_cost_basis, total_unrealized_gain_loss
-            FROM portfolio_statements
-            WHERE investment_account_id = ? AND statement_date = ?
-            ORDER BY statement_date DESC
-            LIMIT 1
-        """, (account_id, statement_date))
-        
-        statement = cursor.fetchone()
-        if not statement:
-            raise HTTPException(status_code=404, detail=f"No portfolio statement found for date: {statement_date}")
-        
-        # Get securities for the selected statement date
-        cursor.execute("""
-            SELECT symbol, name, security_type, quantity, share_price,
-                   total_cost, market_value, unrealized_gain_loss
-            FROM securities
-            WHERE investment_account_id = ? AND statement_date = ?
-            ORDER BY market_value DESC
-        """, (account_id, statement[0]))
-        
-        securities = []
-        for row in cursor.fetchall():
-            securities.append({
-                "symbol": row[0],
-                "name": row[1],
-                "security_type": row[2],
-                "quantity": row[3],
-                "share_price": row[4],
-                "total_cost": row[5],
-                "market_value": row[6],
-                "unrealized_gain_loss": row[7]
-            })
+            # Get specific statement by date
+            cursor.execute("""
+                SELECT statement_date, opening_balance, period_gain_loss, ending_balance,
+                       total_market_value, total_cost_basis, total_unrealized_gain_loss
+                FROM portfolio_statements
+                WHERE investment_account_id = ? AND statement_date = ?
+                ORDER BY statement_date DESC
+                LIMIT 1
+            """, (account_id, statement_date))
         
-        conn.close()
+            statement = cursor.fetchone()
+            if not statement:
+                raise HTTPException(status_code=404, detail=f"No portfolio statement found for date: {statement_date}")
+        
+            # Get securities for the selected statement date
+            cursor.execute("""
+                SELECT symbol, name, security_type, quantity, share_price,
+                       total_cost, market_value, unrealized_gain_loss
+                FROM securities
+                WHERE investment_account_id = ? AND statement_date = ?
+                ORDER BY market_value DESC
+            """, (account_id, statement[0]))
+        
+            securities = []
+            for row in cursor.fetchall():
+                securities.append({
+                    "symbol": row[0],
+                    "name": row[1],
+                    "security_type": row[2],
+                    "quantity": row[3],
+                    "share_price": row[4],
+                    "total_cost": row[5],
+                    "market_value": row[6],
+                    "unrealized_gain_loss": row[7]
+                })
         
         return {
             "statement_date": statement[0],
@@ -2265,7 +2437,8 @@ def parse_pdf_statement(pdf_file):
         raise HTTPException(status_code=500, detail=f"PDF parsing failed: {str(e)}")
 
 @app.post("/parse-pdf-statement")
-async def parse_pdf_statement_endpoint(file: UploadFile = File(...)):
+@offload(executor=parse_executor)
+def parse_pdf_statement_endpoint(file: UploadFile = File(...)):
     """Parse a PDF investment statement to extract portfolio data"""
     try:
         # Save uploaded file temporarily
@@ -2273,7 +2446,7 @@ async def parse_pdf_statement_endpoint(file: UploadFile = File(...)):
         os.makedirs("./data", exist_ok=True)
         
         with open(temp_file_path, "wb") as buffer:
-            content = await file.read()
+            content = file.file.read()
             buffer.write(content)
         
         # Parse PDF using the updated function
@@ -2297,20 +2470,19 @@ async def parse_pdf_statement_endpoint(file: UploadFile = File(...)):
 # Credit Card Management Endpoints
 
 @app.post("/credit-accounts")
-async def create_credit_account(account: CreditAccountModel):
+@offload
+def create_credit_account(account: CreditAccountModel):
     """Create a new credit card account"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        with db.transaction() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO credit_accounts (name, account_type, provider, account_number)
-            VALUES (?, ?, ?, ?)
-        """, (account.name, account.account_type, account.provider, account.account_number))
+            cursor.execute("""
+                INSERT INTO credit_accounts (name, account_type, provider, account_number)
+                VALUES (?, ?, ?, ?)
+            """, (account.name, account.account_type, account.provider, account.account_number))
         
-        account_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            account_id = cursor.lastrowid
         
         return {
             "success": True,
@@ -2321,62 +2493,64 @@ async def create_credit_account(account: CreditAccountModel):
         raise HTTPException(status_code=500, detail=f"Failed to create credit card account: {str(e)}")
 
 @app.get("/credit-accounts")
-async def get_credit_accounts():
+@offload
+def get_credit_accounts():
     """Get all credit card accounts"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, name, account_type, provider, account_number, created_at
-            FROM credit_accounts
-            ORDER BY created_at DESC
-        """)
-        
-        accounts = []
-        for row in cursor.fetchall():
-            accounts.append({
-                "id": row[0],
-                "name": row[1],
-                "account_type": row[2],
-                "provider": row[3],
-                "account_number": row[4],
-                "created_at": row[5]
-            })
+        with db.connection() as conn:
+            cursor = conn.cursor()
         
-        conn.close()
+            cursor.execute("""
+                SELECT id, name, account_type, provider, account_number, created_at
+                FROM credit_accounts
+                ORDER BY created_at DESC
+            """)
+        
+            accounts = []
+            for row in cursor.fetchall():
+                accounts.append({
+                    "id": row[0],
+                    "name": row[1],
+                    "account_type": row[2],
+                    "provider": row[3],
+                    "account_number": row[4],
+                    "created_at": row[5]
+                })
         return accounts
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch credit card accounts: {str(e)}")
 
 @app.post("/credit-statements/{account_id}")
-async def import_credit_statement(account_id: int, statement: CreditStatementModel):
+@offload
+def import_credit_statement(account_id: int, statement: CreditStatementModel):
     """Import a credit card statement"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        with db.transaction() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO credit_statements (credit_account_id, statement_date, payment_due_date, 
-                                        new_balance, minimum_payment_due)
-            VALUES (?, ?, ?, ?, ?)
-        """, (account_id, statement.statement_date, statement.payment_due_date, 
-              statement.new_balance, statement.minimum_payment_due))
-        
-        statement_id = cursor.lastrowid
-        
-        # Save transactions if they exist
-        if statement.transactions:
-            for transaction in statement.transactions:
-                cursor.execute("""
-                    INSERT INTO credit_transactions (credit_statement_id, transaction_date, 
-                                                  description, amount, category)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (statement_id, transaction.transaction_date, transaction.description, 
-                      transaction.amount, transaction.category))
-        
-        conn.commit()
-        conn.close()
+            cursor.execute("""
+                INSERT INTO credit_statements (credit_account_id, statement_date, payment_due_date, 
+                                            new_balance, minimum_payment_due)
+                VALUES (?, ?, ?, ?, ?)
+            """, (account_id, statement.statement_date, statement.payment_due_date, 
+                  statement.new_balance, statement.minimum_payment_due))
+        
+            statement_id = cursor.lastrowid
+        
+            # Save transactions if they exist
+            if statement.transactions:
+                transactions = statement.transactions
+                raw_dates = pd.Series([t.transaction_date for t in transactions], dtype=object)
+                iso_dates, day_numbers, _ = normalize_dates(raw_dates)
+                amounts = parse_amounts(pd.Series([t.amount for t in transactions], dtype=float)).fillna(0)
+                description_ids = intern_descriptions(cursor, [t.description for t in transactions])
+                cursor.executemany("""
+                    INSERT INTO credit_transactions (credit_statement_id, transaction_date, day_number,
+                                                  description_id, amount_cents, category)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, zip([statement_id] * len(transactions), iso_dates.fillna(raw_dates).tolist(),
+                         sql_values(day_numbers), description_ids, sql_values(amounts),
+                         [t.category for t in transactions]))
         
         return {
             "success": True,
@@ -2387,53 +2561,52 @@ async def import_credit_statement(account_id: int, statement: CreditStatementMod
         raise HTTPException(status_code=500, detail=f"Failed to import credit card statement: {str(e)}")
 
 @app.get("/credit-statements/{account_id}")
-async def get_credit_statements(account_id: int):
+@offload
+def get_credit_statements(account_id: int):
     """Get credit card statements for an account"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, statement_date, payment_due_date, new_balance, minimum_payment_due,
-                   statement_file_path, created_at
-            FROM credit_statements
-            WHERE credit_account_id = ?
-            ORDER BY statement_date DESC
-        """, (account_id,))
+        with db.connection() as conn:
+            cursor = conn.cursor()
         
-        statements = []
-        for row in cursor.fetchall():
-            statement_id = row[0]
-            
-            # Get transactions for this statement
             cursor.execute("""
-                SELECT transaction_date, description, amount, category
-                FROM credit_transactions
-                WHERE credit_statement_id = ?
-                ORDER BY transaction_date
-            """, (statement_id,))
+                SELECT id, statement_date, payment_due_date, new_balance, minimum_payment_due,
+                       statement_file_path, created_at
+                FROM credit_statements
+                WHERE credit_account_id = ?
+                ORDER BY statement_date DESC
+            """, (account_id,))
+        
+            statements = []
+            for row in cursor.fetchall():
+                statement_id = row[0]
             
-            transactions = []
-            for trans_row in cursor.fetchall():
-                transactions.append({
-                    "transaction_date": trans_row[0],
-                    "description": trans_row[1],
-                    "amount": trans_row[2],
-                    "category": trans_row[3]
-                })
+                # Get transactions for this statement
+                cursor.execute(f"""
+                    SELECT transaction_date, {description_sql('credit_transactions')}, amount_cents, category
+                    FROM credit_transactions
+                    WHERE credit_statement_id = ?
+                    ORDER BY transaction_date
+                """, (statement_id,))
             
-            statements.append({
-                "id": statement_id,
-                "statement_date": row[1],
-                "payment_due_date": row[2],
-                "new_balance": row[3],
-                "minimum_payment_due": row[4],
-                "statement_file_path": row[5],
-                "created_at": row[6],
-                "transactions": transactions
-            })
-        
-        conn.close()
+                transactions = []
+                for trans_row in cursor.fetchall():
+                    transactions.append({
+                        "transaction_date": trans_row[0],
+                        "description": trans_row[1],
+                        "amount": cents_to_amount(trans_row[2]),
+                        "category": trans_row[3]
+                    })
+            
+                statements.append({
+                    "id": statement_id,
+                    "statement_date": row[1],
+                    "payment_due_date": row[2],
+                    "new_balance": row[3],
+                    "minimum_payment_due": row[4],
+                    "statement_file_path": row[5],
+                    "created_at": row[6],
+                    "transactions": transactions
+                })
         return {
             "success": True,
             "statements": statements
@@ -2444,7 +2617,8 @@ async def get_credit_statements(account_id: int):
 # Statement Format Management Endpoints
 
 @app.get("/statement-formats")
-async def get_available_statement_formats():
+@offload
+def get_available_statement_formats():
     """Get list of available statement formats for parsing"""
     try:
         formats = statement_parser.get_available_formats()
@@ -2467,7 +2641,8 @@ async def get_available_statement_formats():
         raise HTTPException(status_code=500, detail=f"Failed to get statement formats: {str(e)}")
 
 @app.get("/statement-formats/{format_key}")
-async def get_statement_format_details(format_key: str):
+@offload
+def get_statement_format_details(format_key: str):
     """Get detailed information about a specific statement format"""
     try:
         format_info = statement_parser.get_format_info(format_key)
@@ -2484,7 +2659,8 @@ async def get_statement_format_details(format_key: str):
         raise HTTPException(status_code=500, detail=f"Failed to get format details: {str(e)}")
 
 @app.post("/statement-formats")
-async def add_custom_statement_format(format_key: str = Form(...), format_config: str = Form(...)):
+@offload
+def add_custom_statement_format(format_key: str = Form(...), format_config: str = Form(...)):
     """Add a custom statement format for parsing"""
     try:
         import json
@@ -2512,7 +2688,8 @@ async def add_custom_statement_format(format_key: str = Form(...), format_config
         raise HTTPException(status_code=500, detail=f"Failed to add custom format: {str(e)}")
 
 @app.post("/parse-pdf-statement/{format_key}")
-async def parse_pdf_statement_with_format(format_key: str, file: UploadFile = File(...)):
+@offload(executor=parse_executor)
+def parse_pdf_statement_with_format(format_key: str, file: UploadFile = File(...)):
     """Parse a PDF statement using a specific format"""
     try:
         # Save uploaded file temporarily
@@ -2520,7 +2697,7 @@ async def parse_pdf_statement_with_format(format_key: str, file: UploadFile = Fi
         os.makedirs("./data", exist_ok=True)
         
         with open(temp_file_path, "wb") as buffer:
-            content = await file.read()
+            content = file.file.read()
             buffer.write(content)
         
         # Parse PDF using specified format
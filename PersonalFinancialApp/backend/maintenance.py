@@ -0,0 +1,267 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from analytics_mirror import refresh_mirror
+from archive import archive_closed_months
+from balances import VERIFY_INTERVAL, verify_balances
+from descriptions import prune_descriptions
+from raw_store import prune_dictionaries
+
+# Background upkeep of the SQLite file. Each task runs every
+# FINANCE_MAINTENANCE_<TASK>_INTERVAL seconds (0 disables it). Tasks marked
+# as "after writes" also run early once FINANCE_MAINTENANCE_WRITE_THRESHOLD
+# rows have been written since their last run, e.g. after an import, a
+# restore or a bulk delete. With household databases (database.ShardRouter)
+# every task runs on each database in turn.
+CHECK_INTERVAL = 60
+WRITE_THRESHOLD = int(os.environ.get("FINANCE_MAINTENANCE_WRITE_THRESHOLD", "50000"))
+ANALYSIS_LIMIT = 1000             # rows sampled per index by ANALYZE / PRAGMA optimize
+VACUUM_STEP_PAGES = 2000          # pages released per exclusive incremental_vacuum step
+# Databases created before incremental auto-vacuum are switched over with one
+# full VACUUM, but only automatically while they are small enough for that to be quick
+AUTO_FULL_VACUUM_MAX_BYTES = int(os.environ.get("FINANCE_MAINTENANCE_FULL_VACUUM_MAX_MB", "256")) * 1024 * 1024
+
+
+def database_info(db) -> Dict[str, Any]:
+    """Page counts, auto-vacuum mode and WAL size of the database file"""
+    with db.connection() as conn:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    wal_path = f"{db.db_path}-wal"
+    return {
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_pages": freelist,
+        "database_bytes": page_size * page_count,
+        "free_bytes": page_size * freelist,
+        "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(auto_vacuum, auto_vacuum),
+        "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+    }
+
+
+def optimize(db) -> Dict[str, Any]:
+    with db.exclusive() as conn:
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("PRAGMA optimize")
+    return {}
+
+
+def analyze(db) -> Dict[str, Any]:
+    with db.transaction() as conn:
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("ANALYZE")
+    return {}
+
+
+def vacuum(db) -> Dict[str, Any]:
+    """Rebuild the file, returning all free pages and enabling incremental auto-vacuum"""
+    before = database_info(db)
+    with db.exclusive() as conn:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    after = database_info(db)
+    freed = before["page_count"] - after["page_count"]
+    return {"freed_pages": freed, "freed_bytes": freed * after["page_size"]}
+
+
+def incremental_vacuum(db) -> Dict[str, Any]:
+    """Return free pages to the filesystem a step at a time, so writes interleave"""
+    info = database_info(db)
+    if not info["freelist_pages"]:
+        return {"freed_pages": 0, "freed_bytes": 0}
+    if info["auto_vacuum"] != "incremental":
+        if info["database_bytes"] > AUTO_FULL_VACUUM_MAX_BYTES:
+            return {"freed_pages": 0, "freed_bytes": 0,
+                    "skipped": "auto_vacuum is off for this database; run POST /admin/maintenance/vacuum once"}
+        return vacuum(db)
+
+    freed = 0
+    while True:
+        with db.exclusive() as conn:
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # executescript steps the pragma to completion (execute() frees a single page)
+            conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES});")
+            after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        freed += before - after
+        if after == 0 or after == before:
+            break
+    return {"freed_pages": freed, "freed_bytes": freed * info["page_size"]}
+
+
+def checkpoint(db) -> Dict[str, Any]:
+    """Copy the WAL into the database and truncate it"""
+    with db.exclusive() as conn:
+        busy, wal_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    return {"busy": bool(busy), "wal_pages": wal_pages, "checkpointed_pages": checkpointed}
+
+
+def quick_check(db) -> Dict[str, Any]:
+    with db.connection() as conn:
+        problems = [row[0] for row in conn.execute("PRAGMA quick_check")]
+    ok = problems == ["ok"]
+    if not ok:
+        print(f"⚠️  PRAGMA quick_check reported problems: {problems[:10]}")
+    return {"ok": ok, "problems": [] if ok else problems[:100]}
+
+
+def prune_raw_dictionaries(db) -> Dict[str, Any]:
+    """Delete compression dictionaries no stored raw row uses any more"""
+    with db.transaction() as conn:
+        return {"deleted": prune_dictionaries(conn)}
+
+
+def prune_unused_descriptions(db) -> Dict[str, Any]:
+    """Delete interned descriptions no transaction uses any more"""
+    with db.transaction() as conn:
+        return {"deleted": prune_descriptions(conn)}
+
+
+def repair_balances(db) -> Dict[str, Any]:
+    with db.transaction() as conn:
+        result = verify_balances(conn, repair=True)
+    if result["drift"]:
+        print(f"⚠️  Repaired balance drift on {len(result['drift'])} accounts: {result['drift']}")
+    return {"accounts_checked": result["accounts_checked"], "repaired": len(result["drift"])}
+
+
+# name: (function, default interval in seconds, also run after large writes)
+TASKS: Dict[str, tuple] = {
+    "checkpoint": (checkpoint, 900, True),
+    "optimize": (optimize, 3600, False),
+    "analyze": (analyze, 86400, True),
+    "incremental_vacuum": (incremental_vacuum, 3600, True),
+    "prune_raw_dictionaries": (prune_raw_dictionaries, 86400, True),
+    "prune_descriptions": (prune_unused_descriptions, 86400, True),
+    "quick_check": (quick_check, 86400, False),
+    "verify_balances": (repair_balances, VERIFY_INTERVAL, False),
+    "analytics_mirror": (refresh_mirror, 300, True),
+    "archive": (archive_closed_months, 86400, False),
+    "vacuum": (vacuum, 0, False),
+}
+
+
+def _interval(name: str, default: int) -> int:
+    if name == "verify_balances":
+        return default
+    return int(os.environ.get(f"FINANCE_MAINTENANCE_{name.upper()}_INTERVAL", str(default)))
+
+
+class MaintenanceScheduler:
+    """Runs TASKS on their intervals in a daemon thread, one task at a time, and records each run"""
+
+    def __init__(self, db, tasks: Dict[str, tuple] = TASKS, write_threshold: int = WRITE_THRESHOLD):
+        self.db = db
+        self.write_threshold = write_threshold
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        now = time.monotonic()
+        self._tasks = {}
+        for name, (fn, default_interval, after_writes) in tasks.items():
+            interval = _interval(name, default_interval)
+            self._tasks[name] = {
+                "fn": fn,
+                "interval_seconds": interval,
+                "after_writes": after_writes,
+                "next_run": now + interval if interval > 0 else None,
+                "rows_at_last_run": 0,
+                "runs": 0,
+                "last_run": None,
+                "last_duration_ms": None,
+                "last_result": None,
+                "last_error": None,
+            }
+
+    def _rows_changed(self) -> int:
+        return self.db.rows_changed()
+
+    def _shards(self, open_only: bool = False):
+        if not hasattr(self.db, "each_shard"):
+            return [(None, self.db)]
+        return self.db.open_shards() if open_only else self.db.each_shard()
+
+    def run_task(self, name: str) -> Dict[str, Any]:
+        """Run one task now (waiting for any task already running) and return its record"""
+        task = self._tasks[name]
+        with self._run_lock:
+            rows = self._rows_changed()
+            started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            start = time.perf_counter()
+            results, errors = {}, {}
+            for tenant, pool in self._shards():
+                database = tenant or "default"
+                try:
+                    results[database] = task["fn"](pool)
+                except Exception as e:
+                    errors[database] = str(e)
+                    print(f"Maintenance task {name} failed on the {database} database: {e}")
+            task["last_result"] = results
+            task["last_error"] = errors or None
+            task["last_duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            task["last_run"] = started_at
+            task["runs"] += 1
+            task["rows_at_last_run"] = rows
+            if task["interval_seconds"] > 0:
+                task["next_run"] = time.monotonic() + task["interval_seconds"]
+        return self._describe(name)
+
+    def _due(self, task: Dict[str, Any], now: float, rows: int) -> bool:
+        if task["next_run"] is not None and now >= task["next_run"]:
+            return True
+        return bool(task["after_writes"] and task["interval_seconds"] > 0
+                    and rows - task["rows_at_last_run"] >= self.write_threshold)
+
+    def _loop(self):
+        while not self._stop.wait(CHECK_INTERVAL):
+            rows = self._rows_changed()
+            for name, task in self._tasks.items():
+                if self._stop.is_set():
+                    return
+                if self._due(task, time.monotonic(), rows):
+                    self.run_task(name)
+
+    def start(self) -> "MaintenanceScheduler":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="maintenance", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _describe(self, name: str) -> Dict[str, Any]:
+        task = self._tasks[name]
+        next_in: Optional[float] = None
+        if task["next_run"] is not None:
+            next_in = round(max(0.0, task["next_run"] - time.monotonic()), 1)
+        return {
+            "task": name,
+            "interval_seconds": task["interval_seconds"],
+            "runs_after_large_writes": task["after_writes"],
+            "next_run_in_seconds": next_in,
+            "runs": task["runs"],
+            "last_run": task["last_run"],
+            "last_duration_ms": task["last_duration_ms"],
+            "last_result": task["last_result"],
+            "last_error": task["last_error"],
+        }
+
+    def status(self) -> Dict[str, Any]:
+        rows = self._rows_changed()
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "rows_written": rows,
+            "write_threshold": self.write_threshold,
+            "databases": {tenant or "default": database_info(pool) for tenant, pool in self._shards(open_only=True)},
+            "tasks": [self._describe(name) for name in self._tasks],
+        }
+
+    @property
+    def task_names(self):
+        return list(self._tasks)
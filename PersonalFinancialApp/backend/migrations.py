@@ -0,0 +1,851 @@
+import re
+import sqlite3
+import time
+from typing import Callable, List, Tuple
+
+import pandas as pd
+
+from ingest import normalize_dates, sql_values
+from search import fts5_available, search_index_exists
+from raw_store import ensure_raw_store, store_raw
+from balances import ensure_balance_triggers, recompute_balances
+from archive import ensure_archive_tables
+
+# Ordered, append-only list of schema migrations. Each migration runs once,
+# inside the same transaction that records its version in schema_version.
+# Never edit a migration that has shipped; add a new one instead. Indexes,
+# full-text tables and views are written out here as each migration created
+# them, not taken from indexes.py, search.py or ledger.py, which describe the
+# current schema and change with it.
+
+
+def _create_base_schema(conn: sqlite3.Connection):
+    """Core tables for banks, investments and credit cards"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS banks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bank_id INTEGER,
+            name TEXT NOT NULL,
+            account_type TEXT DEFAULT 'checking',
+            balance REAL DEFAULT 0.0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (bank_id) REFERENCES banks (id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER,
+            date TEXT,
+            description TEXT,
+            amount REAL,
+            note TEXT,
+            category TEXT DEFAULT 'Uncategorized',
+            raw_data TEXT,
+            FOREIGN KEY (account_id) REFERENCES accounts (id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS investment_accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            account_type TEXT DEFAULT 'brokerage',
+            custodian TEXT,
+            account_number TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS securities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            investment_account_id INTEGER,
+            symbol TEXT,
+            name TEXT,
+            security_type TEXT,
+            quantity REAL,
+            share_price REAL,
+            total_cost REAL,
+            market_value REAL,
+            unrealized_gain_loss REAL,
+            statement_date TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (investment_account_id) REFERENCES investment_accounts (id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS portfolio_statements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            investment_account_id INTEGER,
+            statement_date TEXT,
+            opening_balance REAL,
+            period_gain_loss REAL,
+            ending_balance REAL,
+            total_market_value REAL,
+            total_cost_basis REAL,
+            total_unrealized_gain_loss REAL,
+            statement_file_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (investment_account_id) REFERENCES investment_accounts (id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS credit_accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            account_type TEXT DEFAULT 'credit',
+            provider TEXT,
+            account_number TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS credit_statements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            credit_account_id INTEGER,
+            statement_date TEXT,
+            payment_due_date TEXT,
+            new_balance REAL,
+            minimum_payment_due REAL,
+            statement_file_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (credit_account_id) REFERENCES credit_accounts (id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS credit_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            credit_statement_id INTEGER,
+            transaction_date TEXT,
+            description TEXT,
+            amount REAL,
+            category TEXT DEFAULT 'Uncategorized',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (credit_statement_id) REFERENCES credit_statements (id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS category_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER,
+            pattern TEXT NOT NULL,
+            category TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (account_id) REFERENCES accounts (id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS predefined_categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category_path TEXT UNIQUE NOT NULL,
+            level_1 TEXT NOT NULL,
+            level_2 TEXT,
+            level_3 TEXT,
+            level_4 TEXT,
+            display_name TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+# Hierarchical categories shipped with the app:
+# (category_path, level_1, level_2, level_3, level_4, display_name)
+PREDEFINED_CATEGORIES = [
+    # Income
+    ("Income", "Income", None, None, None, "Income"),
+    ("Income:Salary", "Income", "Salary", None, None, "Salary & Wages"),
+    ("Income:Business", "Income", "Business", None, None, "Business Income"),
+    ("Income:Freelance", "Income", "Freelance", None, None, "Freelance/Contract"),
+    ("Income:Investments", "Income", "Investments", None, None, "Investments"),
+    ("Income:Investments:Dividends", "Income", "Investments", "Dividends", None, "Dividends"),
+    ("Income:Investments:Interest", "Income", "Investments", "Interest", None, "Interest"),
+    ("Income:Investments:CapitalGains", "Income", "Investments", "CapitalGains", None, "Capital Gains"),
+    ("Income:Investments:Rental", "Income", "Investments", "Rental", None, "Rental Income"),
+    ("Income:Government", "Income", "Government", None, None, "Government Benefits"),
+    ("Income:Other", "Income", "Other", None, None, "Other Income"),
+
+    # Expenses
+    ("Expenses", "Expenses", None, None, None, "Expenses"),
+
+    # Housing & Household
+    ("Expenses:Housing", "Expenses", "Housing", None, None, "Housing"),
+    ("Expenses:Housing:Rent", "Expenses", "Housing", "Rent", None, "Rent"),
+    ("Expenses:Housing:Mortgage", "Expenses", "Housing", "Mortgage", None, "Mortgage"),
+    ("Expenses:Housing:PropertyTax", "Expenses", "Housing", "PropertyTax", None, "Property Tax"),
+    ("Expenses:Housing:HomeInsurance", "Expenses", "Housing", "HomeInsurance", None, "Home Insurance"),
+    ("Expenses:Housing:Utilities", "Expenses", "Housing", "Utilities", None, "Utilities"),
+    ("Expenses:Housing:Utilities:Electricity", "Expenses", "Housing", "Utilities", "Electricity", "Electricity"),
+    ("Expenses:Housing:Utilities:Gas", "Expenses", "Housing", "Utilities", "Gas", "Gas"),
+    ("Expenses:Housing:Utilities:Water", "Expenses", "Housing", "Utilities", "Water", "Water & Sewer"),
+    ("Expenses:Housing:Utilities:Internet", "Expenses", "Housing", "Utilities", "Internet", "Internet"),
+    ("Expenses:Housing:Utilities:Cable", "Expenses", "Housing", "Utilities", "Cable", "Cable/Streaming"),
+    ("Expenses:Housing:Utilities:Phone", "Expenses", "Housing", "Utilities", "Phone", "Phone"),
+    ("Expenses:Housing:Maintenance", "Expenses", "Housing", "Maintenance", None, "Maintenance & Repairs"),
+    ("Expenses:Housing:Improvement", "Expenses", "Housing", "Improvement", None, "Home Improvement"),
+
+    ("Expenses:Household", "Expenses", "Household", None, None, "Household Items"),
+    ("Expenses:Household:Cleaning", "Expenses", "Household", "Cleaning", None, "Cleaning Supplies"),
+    ("Expenses:Household:Kitchen", "Expenses", "Household", "Kitchen", None, "Kitchen & Dining"),
+    ("Expenses:Household:Furniture", "Expenses", "Household", "Furniture", None, "Furniture"),
+    ("Expenses:Household:Decor", "Expenses", "Household", "Decor", None, "Home Decor"),
+    ("Expenses:Household:Gardening", "Expenses", "Household", "Gardening", None, "Gardening"),
+    ("Expenses:Household:Gardening:Plants", "Expenses", "Household", "Gardening", "Plants", "Seeds & Plants"),
+    ("Expenses:Household:Gardening:Tools", "Expenses", "Household", "Gardening", "Tools", "Tools & Equipment"),
+    ("Expenses:Household:Gardening:Supplies", "Expenses", "Household", "Gardening", "Supplies", "Fertilizer & Soil"),
+
+    # Food & Dining
+    ("Expenses:Food", "Expenses", "Food", None, None, "Food & Dining"),
+    ("Expenses:Food:Groceries", "Expenses", "Food", "Groceries", None, "Groceries"),
+    ("Expenses:Food:Groceries:Produce", "Expenses", "Food", "Groceries", "Produce", "Fresh Produce"),
+    ("Expenses:Food:Groceries:Meat", "Expenses", "Food", "Groceries", "Meat", "Meat & Seafood"),
+    ("Expenses:Food:Groceries:Dairy", "Expenses", "Food", "Groceries", "Dairy", "Dairy & Eggs"),
+    ("Expenses:Food:Groceries:Pantry", "Expenses", "Food", "Groceries", "Pantry", "Pantry Items"),
+    ("Expenses:Food:Groceries:Beverages", "Expenses", "Food", "Groceries", "Beverages", "Beverages"),
+    ("Expenses:Food:DiningOut", "Expenses", "Food", "DiningOut", None, "Dining Out"),
+    ("Expenses:Food:DiningOut:Restaurants", "Expenses", "Food", "DiningOut", "Restaurants", "Restaurants"),
+    ("Expenses:Food:DiningOut:FastFood", "Expenses", "Food", "DiningOut", "FastFood", "Fast Food"),
+    ("Expenses:Food:DiningOut:Coffee", "Expenses", "Food", "DiningOut", "Coffee", "Coffee Shops"),
+    ("Expenses:Food:DiningOut:Bars", "Expenses", "Food", "DiningOut", "Bars", "Bars & Nightlife"),
+    ("Expenses:Food:Delivery", "Expenses", "Food", "Delivery", None, "Food Delivery"),
+
+    # Transportation
+    ("Expenses:Transportation", "Expenses", "Transportation", None, None, "Transportation"),
+    ("Expenses:Transportation:Vehicle", "Expenses", "Transportation", "Vehicle", None, "Vehicle Expenses"),
+    ("Expenses:Transportation:Vehicle:Fuel", "Expenses", "Transportation", "Vehicle", "Fuel", "Fuel"),
+    ("Expenses:Transportation:Vehicle:Payment", "Expenses", "Transportation", "Vehicle", "Payment", "Car Payment"),
+    ("Expenses:Transportation:Vehicle:Insurance", "Expenses", "Transportation", "Vehicle", "Insurance", "Car Insurance"),
+    ("Expenses:Transportation:Vehicle:Maintenance", "Expenses", "Transportation", "Vehicle", "Maintenance", "Maintenance & Repairs"),
+    ("Expenses:Transportation:Vehicle:Registration", "Expenses", "Transportation", "Vehicle", "Registration", "Registration & Fees"),
+    ("Expenses:Transportation:PublicTransit", "Expenses", "Transportation", "PublicTransit", None, "Public Transportation"),
+    ("Expenses:Transportation:RideShare", "Expenses", "Transportation", "RideShare", None, "Ride Share"),
+    ("Expenses:Transportation:Parking", "Expenses", "Transportation", "Parking", None, "Parking"),
+    ("Expenses:Transportation:Travel", "Expenses", "Transportation", "Travel", None, "Travel"),
+
+    # Personal Care & Health
+    ("Expenses:Healthcare", "Expenses", "Healthcare", None, None, "Healthcare"),
+    ("Expenses:Healthcare:Doctor", "Expenses", "Healthcare", "Doctor", None, "Doctor Visits"),
+    ("Expenses:Healthcare:Dental", "Expenses", "Healthcare", "Dental", None, "Dental"),
+    ("Expenses:Healthcare:Vision", "Expenses", "Healthcare", "Vision", None, "Vision"),
+    ("Expenses:Healthcare:Pharmacy", "Expenses", "Healthcare", "Pharmacy", None, "Pharmacy"),
+    ("Expenses:Healthcare:Insurance", "Expenses", "Healthcare", "Insurance", None, "Health Insurance"),
+    ("Expenses:Healthcare:Mental", "Expenses", "Healthcare", "Mental", None, "Mental Health"),
+
+    ("Expenses:PersonalCare", "Expenses", "PersonalCare", None, None, "Personal Care"),
+    ("Expenses:PersonalCare:Hair", "Expenses", "PersonalCare", "Hair", None, "Haircare"),
+    ("Expenses:PersonalCare:Skincare", "Expenses", "PersonalCare", "Skincare", None, "Skincare"),
+    ("Expenses:PersonalCare:Clothing", "Expenses", "PersonalCare", "Clothing", None, "Clothing"),
+    ("Expenses:PersonalCare:Clothing:Work", "Expenses", "PersonalCare", "Clothing", "Work", "Work Clothes"),
+    ("Expenses:PersonalCare:Clothing:Casual", "Expenses", "PersonalCare", "Clothing", "Casual", "Casual Wear"),
+    ("Expenses:PersonalCare:Clothing:Shoes", "Expenses", "PersonalCare", "Clothing", "Shoes", "Shoes"),
+    ("Expenses:PersonalCare:Clothing:Accessories", "Expenses", "PersonalCare", "Clothing", "Accessories", "Accessories"),
+    ("Expenses:PersonalCare:Fitness", "Expenses", "PersonalCare", "Fitness", None, "Fitness & Gym"),
+
+    # Family & Dependents
+    ("Expenses:Family", "Expenses", "Family", None, None, "Family & Dependents"),
+    ("Expenses:Family:Childcare", "Expenses", "Family", "Childcare", None, "Childcare"),
+    ("Expenses:Family:ChildEducation", "Expenses", "Family", "ChildEducation", None, "Child Education"),
+    ("Expenses:Family:ChildActivities", "Expenses", "Family", "ChildActivities", None, "Child Activities"),
+    ("Expenses:Family:Support", "Expenses", "Family", "Support", None, "Family Support"),
+    ("Expenses:Family:Pets", "Expenses", "Family", "Pets", None, "Pet Care"),
+
+    # Entertainment & Lifestyle
+    ("Expenses:Entertainment", "Expenses", "Entertainment", None, None, "Entertainment & Lifestyle"),
+    ("Expenses:Entertainment:Movies", "Expenses", "Entertainment", "Movies", None, "Movies & Theater"),
+    ("Expenses:Entertainment:Concerts", "Expenses", "Entertainment", "Concerts", None, "Concerts & Events"),
+    ("Expenses:Entertainment:Hobbies", "Expenses", "Entertainment", "Hobbies", None, "Hobbies"),
+    ("Expenses:Entertainment:Sports", "Expenses", "Entertainment", "Sports", None, "Sports & Recreation"),
+    ("Expenses:Entertainment:Subscriptions", "Expenses", "Entertainment", "Subscriptions", None, "Subscriptions"),
+    ("Expenses:Entertainment:Subscriptions:Streaming", "Expenses", "Entertainment", "Subscriptions", "Streaming", "Streaming Services"),
+    ("Expenses:Entertainment:Subscriptions:Software", "Expenses", "Entertainment", "Subscriptions", "Software", "Software"),
+    ("Expenses:Entertainment:Subscriptions:Magazines", "Expenses", "Entertainment", "Subscriptions", "Magazines", "Magazines"),
+    ("Expenses:Entertainment:Vacation", "Expenses", "Entertainment", "Vacation", None, "Travel & Vacation"),
+
+    # Professional & Education
+    ("Expenses:Professional", "Expenses", "Professional", None, None, "Professional & Education"),
+    ("Expenses:Professional:Development", "Expenses", "Professional", "Development", None, "Professional Development"),
+    ("Expenses:Professional:Education", "Expenses", "Professional", "Education", None, "Education & Training"),
+    ("Expenses:Professional:WorkExpenses", "Expenses", "Professional", "WorkExpenses", None, "Work Expenses"),
+    ("Expenses:Professional:Services", "Expenses", "Professional", "Services", None, "Professional Services"),
+
+    # Financial & Administrative
+    ("Expenses:Financial", "Expenses", "Financial", None, None, "Financial & Administrative"),
+    ("Expenses:Financial:BankFees", "Expenses", "Financial", "BankFees", None, "Bank Fees"),
+    ("Expenses:Financial:CreditCardFees", "Expenses", "Financial", "CreditCardFees", None, "Credit Card Fees"),
+    ("Expenses:Financial:ProfessionalServices", "Expenses", "Financial", "ProfessionalServices", None, "Professional Services"),
+    ("Expenses:Financial:ProfessionalServices:Legal", "Expenses", "Financial", "ProfessionalServices", "Legal", "Legal"),
+    ("Expenses:Financial:ProfessionalServices:Accounting", "Expenses", "Financial", "ProfessionalServices", "Accounting", "Accounting"),
+    ("Expenses:Financial:ProfessionalServices:Financial", "Expenses", "Financial", "ProfessionalServices", "Financial", "Financial Planning"),
+    ("Expenses:Financial:Insurance", "Expenses", "Financial", "Insurance", None, "Insurance"),
+    ("Expenses:Financial:Insurance:Life", "Expenses", "Financial", "Insurance", "Life", "Life Insurance"),
+    ("Expenses:Financial:Insurance:Disability", "Expenses", "Financial", "Insurance", "Disability", "Disability Insurance"),
+    ("Expenses:Financial:Taxes", "Expenses", "Financial", "Taxes", None, "Taxes"),
+
+    # Miscellaneous
+    ("Expenses:Miscellaneous", "Expenses", "Miscellaneous", None, None, "Miscellaneous"),
+    ("Expenses:Miscellaneous:Donations", "Expenses", "Miscellaneous", "Donations", None, "Donations"),
+    ("Expenses:Miscellaneous:Fees", "Expenses", "Miscellaneous", "Fees", None, "Fees"),
+    ("Expenses:Miscellaneous:Other", "Expenses", "Miscellaneous", "Other", None, "Other"),
+
+    # Transfers
+    ("Transfers", "Transfers", None, None, None, "Transfers"),
+    ("Transfers:BankTransfer", "Transfers", "BankTransfer", None, None, "Bank Transfer"),
+    ("Transfers:InternalTransfer", "Transfers", "InternalTransfer", None, None, "Internal Transfer"),
+    ("Transfers:CreditCardPayment", "Transfers", "CreditCardPayment", None, None, "Credit Card Payment"),
+
+    # Credit Card Specific Categories
+    ("Expenses:CreditCard", "Expenses", "CreditCard", None, None, "Credit Card Expenses"),
+    ("Expenses:CreditCard:AnnualFee", "Expenses", "CreditCard", "AnnualFee", None, "Annual Fee"),
+    ("Expenses:CreditCard:LateFee", "Expenses", "CreditCard", "LateFee", None, "Late Fee"),
+    ("Expenses:CreditCard:Interest", "Expenses", "CreditCard", "Interest", None, "Interest Charge"),
+    ("Expenses:CreditCard:ForeignTransaction", "Expenses", "CreditCard", "ForeignTransaction", None, "Foreign Transaction Fee"),
+    ("Expenses:CreditCard:BalanceTransfer", "Expenses", "CreditCard", "BalanceTransfer", None, "Balance Transfer Fee"),
+
+    # Deposits
+    ("Deposits", "Deposits", None, None, None, "Deposits"),
+    ("Deposits:CashDeposit", "Deposits", "CashDeposit", None, None, "Cash Deposit"),
+    ("Deposits:CheckDeposit", "Deposits", "CheckDeposit", None, None, "Check Deposit"),
+    ("Deposits:Refund", "Deposits", "Refund", None, None, "Refund"),
+
+    # Savings and Investments
+    ("SavingsAndInvestments", "SavingsAndInvestments", None, None, None, "Savings & Investments"),
+    ("SavingsAndInvestments:EmergencyFund", "SavingsAndInvestments", "EmergencyFund", None, None, "Emergency Fund"),
+    ("SavingsAndInvestments:Retirement", "SavingsAndInvestments", "Retirement", None, None, "Retirement"),
+    ("SavingsAndInvestments:Brokerage", "SavingsAndInvestments", "Brokerage", None, None, "Brokerage"),
+]
+
+
+def _seed_predefined_categories(conn: sqlite3.Connection):
+    """Insert the shipped categories that are not present yet (custom ones are left alone)"""
+    conn.executemany("""
+        INSERT OR IGNORE INTO predefined_categories (category_path, level_1, level_2, level_3, level_4, display_name)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, PREDEFINED_CATEGORIES)
+
+
+def _create_indexes(conn: sqlite3.Connection, statements: List[str]):
+    """Run CREATE INDEX statements, replacing any index of the same name, and analyze each index"""
+    for sql in statements:
+        name = sql.split()[2]
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.execute(sql)
+        conn.execute(f"ANALYZE {name}")
+
+
+def _create_managed_indexes(conn: sqlite3.Connection):
+    """Secondary indexes for the queries in main.py and backup_manager.py"""
+    _create_indexes(conn, [
+        "CREATE INDEX idx_transactions_account_date ON transactions (account_id, date, amount)",
+        "CREATE INDEX idx_transactions_account_category ON transactions (account_id, category, amount)",
+        "CREATE INDEX idx_transactions_uncategorized ON transactions (account_id) "
+        "WHERE category = 'Uncategorized' OR category IS NULL",
+        "CREATE INDEX idx_accounts_bank ON accounts (bank_id)",
+        "CREATE INDEX idx_category_rules_account ON category_rules (account_id, created_at)",
+        "CREATE INDEX idx_credit_statements_account_date ON credit_statements (credit_account_id, statement_date)",
+        "CREATE INDEX idx_credit_transactions_statement ON credit_transactions (credit_statement_id, transaction_date)",
+        "CREATE INDEX idx_portfolio_statements_account_date ON portfolio_statements (investment_account_id, statement_date)",
+        "CREATE INDEX idx_securities_account_date_symbol ON securities (investment_account_id, statement_date, symbol)",
+        "CREATE INDEX idx_securities_account_symbol_date ON securities (investment_account_id, symbol, statement_date)",
+    ])
+
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, definition: str):
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+BACKFILL_CHUNK_SIZE = 50000
+
+
+def _backfill_dates(conn: sqlite3.Connection, select_sql: str, params: tuple, update_sql: str,
+                    date_format=None):
+    """Normalize one group of rows in id-ordered chunks; returns the date format that was used.
+
+    ``select_sql`` must select ``(id, date)`` with a trailing ``AND <id column> > ?``
+    condition and ``ORDER BY id LIMIT ?`` so chunks can be walked by key.
+    """
+    last_id = 0
+    while True:
+        rows = conn.execute(select_sql, params + (last_id, BACKFILL_CHUNK_SIZE)).fetchall()
+        if not rows:
+            return date_format
+        ids = [row[0] for row in rows]
+        raw_dates = pd.Series([row[1] for row in rows], dtype=object)
+        iso_dates, day_numbers, date_format = normalize_dates(raw_dates, date_format)
+        conn.executemany(update_sql, zip(sql_values(iso_dates), sql_values(day_numbers), ids))
+        last_id = ids[-1]
+
+
+def _normalize_transaction_dates(conn: sqlite3.Connection):
+    """ISO-8601 dates plus integer day numbers (days since 1970-01-01) for range scans"""
+    _add_column(conn, "transactions", "day_number", "INTEGER")
+    _add_column(conn, "credit_transactions", "day_number", "INTEGER")
+    _add_column(conn, "accounts", "date_format", "TEXT")
+
+    # Bank transactions: infer the format per account and remember it for future imports
+    account_ids = [row[0] for row in conn.execute("SELECT DISTINCT account_id FROM transactions").fetchall()]
+    for account_id in account_ids:
+        date_format = _backfill_dates(
+            conn,
+            "SELECT id, date FROM transactions WHERE account_id IS ? AND id > ? ORDER BY id LIMIT ?", (account_id,),
+            "UPDATE transactions SET date = COALESCE(?, date), day_number = ? WHERE id = ?",
+        )
+        if account_id is not None and date_format:
+            conn.execute("UPDATE accounts SET date_format = ? WHERE id = ?", (date_format, account_id))
+
+    credit_account_ids = [row[0] for row in conn.execute("SELECT DISTINCT credit_account_id FROM credit_statements").fetchall()]
+    for credit_account_id in credit_account_ids:
+        _backfill_dates(
+            conn,
+            """SELECT ct.id, ct.transaction_date FROM credit_transactions ct
+               JOIN credit_statements cs ON cs.id = ct.credit_statement_id
+               WHERE cs.credit_account_id IS ? AND ct.id > ? ORDER BY ct.id LIMIT ?""", (credit_account_id,),
+            "UPDATE credit_transactions SET transaction_date = COALESCE(?, transaction_date), day_number = ? WHERE id = ?",
+        )
+
+    conn.execute("DROP INDEX IF EXISTS idx_transactions_account_date")
+    _create_indexes(conn, [
+        "CREATE INDEX idx_transactions_account_day ON transactions (account_id, day_number, amount)",
+    ])
+
+
+# (table, REAL dollars column, INTEGER cents column)
+_CENTS_COLUMNS = [
+    ("transactions", "amount", "amount_cents"),
+    ("credit_transactions", "amount", "amount_cents"),
+    ("accounts", "balance", "balance_cents"),
+]
+
+
+def _convert_amounts_to_cents(conn: sqlite3.Connection):
+    """Store money as integer cents so sums are exact"""
+    for table, dollars, cents in _CENTS_COLUMNS:
+        _add_column(conn, table, cents, "INTEGER NOT NULL DEFAULT 0")
+        conn.execute(f"UPDATE {table} SET {cents} = COALESCE(CAST(ROUND({dollars} * 100) AS INTEGER), 0)")
+    # Move the indexes onto the cents columns before the old ones are dropped
+    _create_indexes(conn, [
+        "CREATE INDEX idx_transactions_account_day ON transactions (account_id, day_number, amount_cents)",
+        "CREATE INDEX idx_transactions_account_category ON transactions (account_id, category, amount_cents)",
+    ])
+    for table, dollars, _ in _CENTS_COLUMNS:
+        conn.execute(f"ALTER TABLE {table} DROP COLUMN {dollars}")
+
+
+def _create_fts(conn: sqlite3.Connection, table: str, schema: List[str]) -> bool:
+    """Create an FTS5 table with its triggers and index the existing rows (False without FTS5)"""
+    if search_index_exists(conn, table):
+        return True
+    if not fts5_available(conn):
+        return False
+    for sql in schema:
+        conn.execute(sql)
+    conn.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+    return True
+
+
+def _create_search_index(conn: sqlite3.Connection):
+    """External-content full-text index over transaction descriptions and notes"""
+    if not _create_fts(conn, "transactions_fts", [
+        """CREATE VIRTUAL TABLE transactions_fts USING fts5(
+            description, note,
+            content='transactions', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        """CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO transactions_fts (rowid, description, note) VALUES (new.id, new.description, new.note);
+        END""",
+        """CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description, note)
+            VALUES ('delete', old.id, old.description, old.note);
+        END""",
+        """CREATE TRIGGER transactions_fts_update AFTER UPDATE OF description, note ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description, note)
+            VALUES ('delete', old.id, old.description, old.note);
+            INSERT INTO transactions_fts (rowid, description, note) VALUES (new.id, new.description, new.note);
+        END""",
+    ]):
+        print("⚠️  SQLite was built without FTS5; /transactions/search is disabled")
+
+
+def _move_raw_data(conn: sqlite3.Connection):
+    """Move the original CSV rows out of transactions into compressed side storage"""
+    ensure_raw_store(conn)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(transactions)")}
+    if "raw_data" not in columns:
+        return
+
+    raw_bytes = conn.execute("SELECT COALESCE(SUM(LENGTH(CAST(raw_data AS BLOB))), 0) FROM transactions").fetchone()[0]
+    moved, last_id = 0, 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, raw_data FROM transactions WHERE id > ? ORDER BY id LIMIT ?", (last_id, BACKFILL_CHUNK_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        moved += store_raw(conn, rows)
+        last_id = rows[-1][0]
+    conn.execute("ALTER TABLE transactions DROP COLUMN raw_data")
+
+    stored_bytes = conn.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM transaction_raw").fetchone()[0]
+    print(f"Moved raw data of {moved} transactions: {raw_bytes / 1e6:.1f} MB -> {stored_bytes / 1e6:.1f} MB compressed "
+          "(run VACUUM to return the freed pages to the filesystem)")
+
+
+def _maintain_balances(conn: sqlite3.Connection):
+    """Account balances kept by triggers; stored values are reset to the raw transaction sum"""
+    ensure_balance_triggers(conn)
+    recompute_balances(conn, include_archive=False)
+
+
+def _order_day_index_by_id(conn: sqlite3.Connection):
+    """id breaks ties within a day, so ORDER BY day_number, id needs no sort"""
+    _create_indexes(conn, [
+        "CREATE INDEX idx_transactions_account_day ON transactions (account_id, day_number, id, amount_cents)",
+    ])
+
+
+def _create_keyset_indexes(conn: sqlite3.Connection):
+    """Listings filtered by category or sorted by amount, paged on (key, id)"""
+    _create_indexes(conn, [
+        "CREATE INDEX idx_transactions_account_category "
+        "ON transactions (account_id, category, day_number, id, amount_cents)",
+        "CREATE INDEX idx_transactions_account_amount ON transactions (account_id, amount_cents, id, day_number)",
+    ])
+
+
+# Categorizing through the ledger view updates whichever table the row lives in
+_LEDGER_CATEGORY_TRIGGER = """CREATE TRIGGER ledger_category_update INSTEAD OF UPDATE OF category ON ledger BEGIN
+    UPDATE transactions SET category = new.category WHERE old.source = 'bank' AND id = old.id;
+    UPDATE credit_transactions SET category = new.category WHERE old.source = 'credit' AND id = old.id;
+END"""
+
+
+def _create_ledger(conn: sqlite3.Connection):
+    """Unified ledger view over bank and credit card transactions, with its indexes and search"""
+    conn.execute("""
+        CREATE VIEW ledger AS
+            SELECT 'bank' AS source, t.id AS id, t.account_id AS account_id, NULL AS statement_id,
+                   t.date AS date, t.day_number AS day_number, t.description AS description,
+                   t.amount_cents AS amount_cents, t.note AS note, t.category AS category
+            FROM transactions t
+            UNION ALL
+            SELECT 'credit', ct.id, cs.credit_account_id, ct.credit_statement_id,
+                   ct.transaction_date, ct.day_number, ct.description,
+                   ct.amount_cents, NULL, ct.category
+            FROM credit_transactions ct
+            JOIN credit_statements cs ON cs.id = ct.credit_statement_id
+    """)
+    conn.execute(_LEDGER_CATEGORY_TRIGGER)
+    _create_fts(conn, "credit_transactions_fts", [
+        """CREATE VIRTUAL TABLE credit_transactions_fts USING fts5(
+            description,
+            content='credit_transactions', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        """CREATE TRIGGER credit_transactions_fts_insert AFTER INSERT ON credit_transactions BEGIN
+            INSERT INTO credit_transactions_fts (rowid, description) VALUES (new.id, new.description);
+        END""",
+        """CREATE TRIGGER credit_transactions_fts_delete AFTER DELETE ON credit_transactions BEGIN
+            INSERT INTO credit_transactions_fts (credit_transactions_fts, rowid, description)
+            VALUES ('delete', old.id, old.description);
+        END""",
+        """CREATE TRIGGER credit_transactions_fts_update AFTER UPDATE OF description ON credit_transactions BEGIN
+            INSERT INTO credit_transactions_fts (credit_transactions_fts, rowid, description)
+            VALUES ('delete', old.id, old.description);
+            INSERT INTO credit_transactions_fts (rowid, description) VALUES (new.id, new.description);
+        END""",
+    ])
+    _create_indexes(conn, [
+        "CREATE INDEX idx_transactions_day ON transactions (day_number)",
+        "CREATE INDEX idx_credit_transactions_day ON credit_transactions (day_number)",
+    ])
+
+
+_REFERENCES = re.compile(r"(REFERENCES\s+\w+\s*\(\s*\w+\s*\))(?!\s*ON\s+DELETE)", re.IGNORECASE)
+_TABLE_NAME = re.compile(r"^CREATE\s+TABLE\s+\"?\w+\"?", re.IGNORECASE)
+
+
+def _rebuild_table(conn: sqlite3.Connection, name: str, create_sql: str):
+    """Replace a table by one created from ``create_sql``, keeping its rows, indexes and AUTOINCREMENT counter.
+
+    Steps 4-8 of SQLite's generalized ALTER TABLE procedure; foreign keys
+    must be off, and views and triggers that mention the table dropped.
+    """
+    indexes = [sql for (sql,) in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (name,)
+    )]
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (name,)).fetchone()
+    conn.execute(_TABLE_NAME.sub(f"CREATE TABLE new_{name}", create_sql, count=1))
+    conn.execute(f"INSERT INTO new_{name} SELECT * FROM {name}")
+    conn.execute(f"DROP TABLE {name}")
+    conn.execute(f"ALTER TABLE new_{name} RENAME TO {name}")
+    for sql in indexes:
+        conn.execute(sql)
+    if sequence:
+        conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (sequence[0], name))
+
+
+def _cascade_foreign_keys(conn: sqlite3.Connection):
+    """ON DELETE CASCADE on every foreign key, and deleted_at for banks/accounts awaiting a purge"""
+    _add_column(conn, "banks", "deleted_at", "TIMESTAMP")
+    _add_column(conn, "accounts", "deleted_at", "TIMESTAMP")
+
+    # SQLite cannot alter a foreign key, so each affected table is rebuilt.
+    # Views and triggers would stop the renames while a table they read is
+    # missing; they are dropped first and recreated unchanged at the end.
+    tables = [(name, sql) for name, sql in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND sql LIKE '%REFERENCES%'"
+    ).fetchall() if _REFERENCES.search(sql)]
+    dependents = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE type IN ('view', 'trigger') AND sql IS NOT NULL"
+    ).fetchall()
+    for kind, name, _sql in dependents:
+        conn.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+    for name, sql in tables:
+        _rebuild_table(conn, name, _REFERENCES.sub(r"\1 ON DELETE CASCADE", sql))
+    for _kind, _name, sql in dependents:
+        conn.execute(sql)
+
+    # Rows whose parent was deleted before foreign keys were enforced could
+    # never be reached; remove them, then any rows that orphans in turn
+    removed = {}
+    while True:
+        orphans = {}
+        for table, rowid, _parent, _fk in conn.execute("PRAGMA foreign_key_check").fetchall():
+            orphans.setdefault(table, []).append(rowid)
+        if not orphans:
+            break
+        for table, rowids in orphans.items():
+            for start in range(0, len(rowids), 500):
+                chunk = rowids[start:start + 500]
+                conn.execute(f"DELETE FROM {table} WHERE rowid IN ({','.join('?' * len(chunk))})", chunk)
+            removed[table] = removed.get(table, 0) + len(rowids)
+    if removed:
+        print(f"🧹 Removed rows whose parent no longer existed: {removed}")
+
+
+def _intern_descriptions(conn: sqlite3.Connection):
+    """Replace the description text columns by ids into one deduplicated descriptions table"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS descriptions (
+            id INTEGER PRIMARY KEY,
+            text TEXT NOT NULL UNIQUE
+        )
+    """)
+    text_bytes = 0
+    for table in ("transactions", "credit_transactions"):
+        _add_column(conn, table, "description_id", "INTEGER REFERENCES descriptions (id)")
+        text_bytes += conn.execute(
+            f"SELECT COALESCE(SUM(LENGTH(CAST(description AS BLOB))), 0) FROM {table}"
+        ).fetchone()[0]
+        conn.execute(f"""
+            INSERT OR IGNORE INTO descriptions (text)
+            SELECT DISTINCT description FROM {table} WHERE description IS NOT NULL
+        """)
+        conn.execute(f"""
+            UPDATE {table} SET description_id = (SELECT id FROM descriptions WHERE text = {table}.description)
+            WHERE description IS NOT NULL
+        """)
+
+    # The search indexes and the ledger view read the text columns, so they
+    # are dropped first and recreated on top of the ids; the full-text content
+    # becomes a view resolving each row's description text
+    for table in ("transactions", "credit_transactions"):
+        for event in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{event}")
+        if search_index_exists(conn, f"{table}_fts"):
+            conn.execute(f"DROP TABLE {table}_fts")
+    conn.execute("DROP VIEW IF EXISTS ledger")
+    for table in ("transactions", "credit_transactions"):
+        conn.execute(f"ALTER TABLE {table} DROP COLUMN description")
+
+    conn.execute("""
+        CREATE VIEW transactions_text AS
+            SELECT t.id AS id, (SELECT text FROM descriptions WHERE id = t.description_id) AS description,
+                   t.note AS note
+            FROM transactions t
+    """)
+    conn.execute("""
+        CREATE VIEW credit_transactions_text AS
+            SELECT ct.id AS id, (SELECT text FROM descriptions WHERE id = ct.description_id) AS description
+            FROM credit_transactions ct
+    """)
+    _create_fts(conn, "transactions_fts", [
+        """CREATE VIRTUAL TABLE transactions_fts USING fts5(
+            description, note,
+            content='transactions_text', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        """CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO transactions_fts (rowid, description, note)
+            VALUES (new.id, (SELECT text FROM descriptions WHERE id = new.description_id), new.note);
+        END""",
+        """CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description, note)
+            VALUES ('delete', old.id, (SELECT text FROM descriptions WHERE id = old.description_id), old.note);
+        END""",
+        """CREATE TRIGGER transactions_fts_update AFTER UPDATE OF description_id, note ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description, note)
+            VALUES ('delete', old.id, (SELECT text FROM descriptions WHERE id = old.description_id), old.note);
+            INSERT INTO transactions_fts (rowid, description, note)
+            VALUES (new.id, (SELECT text FROM descriptions WHERE id = new.description_id), new.note);
+        END""",
+    ])
+    _create_fts(conn, "credit_transactions_fts", [
+        """CREATE VIRTUAL TABLE credit_transactions_fts USING fts5(
+            description,
+            content='credit_transactions_text', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        """CREATE TRIGGER credit_transactions_fts_insert AFTER INSERT ON credit_transactions BEGIN
+            INSERT INTO credit_transactions_fts (rowid, description)
+            VALUES (new.id, (SELECT text FROM descriptions WHERE id = new.description_id));
+        END""",
+        """CREATE TRIGGER credit_transactions_fts_delete AFTER DELETE ON credit_transactions BEGIN
+            INSERT INTO credit_transactions_fts (credit_transactions_fts, rowid, description)
+            VALUES ('delete', old.id, (SELECT text FROM descriptions WHERE id = old.description_id));
+        END""",
+        """CREATE TRIGGER credit_transactions_fts_update AFTER UPDATE OF description_id ON credit_transactions BEGIN
+            INSERT INTO credit_transactions_fts (credit_transactions_fts, rowid, description)
+            VALUES ('delete', old.id, (SELECT text FROM descriptions WHERE id = old.description_id));
+            INSERT INTO credit_transactions_fts (rowid, description)
+            VALUES (new.id, (SELECT text FROM descriptions WHERE id = new.description_id));
+        END""",
+    ])
+    conn.execute("""
+        CREATE VIEW ledger AS
+            SELECT 'bank' AS source, t.id AS id, t.account_id AS account_id, NULL AS statement_id,
+                   t.date AS date, t.day_number AS day_number,
+                   (SELECT text FROM descriptions WHERE id = t.description_id) AS description,
+                   t.amount_cents AS amount_cents, t.note AS note, t.category AS category
+            FROM transactions t
+            UNION ALL
+            SELECT 'credit', ct.id, cs.credit_account_id, ct.credit_statement_id,
+                   ct.transaction_date, ct.day_number,
+                   (SELECT text FROM descriptions WHERE id = ct.description_id),
+                   ct.amount_cents, NULL, ct.category
+            FROM credit_transactions ct
+            JOIN credit_statements cs ON cs.id = ct.credit_statement_id
+    """)
+    conn.execute(_LEDGER_CATEGORY_TRIGGER)
+    _create_indexes(conn, [
+        "CREATE INDEX idx_transactions_description ON transactions (description_id)",
+        "CREATE INDEX idx_credit_transactions_description ON credit_transactions (description_id)",
+    ])
+
+    distinct, stored_bytes = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(text AS BLOB))), 0) FROM descriptions"
+    ).fetchone()
+    print(f"Interned descriptions: {text_bytes / 1e6:.1f} MB of text -> {distinct} distinct "
+          f"({stored_bytes / 1e6:.1f} MB) (run VACUUM to return the freed pages to the filesystem)")
+
+
+def _restore_archive_day_index(conn: sqlite3.Connection):
+    """Recreate the archive index that an earlier form of migration 14 dropped as unmanaged"""
+    _create_indexes(conn, [
+        "CREATE INDEX idx_transaction_archive_days_account_day "
+        "ON transaction_archive_days (account_id, day_number, category, amount_cents)",
+    ])
+
+
+def _pausable_search_trigger(conn: sqlite3.Connection):
+    """Bulk inserts pause the full-text insert trigger with a row instead of dropping it"""
+    conn.execute("CREATE TABLE IF NOT EXISTS transactions_fts_paused (id INTEGER PRIMARY KEY)")
+    if not search_index_exists(conn):
+        return
+    conn.execute("DROP TRIGGER IF EXISTS transactions_fts_insert")
+    conn.execute("""
+        CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions
+        WHEN NOT EXISTS (SELECT 1 FROM transactions_fts_paused) BEGIN
+            INSERT INTO transactions_fts (rowid, description, note)
+            VALUES (new.id, (SELECT text FROM descriptions WHERE id = new.description_id), new.note);
+        END
+    """)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "base schema", _create_base_schema),
+    (2, "seed predefined categories", _seed_predefined_categories),
+    (3, "managed indexes", _create_managed_indexes),
+    (4, "normalized transaction dates", _normalize_transaction_dates),
+    (5, "integer cents amounts", _convert_amounts_to_cents),
+    (6, "transaction full-text search", _create_search_index),
+    (7, "compressed raw data side table", _move_raw_data),
+    (8, "trigger-maintained account balances", _maintain_balances),
+    (9, "day index ordered by id for running balances", _order_day_index_by_id),
+    (10, "keyset indexes for transaction listings", _create_keyset_indexes),
+    (11, "unified ledger", _create_ledger),
+    (12, "cascading foreign keys", _cascade_foreign_keys),
+    (13, "transaction archive catalog", ensure_archive_tables),
+    (14, "interned transaction descriptions", _intern_descriptions),
+    (15, "archive day summary index", _restore_archive_day_index),
+    (16, "pausable full-text insert trigger", _pausable_search_trigger),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """Highest applied migration, or 0 for a database that has never been migrated"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not exists:
+        return 0
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def run_migrations(db) -> List[str]:
+    """Apply pending migrations and return their names.
+
+    When the database is current this is one indexed lookup. Otherwise the
+    migrations run under BEGIN IMMEDIATE, so workers booting at the same time
+    wait for each other instead of applying the same migration twice.
+
+    Foreign keys are off while they run, so a migration can rebuild a table
+    (PRAGMA foreign_keys cannot change inside a transaction, hence the
+    exclusive writer), and checked with PRAGMA foreign_key_check before the
+    commit.
+    """
+    with db.connection() as conn:
+        if current_version(conn) >= LATEST_VERSION:
+            return []
+
+    applied = []
+    with db.exclusive() as conn:
+        conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Re-check now that we hold the write lock; another worker may have finished first
+            version = current_version(conn)
+            for number, name, migration in MIGRATIONS:
+                if number <= version:
+                    continue
+                start = time.perf_counter()
+                migration(conn)
+                conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (number, name))
+                applied.append(name)
+                print(f"Applied migration {number} ({name}) in {time.perf_counter() - start:.2f}s")
+            violations = conn.execute("PRAGMA foreign_key_check").fetchmany(10)
+            if violations:
+                raise sqlite3.IntegrityError(f"Migrations left rows without a parent: {violations}")
+            conn.execute("COMMIT")
+        finally:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            conn.execute("PRAGMA foreign_keys = ON")
+    return applied
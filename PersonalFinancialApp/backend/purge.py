@@ -0,0 +1,108 @@
+import os
+import threading
+from typing import Any, Dict, List
+
+from raw_store import prune_dictionaries
+
+# Deleting an account with millions of transactions in one statement would
+# hold the write lock (and the writer queue) for the whole delete. Large
+# accounts are instead hidden at once (deleted_at is set, so listings skip
+# them) and emptied by a background thread in batches, each its own short
+# write transaction, so other writes interleave between batches. Once an
+# account is empty its row is deleted and ON DELETE CASCADE removes the rest;
+# compression dictionaries left without raw rows are deleted at the end.
+PURGE_BATCH_SIZE = int(os.environ.get("FINANCE_PURGE_BATCH_SIZE", "5000"))
+
+# Bank accounts waiting for the purge; cross-account queries leave them out
+HIDDEN_ACCOUNTS_SQL = "SELECT id FROM accounts WHERE deleted_at IS NOT NULL"
+
+_wake = threading.Event()
+_lock = threading.Lock()
+_thread = None
+_pending: List[Any] = []  # pools (one per household database) with purges to finish
+
+
+def hide_account(conn, account_id: int):
+    conn.execute("UPDATE accounts SET deleted_at = CURRENT_TIMESTAMP WHERE id = ?", (account_id,))
+
+
+def hide_bank(conn, bank_id: int):
+    """Hide a bank and its accounts; the name is released at once so it can be reused"""
+    conn.execute("""
+        UPDATE banks SET deleted_at = CURRENT_TIMESTAMP, name = name || ' (deleting #' || id || ')'
+        WHERE id = ?
+    """, (bank_id,))
+    conn.execute("UPDATE accounts SET deleted_at = CURRENT_TIMESTAMP WHERE bank_id = ?", (bank_id,))
+
+
+def purge_batch(conn, account_id: int, batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Delete up to ``batch_size`` of an account's transactions; returns how many were deleted"""
+    return conn.execute("""
+        DELETE FROM transactions WHERE id IN (
+            SELECT id FROM transactions WHERE account_id = ? LIMIT ?
+        )
+    """, (account_id, batch_size)).rowcount
+
+
+def purge_hidden(db, batch_size: int = PURGE_BATCH_SIZE) -> Dict[str, Any]:
+    """Empty and delete every hidden account, then every hidden bank with no accounts left"""
+    with db.connection() as conn:
+        account_ids: List[int] = [row[0] for row in conn.execute(
+            "SELECT id FROM accounts WHERE deleted_at IS NOT NULL ORDER BY id"
+        )]
+
+    purged = {"accounts": 0, "banks": 0, "transactions": 0, "dictionaries": 0}
+    for account_id in account_ids:
+        while True:
+            with db.transaction() as conn:
+                deleted = purge_batch(conn, account_id, batch_size)
+                if deleted < batch_size:
+                    conn.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
+            purged["transactions"] += deleted
+            if deleted < batch_size:
+                purged["accounts"] += 1
+                break
+
+    with db.transaction() as conn:
+        purged["banks"] = conn.execute("""
+            DELETE FROM banks WHERE deleted_at IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM accounts a WHERE a.bank_id = banks.id)
+        """).rowcount
+        if purged["transactions"]:
+            purged["dictionaries"] = prune_dictionaries(conn)
+    return purged
+
+
+def schedule_purge(db):
+    """Queue a database (a ConnectionPool) for the background purge thread, starting it on first use.
+
+    The pool is retained until its purge runs, so an evicted household pool stays open for it.
+    """
+    global _thread
+    with _lock:
+        if not any(pool is db for pool in _pending):
+            db.retain()
+            _pending.append(db)
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="purge", daemon=True)
+            _thread.start()
+    _wake.set()
+
+
+def _run():
+    while True:
+        _wake.wait()
+        _wake.clear()
+        with _lock:
+            pools = list(_pending)
+            _pending.clear()
+        for db in pools:
+            try:
+                purged = purge_hidden(db)
+                if purged["accounts"] or purged["banks"]:
+                    print(f"🗑️  Purged {purged['accounts']} accounts, {purged['banks']} banks "
+                          f"and {purged['transactions']} transactions from {db.db_path}")
+            except Exception as e:
+                print(f"Background purge of {db.db_path} failed: {e}")
+            finally:
+                db.release()
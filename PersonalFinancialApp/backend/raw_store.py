@@ -0,0 +1,130 @@
+import sqlite3
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# The original CSV row of every imported transaction, kept out of the hot
+# transactions table. Rows are only read back for backups and the
+# /transactions/{id}/raw endpoint, so scans over transactions never touch them.
+#
+# A single CSV row is a couple of hundred bytes of JSON that repeats the same
+# column names and value shapes as its neighbours, which plain zlib cannot
+# exploit. Each stored batch (one import, or one migration chunk) therefore
+# gets a preset dictionary sampled from its own rows; every row is then
+# compressed against that dictionary.
+RAW_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS raw_dictionaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content BLOB NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS transaction_raw (
+        transaction_id INTEGER PRIMARY KEY,
+        codec TEXT NOT NULL,
+        dictionary_id INTEGER,
+        payload BLOB NOT NULL
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS transactions_raw_delete AFTER DELETE ON transactions BEGIN
+        DELETE FROM transaction_raw WHERE transaction_id = old.id;
+    END""",
+]
+
+ZLIB_LEVEL = 9
+# A raw row is a few hundred bytes, so a 4 KB window (plus a 4 KB dictionary
+# filling it) compresses as well as zlib's default 32 KB one, while setting
+# up each compressor costs a fraction as much. That setup dominates bulk
+# imports, which compress every row separately. Rows written with the old
+# 32 KB settings still decompress, since zlib streams record their window.
+ZLIB_WBITS = 12
+ZLIB_MEM_LEVEL = 4
+DICTIONARY_SAMPLE_ROWS = 64
+DICTIONARY_MAX_BYTES = 1 << ZLIB_WBITS      # the window; older bytes would never be referenced
+MIN_ROWS_FOR_DICTIONARY = 8
+
+
+def ensure_raw_store(conn: sqlite3.Connection):
+    for sql in RAW_SCHEMA:
+        conn.execute(sql)
+
+
+def _build_dictionary(samples: List[bytes]) -> bytes:
+    # zlib prefers matches near the end of the dictionary, so the sample is kept as-is
+    return b"\n".join(samples)[-DICTIONARY_MAX_BYTES:]
+
+
+def _compressor(dictionary: Optional[bytes]):
+    """A compressor primed with the dictionary; copy it for each row (cheaper than priming again)"""
+    if dictionary:
+        return zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, ZLIB_WBITS, ZLIB_MEM_LEVEL, zdict=dictionary)
+    return zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, ZLIB_WBITS, ZLIB_MEM_LEVEL)
+
+
+def _compress(data: bytes, primed) -> bytes:
+    compressor = primed.copy()
+    return compressor.compress(data) + compressor.flush()
+
+
+def _decompress(payload: bytes, dictionary: Optional[bytes]) -> bytes:
+    decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return decompressor.decompress(payload) + decompressor.flush()
+
+
+def store_raw(conn: sqlite3.Connection, rows: Iterable[Tuple[int, Optional[str]]]) -> int:
+    """Compress and store ``(transaction_id, raw_text)`` pairs; empty values are skipped"""
+    rows = [(transaction_id, text.encode("utf-8")) for transaction_id, text in rows if text]
+    if not rows:
+        return 0
+
+    dictionary_id, dictionary = None, None
+    if len(rows) >= MIN_ROWS_FOR_DICTIONARY:
+        step = max(1, len(rows) // DICTIONARY_SAMPLE_ROWS)
+        dictionary = _build_dictionary([data for _, data in rows[::step][:DICTIONARY_SAMPLE_ROWS]])
+        dictionary_id = conn.execute(
+            "INSERT INTO raw_dictionaries (content) VALUES (?)", (dictionary,)
+        ).lastrowid
+
+    primed = _compressor(dictionary)
+    packed = []
+    for transaction_id, data in rows:
+        payload = _compress(data, primed)
+        if len(payload) < len(data):
+            packed.append((transaction_id, "zlib", dictionary_id, payload))
+        else:
+            packed.append((transaction_id, "plain", None, data))
+    conn.executemany(
+        "INSERT OR REPLACE INTO transaction_raw (transaction_id, codec, dictionary_id, payload) VALUES (?, ?, ?, ?)",
+        packed,
+    )
+    return len(packed)
+
+
+def prune_dictionaries(conn: sqlite3.Connection) -> int:
+    """Delete compression dictionaries no stored raw row uses any more; returns how many"""
+    return conn.execute("""
+        DELETE FROM raw_dictionaries WHERE id NOT IN (
+            SELECT dictionary_id FROM transaction_raw WHERE dictionary_id IS NOT NULL
+        )
+    """).rowcount
+
+
+def fetch_raw(conn: sqlite3.Connection, transaction_ids: List[int], chunk_size: int = 500) -> Dict[int, str]:
+    """Raw rows for the given transactions, keyed by transaction id"""
+    raw, dictionaries = {}, {}
+    for start in range(0, len(transaction_ids), chunk_size):
+        chunk = transaction_ids[start:start + chunk_size]
+        placeholders = ",".join("?" * len(chunk))
+        for transaction_id, codec, dictionary_id, payload in conn.execute(
+            f"SELECT transaction_id, codec, dictionary_id, payload FROM transaction_raw "
+            f"WHERE transaction_id IN ({placeholders})",
+            chunk,
+        ).fetchall():
+            if codec == "plain":
+                data = payload
+            elif codec == "zlib":
+                if dictionary_id is not None and dictionary_id not in dictionaries:
+                    dictionaries[dictionary_id] = conn.execute(
+                        "SELECT content FROM raw_dictionaries WHERE id = ?", (dictionary_id,)
+                    ).fetchone()[0]
+                data = _decompress(payload, dictionaries.get(dictionary_id))
+            else:
+                raise ValueError(f"Unknown raw data codec '{codec}'")
+            raw[transaction_id] = data.decode("utf-8")
+    return raw
@@ -0,0 +1,238 @@
+import re
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from descriptions import description_sql
+from ingest import cents_to_amount
+from purge import HIDDEN_ACCOUNTS_SQL
+
+# Full-text index over transaction descriptions and notes. It is an
+# external-content FTS5 table: the text is not copied into the index, and
+# triggers keep the index in step with every insert, update and delete.
+# Descriptions are interned (descriptions.py), so the content FTS5 reads back
+# for highlights is a view that resolves each row's description text. The
+# tables, views and triggers are created by migrations.py.
+SEARCH_TABLE = "transactions_fts"
+SEARCH_CONTENT_VIEW = "transactions_text"
+
+# Credit card statement transactions have a description only. They get their
+# own index so ledger search can cover every money movement.
+CREDIT_SEARCH_TABLE = "credit_transactions_fts"
+CREDIT_SEARCH_CONTENT_VIEW = "credit_transactions_text"
+
+
+# bm25 column weights: a hit in the description counts more than one in the note
+_RANK = f"bm25({SEARCH_TABLE}, 4.0, 1.0)"
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+# Inserts of at least this many rows are indexed in one statement afterwards:
+# the per-row insert trigger costs several times more than the indexing itself.
+# While SEARCH_PAUSE_TABLE has a row, the insert trigger's WHEN clause skips it.
+BULK_INDEX_MIN_ROWS = 1000
+SEARCH_PAUSE_TABLE = "transactions_fts_paused"
+
+
+@contextmanager
+def bulk_search_indexing(conn: sqlite3.Connection, rows: int) -> Iterator[None]:
+    """Index the transactions inserted inside the block all at once when it closes.
+
+    For large batches the insert trigger is paused for the duration of the
+    block by a row in SEARCH_PAUSE_TABLE. The block must run inside the
+    caller's write transaction, so other connections never see the pause.
+    """
+    if rows < BULK_INDEX_MIN_ROWS or not search_index_exists(conn):
+        yield
+        return
+
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+    pause_id = conn.execute(f"INSERT INTO {SEARCH_PAUSE_TABLE} DEFAULT VALUES").lastrowid
+    try:
+        yield
+        conn.execute(f"""
+            INSERT INTO {SEARCH_TABLE} (rowid, description, note)
+            SELECT id, description, note FROM {SEARCH_CONTENT_VIEW} WHERE id > ?
+        """, (last_id,))
+    finally:
+        conn.execute(f"DELETE FROM {SEARCH_PAUSE_TABLE} WHERE id = ?", (pause_id,))
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    """Whether the SQLite library was compiled with FTS5"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def search_index_exists(conn: sqlite3.Connection, table: str = SEARCH_TABLE) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def build_match_query(text: str) -> Optional[str]:
+    """Turn free text into an FTS5 MATCH expression.
+
+    Every word must match and is treated as a prefix, so ``amaz mkt`` finds
+    ``AMAZON MKTPLACE``. Words are quoted, so FTS5 operators typed by the
+    user are searched for literally instead of raising syntax errors.
+    """
+    tokens = _TOKEN_PATTERN.findall(text or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _transaction_search_filters(account_id: Optional[int], first_day: Optional[int], last_day: Optional[int],
+                                min_cents: Optional[int], max_cents: Optional[int]):
+    filters = f" AND t.account_id NOT IN ({HIDDEN_ACCOUNTS_SQL})"
+    params: List[Any] = []
+    for condition, value in (
+        ("t.account_id = ?", account_id),
+        ("t.day_number >= ?", first_day),
+        ("t.day_number <= ?", last_day),
+        ("t.amount_cents >= ?", min_cents),
+        ("t.amount_cents <= ?", max_cents),
+    ):
+        if value is not None:
+            filters += f" AND {condition}"
+            params.append(value)
+    return filters, params
+
+
+def count_search_matches(conn: sqlite3.Connection, text: str, account_id: Optional[int] = None,
+                         first_day: Optional[int] = None, last_day: Optional[int] = None,
+                         min_cents: Optional[int] = None, max_cents: Optional[int] = None) -> int:
+    """Number of transactions search_transactions can return for these arguments"""
+    match = build_match_query(text)
+    if match is None:
+        return 0
+    filters, params = _transaction_search_filters(account_id, first_day, last_day, min_cents, max_cents)
+    return conn.execute(f"""
+        SELECT COUNT(*) FROM {SEARCH_TABLE}
+        JOIN transactions t ON t.id = {SEARCH_TABLE}.rowid
+        WHERE {SEARCH_TABLE} MATCH ?{filters}
+    """, [match, *params]).fetchone()[0]
+
+
+def search_transactions(conn: sqlite3.Connection, text: str, account_id: Optional[int] = None,
+                        first_day: Optional[int] = None, last_day: Optional[int] = None,
+                        min_cents: Optional[int] = None, max_cents: Optional[int] = None,
+                        limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+    """Ranked matches with highlighted description and note snippets"""
+    match = build_match_query(text)
+    if match is None:
+        return []
+
+    filters, filter_params = _transaction_search_filters(account_id, first_day, last_day, min_cents, max_cents)
+    params: List[Any] = [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, match,
+                         *filter_params, limit, offset]
+
+    rows = conn.execute(f"""
+        SELECT t.id, t.account_id, t.date, {description_sql('t')}, t.amount_cents, t.note, t.category,
+               highlight({SEARCH_TABLE}, 0, ?, ?),
+               snippet({SEARCH_TABLE}, 1, ?, ?, '…', 12),
+               {_RANK} AS rank
+        FROM {SEARCH_TABLE}
+        JOIN transactions t ON t.id = {SEARCH_TABLE}.rowid
+        WHERE {SEARCH_TABLE} MATCH ?{filters}
+        ORDER BY rank, t.day_number DESC
+        LIMIT ? OFFSET ?
+    """, params).fetchall()
+
+    return [
+        {
+            "id": row[0],
+            "account_id": row[1],
+            "date": row[2],
+            "description": row[3],
+            "amount": cents_to_amount(row[4]),
+            "note": row[5],
+            "category": row[6],
+            "description_highlight": row[7],
+            "note_snippet": row[8],
+            "rank": round(row[9], 4),
+        }
+        for row in rows
+    ]
+
+
+def search_ledger(conn: sqlite3.Connection, text: str, source: Optional[str] = None,
+                  account_id: Optional[int] = None, first_day: Optional[int] = None,
+                  last_day: Optional[int] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+    """Ranked matches over bank and credit card transactions together.
+
+    Each source is matched against its own index and the hits are merged by
+    bm25 rank. ``account_id`` is only meaningful together with ``source``.
+    """
+    match = build_match_query(text)
+    if match is None:
+        return []
+
+    arms, params = [], []
+    if source in (None, "bank"):
+        filters, arm_params = _ledger_search_filters("t.account_id", account_id, first_day, last_day)
+        filters += f" AND t.account_id NOT IN ({HIDDEN_ACCOUNTS_SQL})"
+        arms.append(f"""
+            SELECT 'bank' AS source, t.id, t.account_id, t.date, {description_sql('t')}, t.amount_cents, t.note,
+                   t.category, highlight({SEARCH_TABLE}, 0, ?, ?) AS description_highlight,
+                   {_RANK} AS rank, t.day_number
+            FROM {SEARCH_TABLE}
+            JOIN transactions t ON t.id = {SEARCH_TABLE}.rowid
+            WHERE {SEARCH_TABLE} MATCH ?{filters}
+        """)
+        params += [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, match, *arm_params]
+    if source in (None, "credit") and search_index_exists(conn, CREDIT_SEARCH_TABLE):
+        filters, arm_params = _ledger_search_filters("cs.credit_account_id", account_id, first_day, last_day,
+                                                     alias="ct")
+        arms.append(f"""
+            SELECT 'credit', ct.id, cs.credit_account_id, ct.transaction_date, {description_sql('ct')}, ct.amount_cents,
+                   NULL, ct.category, highlight({CREDIT_SEARCH_TABLE}, 0, ?, ?),
+                   bm25({CREDIT_SEARCH_TABLE}), ct.day_number
+            FROM {CREDIT_SEARCH_TABLE}
+            JOIN credit_transactions ct ON ct.id = {CREDIT_SEARCH_TABLE}.rowid
+            JOIN credit_statements cs ON cs.id = ct.credit_statement_id
+            WHERE {CREDIT_SEARCH_TABLE} MATCH ?{filters}
+        """)
+        params += [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, match, *arm_params]
+    if not arms:
+        return []
+
+    rows = conn.execute(
+        " UNION ALL ".join(arms) + " ORDER BY rank, day_number DESC LIMIT ? OFFSET ?", [*params, limit, offset]
+    ).fetchall()
+    return [
+        {
+            "source": row[0],
+            "id": row[1],
+            "account_id": row[2],
+            "date": row[3],
+            "description": row[4],
+            "amount": cents_to_amount(row[5]),
+            "note": row[6],
+            "category": row[7],
+            "description_highlight": row[8],
+            "rank": round(row[9], 4),
+        }
+        for row in rows
+    ]
+
+
+def _ledger_search_filters(account_column: str, account_id: Optional[int], first_day: Optional[int],
+                           last_day: Optional[int], alias: str = "t"):
+    filters, params = "", []
+    for condition, value in (
+        (f"{account_column} = ?", account_id),
+        (f"{alias}.day_number >= ?", first_day),
+        (f"{alias}.day_number <= ?", last_day),
+    ):
+        if value is not None:
+            filters += f" AND {condition}"
+            params.append(value)
+    return filters, params
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Show EXPLAIN QUERY PLAN for the backend's hot queries before and after the
+managed indexes are created, on a synthetic database with a million
+transactions.
+
+Usage: python explain_query_plans.py [rows]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append('backend')
+
+from descriptions import DESCRIPTIONS_TABLE, description_sql, ensure_descriptions
+from indexes import ensure_indexes
+from ledger import ensure_ledger
+
+# Transaction text is interned: queries resolve description_id like the backend does
+TX_DESCRIPTION = description_sql("transactions")
+
+SCHEMA = """
+    CREATE TABLE banks (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, created_at TIMESTAMP);
+    CREATE TABLE accounts (id INTEGER PRIMARY KEY AUTOINCREMENT, bank_id INTEGER, name TEXT NOT NULL,
+                           account_type TEXT DEFAULT 'checking', balance_cents INTEGER DEFAULT 0, created_at TIMESTAMP);
+    CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, account_id INTEGER, date TEXT,
+                               day_number INTEGER, description_id INTEGER, amount_cents INTEGER, note TEXT,
+                               category TEXT DEFAULT 'Uncategorized');
+    CREATE TABLE category_rules (id INTEGER PRIMARY KEY AUTOINCREMENT, account_id INTEGER, pattern TEXT NOT NULL,
+                                 category TEXT NOT NULL, created_at TIMESTAMP);
+    CREATE TABLE credit_statements (id INTEGER PRIMARY KEY AUTOINCREMENT, credit_account_id INTEGER,
+                                    statement_date TEXT, payment_due_date TEXT, new_balance REAL,
+                                    minimum_payment_due REAL, statement_file_path TEXT, created_at TIMESTAMP);
+    CREATE TABLE credit_transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, credit_statement_id INTEGER,
+                                      transaction_date TEXT, day_number INTEGER, description_id INTEGER, amount_cents INTEGER,
+                                      category TEXT DEFAULT 'Uncategorized', created_at TIMESTAMP);
+    CREATE TABLE portfolio_statements (id INTEGER PRIMARY KEY AUTOINCREMENT, investment_account_id INTEGER,
+                                       statement_date TEXT, ending_balance REAL, total_market_value REAL);
+    CREATE TABLE securities (id INTEGER PRIMARY KEY AUTOINCREMENT, investment_account_id INTEGER, symbol TEXT,
+                             name TEXT, market_value REAL, statement_date TEXT);
+"""
+
+QUERIES = {
+    "get_transactions": (
+        f"SELECT id, date, {TX_DESCRIPTION}, amount_cents, note, category FROM transactions "
+        "WHERE account_id = ? ORDER BY day_number DESC, id DESC LIMIT 100", (7,)),
+    "get_transactions (deep page)": (
+        f"SELECT id, date, {TX_DESCRIPTION}, amount_cents, note, category, day_number FROM transactions "
+        "WHERE account_id = ? AND (day_number, id) < (?, ?) ORDER BY day_number DESC, id DESC LIMIT 101",
+        (7, 19500, 500000)),
+    "get_transactions (category, date range)": (
+        f"SELECT id, date, {TX_DESCRIPTION}, amount_cents, note, category, day_number FROM transactions "
+        "WHERE account_id = ? AND day_number >= ? AND day_number <= ? AND category = ? "
+        "AND (day_number, id) < (?, ?) ORDER BY day_number DESC, id DESC LIMIT 101",
+        (7, 19000, 19800, "Groceries", 19500, 500000)),
+    "get_transactions (by amount, debits)": (
+        f"SELECT id, date, {TX_DESCRIPTION}, amount_cents, note, category, amount_cents FROM transactions "
+        "WHERE account_id = ? AND amount_cents < 0 AND (amount_cents, id) > (?, ?) "
+        "ORDER BY amount_cents, id LIMIT 101", (7, -5000, 0)),
+    "get_transactions (total)": (
+        "SELECT COUNT(*) FROM transactions WHERE account_id = ? AND category = ? AND day_number >= ?",
+        (7, "Groceries", 19000)),
+    "get_analytics (monthly)": (
+        "SELECT strftime('%Y-%m', day_number * 86400, 'unixepoch') AS month, SUM(amount_cents) FROM transactions "
+        "WHERE account_id = ? AND amount_cents < 0 GROUP BY month ORDER BY month", (7,)),
+    "get_analytics (date range)": (
+        "SELECT category, -SUM(amount_cents) AS total FROM transactions "
+        "WHERE account_id = ? AND amount_cents < 0 AND day_number >= ? AND day_number <= ? "
+        "GROUP BY category ORDER BY total DESC", (7, 19723, 19813)),
+    "get_analytics (categories)": (
+        "SELECT category, -SUM(amount_cents) AS total FROM transactions "
+        "WHERE account_id = ? AND amount_cents < 0 GROUP BY category ORDER BY total DESC", (7,)),
+    "running_balance (page)": (
+        f"SELECT id, date, day_number, {TX_DESCRIPTION}, amount_cents, category, "
+        "0 + SUM(amount_cents) OVER (ORDER BY day_number, id ROWS UNBOUNDED PRECEDING) FROM transactions "
+        "WHERE account_id = ? AND (day_number, id) > (?, ?) AND day_number <= ? ORDER BY day_number, id LIMIT 500",
+        (7, 19000, 0, 2932896)),
+    "daily_balances (page)": (
+        "SELECT day_number, COUNT(*), SUM(amount_cents), "
+        "0 + SUM(SUM(amount_cents)) OVER (ORDER BY day_number ROWS UNBOUNDED PRECEDING) FROM transactions "
+        "WHERE account_id = ? AND day_number > ? AND day_number <= ? GROUP BY day_number ORDER BY day_number LIMIT 366",
+        (7, 19000, 2932896)),
+    "ledger_analytics (date range, all sources)": (
+        "SELECT category, -SUM(amount_cents) AS total, COUNT(*) FROM ledger "
+        "WHERE amount_cents < 0 AND day_number >= ? AND day_number <= ? GROUP BY category ORDER BY total DESC",
+        (19723, 19813)),
+    "ledger_analytics (one credit account)": (
+        "SELECT category, -SUM(amount_cents) AS total, COUNT(*) FROM ledger "
+        "WHERE amount_cents < 0 AND source = ? AND account_id = ? GROUP BY category ORDER BY total DESC",
+        ("credit", 3)),
+    "fuzzy_match_category": (
+        f"SELECT d.text, c.category FROM (SELECT DISTINCT description_id, category FROM transactions "
+        f"WHERE account_id = ? AND category != 'Uncategorized' AND category IS NOT NULL) c "
+        f"JOIN {DESCRIPTIONS_TABLE} d ON d.id = c.description_id", (7,)),
+    "auto_categorize (uncategorized)": (
+        f"SELECT description_id, {TX_DESCRIPTION}, COUNT(*) FROM transactions "
+        "WHERE account_id = ? AND (category = 'Uncategorized' OR category IS NULL) GROUP BY description_id", (7,)),
+    "auto_categorize (update one description)": (
+        "UPDATE transactions SET category = category WHERE account_id = ? AND description_id IS ? "
+        "AND (category = 'Uncategorized' OR category IS NULL)", (7, 42)),
+    "get_accounts": (
+        "SELECT a.id, COUNT(t.id) FROM accounts a LEFT JOIN transactions t ON a.id = t.account_id "
+        "WHERE a.bank_id = ? GROUP BY a.id", (2,)),
+    "get_credit_statements (transactions)": (
+        f"SELECT transaction_date, {description_sql('credit_transactions')}, amount_cents, category FROM credit_transactions "
+        "WHERE credit_statement_id = ? ORDER BY transaction_date", (42,)),
+    "get_securities (latest per symbol)": (
+        "SELECT s1.id FROM securities s1 INNER JOIN (SELECT symbol, MAX(statement_date) AS max_date "
+        "FROM securities WHERE investment_account_id = ? GROUP BY symbol) s2 "
+        "ON s1.symbol = s2.symbol AND s1.statement_date = s2.max_date "
+        "WHERE s1.investment_account_id = ? ORDER BY s1.symbol", (3, 3)),
+    "get_portfolio_summary (holdings)": (
+        "SELECT symbol, market_value FROM securities WHERE investment_account_id = ? AND statement_date = ? "
+        "ORDER BY market_value DESC", (3, "2023-06-30")),
+}
+
+
+def populate(conn, rows):
+    """Fill the schema with synthetic data"""
+    rnd = random.Random(42)
+    categories = ["Uncategorized"] * 3 + ["Expenses:Food:Groceries", "Expenses:Housing:Mortgage",
+                                          "Income:Salary", "Transfers:CashWithdrawal"]
+    conn.executemany("INSERT INTO banks (name) VALUES (?)", [(f"Bank {i}",) for i in range(10)])
+    conn.executemany(f"INSERT INTO {DESCRIPTIONS_TABLE} (id, text) VALUES (?, ?)",
+                     [(i, f"MERCHANT {i}") for i in range(1, 5001)] + [(5001, "CARD")])
+    conn.executemany("INSERT INTO accounts (bank_id, name) VALUES (?, ?)",
+                     [(i % 10 + 1, f"Account {i}") for i in range(50)])
+    conn.executemany(
+        "INSERT INTO transactions (account_id, date, day_number, description_id, amount_cents, category) "
+        "VALUES (?, date(? * 86400, 'unixepoch'), ?, ?, ?, ?)",
+        ((rnd.randint(1, 50),
+          *[rnd.randint(14610, 20088)] * 2,
+          rnd.randint(1, 5000),
+          rnd.randint(-50000, 50000),
+          rnd.choice(categories)) for _ in range(rows)))
+    conn.executemany(
+        "INSERT INTO credit_statements (credit_account_id, statement_date) VALUES (?, ?)",
+        ((i % 20 + 1, "2024-01-31") for i in range(2000)))
+    conn.executemany(
+        "INSERT INTO credit_transactions (credit_statement_id, transaction_date, day_number, description_id, amount_cents) "
+        "VALUES (?, date(? * 86400, 'unixepoch'), ?, ?, ?)",
+        ((rnd.randint(1, 2000), *[rnd.randint(14610, 20088)] * 2, 5001, -100) for _ in range(rows // 10)))
+    conn.executemany(
+        "INSERT INTO securities (investment_account_id, symbol, statement_date, market_value) VALUES (?, ?, ?, ?)",
+        ((rnd.randint(1, 20), f"SYM{rnd.randint(1, 300)}", f"20{rnd.randint(15, 24)}-06-30", 1.0)
+         for _ in range(rows // 10)))
+    conn.commit()
+
+
+def explain(conn, label):
+    print(f"\n📋 {label}")
+    print("=" * 60)
+    for name, (sql, params) in QUERIES.items():
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"\n🔍 {name} ({elapsed:.1f} ms)")
+        for step in plan:
+            print(f"   {step}")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    db_path = os.path.join(tempfile.mkdtemp(), "explain.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    ensure_descriptions(conn)
+    ensure_ledger(conn)
+    print(f"🏗️  Populating {rows:,} transactions in {db_path}")
+    populate(conn, rows)
+
+    explain(conn, "BEFORE managed indexes")
+    start = time.perf_counter()
+    changes = ensure_indexes(conn)
+    conn.commit()
+    print(f"\n✅ Created {len(changes['created'])} indexes in {time.perf_counter() - start:.1f}s")
+    explain(conn, "AFTER managed indexes")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
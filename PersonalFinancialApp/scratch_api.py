@@ -0,0 +1,30 @@
+"""
+The API on a scratch database, shared by the test scripts that drive it
+through FastAPI's TestClient
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+_app = {}
+
+
+def app():
+    """``(main, client)`` on a scratch database, set up on first use: bulk imports parse in
+    spawned worker processes, which import the calling test module again"""
+    if not _app:
+        scratch = tempfile.mkdtemp()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(scratch, 'data', 'finance.db')}"
+        os.chdir(scratch)
+        from fastapi.testclient import TestClient
+        import main
+        _app.update(main=main, client=TestClient(main.app))
+    return _app["main"], _app["client"]
+
+
+def ok(response):
+    assert response.status_code < 400, (response.status_code, response.text)
+    return response.json()
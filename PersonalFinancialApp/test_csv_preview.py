@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test script for the CSV upload preview: column types and the suggested mapping
+"""
+
+import io
+import sys
+
+sys.path.append('backend')
+
+from importer import preview_csv
+
+
+def preview(csv_text):
+    return preview_csv(io.BytesIO(csv_text.encode()))
+
+
+def test_clean_preview():
+    """A well-formed statement gets date and amount columns and a full mapping"""
+    print("\n1. Testing a clean statement...")
+    result = preview(
+        "Date,Desc,Amt,Memo\n"
+        "01/15/2024,STARBUCKS STORE 1234,-4.50,x\n"
+        "01/16/2024,AMAZON MKTPLACE PMTS,\"$1,200.10\",y\n"
+        "02/01/2024,Payroll,(300.00),\n"
+    )
+    assert result["column_types"] == {"Date": "date", "Desc": "text", "Amt": "amount", "Memo": "text"}, result
+    assert result["suggested_mapping"] == {"date": "Date", "amount": "Amt", "description": "Desc", "note": "Memo"}
+    assert result["total_rows"] == 3
+    print(f"✅ Types: {result['column_types']}")
+
+
+def test_mixed_rows():
+    """One malformed row in a small sample does not turn the date and amount columns into text"""
+    print("\n2. Testing a small statement with a bad row...")
+    result = preview(
+        "Date,Desc,Amt,Memo\n"
+        "01/15/2024,STARBUCKS STORE 1234,-4.50,x\n"
+        "01/16/2024,AMAZON MKTPLACE PMTS,\"$1,200.10\",y\n"
+        "02/01/2024,Payroll,(300.00),\n"
+        "bad,Broken,abc,\n"
+    )
+    assert result["column_types"]["Date"] == "date", result["column_types"]
+    assert result["column_types"]["Amt"] == "amount", result["column_types"]
+    assert result["date_formats"] == {"Date": "%m/%d/%Y"}
+    assert result["suggested_mapping"]["date"] == "Date"
+    assert result["suggested_mapping"]["amount"] == "Amt"
+    assert result["suggested_mapping"]["description"] == "Desc"
+    print(f"✅ Types: {result['column_types']}")
+
+
+def test_mostly_text():
+    """Columns where only a few values parse stay text"""
+    print("\n3. Testing text columns with a stray number or date...")
+    result = preview(
+        "Payee,Reference\n"
+        "Grocery,12\n"
+        "Rent,AB-7\n"
+        "2024-01-01,CD-9\n"
+        "Coffee,EF-1\n"
+    )
+    assert result["column_types"] == {"Payee": "text", "Reference": "text"}, result["column_types"]
+    print(f"✅ Types: {result['column_types']}")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing CSV preview")
+    print("=" * 60)
+    test_clean_preview()
+    test_mixed_rows()
+    test_mostly_text()
+    print("\n✅ All CSV preview tests passed")
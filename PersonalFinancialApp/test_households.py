@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script for household databases: evicting pools that are still in use
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append('backend')
+
+from database import ShardRouter, use_tenant
+
+
+def open_router(scratch, max_open=1):
+    def prepare(pool):
+        with pool.transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS items (name TEXT)")
+
+    return ShardRouter(os.path.join(scratch, "default.db"), shard_dir=os.path.join(scratch, "households"),
+                       max_open=max_open, prepare=prepare)
+
+
+def test_evicted_pool_in_use():
+    """A pool evicted mid-transaction stays open and is reused, not opened twice"""
+    print("\n1. Testing eviction of a household pool in use...")
+    with tempfile.TemporaryDirectory() as scratch:
+        router = open_router(scratch)
+        with use_tenant("alpha"), router.transaction() as conn:
+            alpha = router.pool("alpha")
+            conn.execute("INSERT INTO items VALUES ('first')")
+            # Opening another household evicts alpha while its write is open
+            router.pool("beta")
+            assert "alpha" in router.shard_stats()["closing"]
+            assert not alpha.closed
+            conn.execute("INSERT INTO items VALUES ('second')")
+            # Asking for alpha again brings the same pool back
+            assert router.pool("alpha") is alpha
+        print("✅ Evicted pool kept open and reused")
+
+        router.pool("beta")
+        assert alpha.closed, "idle evicted pool should close"
+        with use_tenant("alpha"), router.connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 2
+        assert router.pool("alpha") is not alpha
+        print("✅ Idle evicted pool closed, rows committed")
+        router.close_all()
+
+
+def test_lease_defers_close():
+    """An evicted pool closes when the last lease on it is released"""
+    print("\n2. Testing leases...")
+    with tempfile.TemporaryDirectory() as scratch:
+        router = open_router(scratch)
+        with router.lease("alpha") as alpha:
+            router.pool("beta")
+            assert not alpha.closed
+        assert alpha.closed
+        assert router.shard_stats()["evicted"] == 1
+        assert router.tenants() == [None, "alpha", "beta"]
+        router.close_all()
+    print("✅ Pool closed once the lease ended")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing household pools")
+    print("=" * 60)
+    test_evicted_pool_in_use()
+    test_lease_defers_close()
+    print("\n✅ All household pool tests passed")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for resuming failed import jobs: a retry picks up after the
+last committed chunk and never imports a row twice
+"""
+
+import io
+import json
+import time
+import zipfile
+
+from scratch_api import app, ok
+
+MAPPING = {"date": "Date", "description": "Desc", "amount": "Amt"}
+
+
+def new_account(name):
+    _, client = app()
+    bank = ok(client.post("/banks", json={"name": name}))
+    return ok(client.post(f"/banks/{bank['id']}/accounts", json={"name": "Checking", "account_type": "checking"}))
+
+
+def wait(job_id):
+    _, client = app()
+    for _ in range(600):
+        job = ok(client.get(f"/jobs/{job_id}"))
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def stored_descriptions(account_id):
+    main, _ = app()
+    with main.db.connection() as conn:
+        return [row[0] for row in conn.execute(
+            f"SELECT {main.description_sql('transactions')} FROM transactions WHERE account_id = ?", (account_id,)
+        )]
+
+
+def failing_on_call(function, failing_call):
+    calls = {"count": 0}
+
+    def wrapper(*args, **kwargs):
+        calls["count"] += 1
+        if calls["count"] == failing_call:
+            raise RuntimeError("disk full")
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def test_streamed_import_resume():
+    """A streamed import that fails mid-file resumes from its checkpoint"""
+    print("\n1. Testing resume of a streamed CSV import...")
+    main, client = app()
+    account = new_account("Resume Bank")
+    lines = [f"01/{i % 28 + 1:02d}/2024,SHOP {i},-{i}.25" for i in range(40)]
+    lines[9] = "01/05/2024,BADROW,abc"
+    csv = "Date,Desc,Amt\n" + "\n".join(lines) + "\n"
+
+    original_chunks, original_import = main.IMPORT_CHUNK_ROWS, main.import_rows
+    main.IMPORT_CHUNK_ROWS = 7
+    main.import_rows = failing_on_call(original_import, 3)
+    try:
+        job_id = ok(client.post(f"/import-transactions/{account['id']}?async=true", files={"file": ("s.csv", csv)},
+                                data={"mapping": json.dumps(MAPPING), "stream": "true"}))["job_id"]
+        job = wait(job_id)
+        assert job["status"] == "failed", job
+        assert len(stored_descriptions(account["id"])) == 13, "two 7-row chunks (one row rejected) stay committed"
+        print(f"   Failed after {job['progress']['done']} rows: {job['error']}")
+
+        main.import_rows = original_import
+        ok(client.post(f"/jobs/{job_id}/retry"))
+        job = wait(job_id)
+    finally:
+        main.IMPORT_CHUNK_ROWS, main.import_rows = original_chunks, original_import
+
+    assert job["status"] == "succeeded", job
+    result = job["result"]
+    assert result["imported"] == 39 and result["rejected_count"] == 1, result
+    assert [reject["row"] for reject in result["rejected"]] == [10], result["rejected"]
+    descriptions = stored_descriptions(account["id"])
+    assert len(descriptions) == 39 and len(set(descriptions)) == 39, "a retried chunk was imported twice"
+    print("✅ Retry imported the remaining chunks once")
+
+    # A finished job cannot be run again
+    assert client.post(f"/jobs/{job_id}/retry").status_code == 409
+    assert len(stored_descriptions(account["id"])) == 39
+    assert ok(client.get("/admin/balances/verify"))["drift"] == []
+    print("✅ Succeeded job refused a second run, balances match")
+
+
+def test_archive_import_resume():
+    """A bulk import of zips of monthly statements resumes per file after a failed commit"""
+    print("\n2. Testing resume of a bulk archive import...")
+    import bulk_import
+
+    main, client = app()
+    account = new_account("Archive Bank")
+    # Both zips use the same member names, so checkpoints must tell them apart
+    archives = []
+    for half in range(2):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as statements:
+            for number in range(1, 7):
+                month = half * 6 + number
+                statements.writestr(f"statements/{number}.csv", "Date,Desc,Amt\n" + "\n".join(
+                    f"{month:02d}/{day:02d}/2024,SHOP {month}-{day},-{day}.50" for day in range(1, 21)))
+        archives.append(("files", (f"half-{half + 1}.zip", archive.getvalue())))
+
+    original_chunks, original_insert = main.IMPORT_CHUNK_ROWS, bulk_import.insert_transactions
+    main.IMPORT_CHUNK_ROWS = 50
+    bulk_import.insert_transactions = failing_on_call(original_insert, 3)
+    try:
+        job_id = ok(client.post(f"/import-archive/{account['id']}?async=true",
+                                files=archives,
+                                data={"mapping": json.dumps(MAPPING)}))["job_id"]
+        job = wait(job_id)
+        assert job["status"] == "failed", job
+        assert len(stored_descriptions(account["id"])) == 100, "two 50-row commits stay committed"
+        print(f"   Failed: {job['error']}")
+
+        bulk_import.insert_transactions = original_insert
+        ok(client.post(f"/jobs/{job_id}/retry"))
+        job = wait(job_id)
+    finally:
+        main.IMPORT_CHUNK_ROWS, bulk_import.insert_transactions = original_chunks, original_insert
+
+    assert job["status"] == "succeeded", job
+    assert job["result"]["imported"] == 240, job["result"]
+    assert all(file["imported"] == 20 for file in job["result"]["files"]), job["result"]["files"]
+    descriptions = stored_descriptions(account["id"])
+    assert len(descriptions) == 240 and len(set(descriptions)) == 240, "a statement row was imported twice"
+    assert ok(client.get("/admin/balances/verify"))["drift"] == []
+    print("✅ Retry finished the remaining statements without duplicates")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing import resume")
+    print("=" * 60)
+    test_streamed_import_resume()
+    test_archive_import_resume()
+    print("\n✅ All import resume tests passed")
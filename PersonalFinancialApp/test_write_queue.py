@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for the single-writer queue: group commits, rollback of failed
+blocks, and blocks that end the shared transaction themselves
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+
+sys.path.append('backend')
+
+from database import ConnectionPool
+
+
+def open_pool(scratch):
+    pool = ConnectionPool(os.path.join(scratch, "queue.db"), max_size=2)
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE items (name TEXT UNIQUE)")
+    return pool
+
+
+def names(pool):
+    with pool.connection() as conn:
+        return sorted(row[0] for row in conn.execute("SELECT name FROM items"))
+
+
+def run_in_thread(block, timeout=10):
+    """Run ``block`` on another thread; returns its exception, or None"""
+    outcome = {}
+
+    def target():
+        try:
+            block()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "transaction() block never returned"
+    return outcome.get("error")
+
+
+def test_failed_block_rolls_back():
+    """A block that raises leaves no rows behind, and later writes still commit"""
+    print("\n1. Testing rollback of a failed block...")
+    with tempfile.TemporaryDirectory() as scratch:
+        pool = open_pool(scratch)
+        try:
+            with pool.transaction() as conn:
+                conn.execute("INSERT INTO items VALUES ('lost')")
+                raise ValueError("boom")
+        except ValueError:
+            pass
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO items VALUES ('kept')")
+        assert names(pool) == ["kept"], names(pool)
+        pool.close_all()
+    print("✅ Failed block rolled back, next write committed")
+
+
+def test_failure_in_group_commit():
+    """Concurrent writers share a commit; one failing only undoes its own rows"""
+    print("\n2. Testing a failure inside a group commit...")
+    with tempfile.TemporaryDirectory() as scratch:
+        pool = open_pool(scratch)
+        errors = []
+
+        def write(name):
+            try:
+                with pool.transaction() as conn:
+                    conn.execute("INSERT INTO items VALUES (?)", (name,))
+            except sqlite3.IntegrityError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(name,)) for name in ["a", "b", "a", "c"]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        assert names(pool) == ["a", "b", "c"], names(pool)
+        assert len(errors) == 1, errors
+        pool.close_all()
+    print("✅ Duplicate rejected, other writes in the batch committed")
+
+
+def test_block_ending_transaction():
+    """A block that commits or rolls back the shared transaction gets an error, not a hang"""
+    print("\n3. Testing blocks that end the group transaction...")
+    with tempfile.TemporaryDirectory() as scratch:
+        pool = open_pool(scratch)
+
+        def commit_block():
+            with pool.transaction() as conn:
+                conn.execute("INSERT INTO items VALUES ('x')")
+                conn.commit()
+
+        def rollback_block():
+            with pool.transaction() as conn:
+                conn.execute("INSERT INTO items VALUES ('y')")
+                conn.execute("ROLLBACK")
+
+        for block in (commit_block, rollback_block):
+            error = run_in_thread(block)
+            assert isinstance(error, sqlite3.OperationalError), error
+            print(f"   {block.__name__}: {error}")
+
+        # The writer keeps working afterwards
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO items VALUES ('z')")
+        assert "z" in names(pool)
+        pool.close_all()
+    print("✅ Callers were released with an error and the writer recovered")
+
+
+def test_savepoint_failure_keeps_writer():
+    """A failing savepoint statement fails its batch but leaves the writer thread running"""
+    print("\n4. Testing a savepoint statement that fails...")
+    with tempfile.TemporaryDirectory() as scratch:
+        pool = open_pool(scratch)
+
+        def release_block():
+            # Releasing the writer's savepoint makes its own RELEASE fail
+            with pool.transaction() as conn:
+                conn.execute("INSERT INTO items VALUES ('released')")
+                conn.execute(f"RELEASE {pool.writer.SAVEPOINT}")
+
+        error = run_in_thread(release_block)
+        assert isinstance(error, sqlite3.OperationalError), error
+        print(f"   release_block: {error}")
+
+        def next_write():
+            with pool.transaction() as conn:
+                conn.execute("INSERT INTO items VALUES ('after')")
+
+        assert run_in_thread(next_write) is None
+        assert names(pool) == ["after"], names(pool)
+        pool.close_all()
+    print("✅ Failed batch rolled back and the next write committed")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the write queue")
+    print("=" * 60)
+    test_failed_block_rolls_back()
+    test_failure_in_group_commit()
+    test_block_ending_transaction()
+    test_savepoint_failure_keeps_writer()
+    print("\n✅ All write queue tests passed")